@@ -1,6 +1,6 @@
 import React, { useState, useEffect, useRef } from 'react';
 import { useParams, useNavigate,useLocation } from 'react-router-dom';
-import { getScenarioById, startConversation, sendMessage } from '../services/api';
+import { getScenarioById, startConversation, sendMessage, requestAnalysis } from '../services/api';
 import CustomerAvatar from '../components/CustomerAvatar';
 import VoiceControl from '../components/VoiceControl';
 import ConversationBox from '../components/ConversationBox';
@@ -157,6 +157,11 @@ function TrainingPage() {
         speechSynthesisRef.current.cancel();
       }
       
+      // Start the analysis now so the report is ready sooner
+      requestAnalysis(conversation.conversation_id, userId).catch((err) => {
+        console.error('Error requesting analysis:', err);
+      });
+      
       // Navigate to report page
       navigate(`/report/${conversation.conversation_id}${userId && userId !== 'undefined' ? `?userId=${userId}` : ''}`);    }
   };
@@ -52,13 +52,38 @@ export const getUserProgress = async (userId) => {
 };
 
 // Analysis endpoints
-export const getPerformanceReport = async (conversationId, userId) => {
-  const url = userId && userId !== 'undefined' 
+const analysisUrl = (conversationId, userId) => (
+  userId && userId !== 'undefined'
     ? `/analysis/${conversationId}?userId=${userId}`
-    : `/analysis/${conversationId}`;
-    
-  const response = await api.get(url);
+    : `/analysis/${conversationId}`
+);
+
+// Queue the analysis in the background; safe to call more than once
+export const requestAnalysis = async (conversationId, userId) => {
+  const response = await api.post(analysisUrl(conversationId, userId));
   return response.data;
 };
 
+const ANALYSIS_POLL_INTERVAL_MS = 1000;
+const ANALYSIS_POLL_TIMEOUT_MS = 120000;
+
+export const getPerformanceReport = async (conversationId, userId) => {
+  let job = await requestAnalysis(conversationId, userId);
+  const deadline = Date.now() + ANALYSIS_POLL_TIMEOUT_MS;
+
+  while (job.status === 'queued' || job.status === 'running') {
+    if (Date.now() > deadline) {
+      throw new Error('Analysis timed out');
+    }
+    await new Promise((resolve) => setTimeout(resolve, ANALYSIS_POLL_INTERVAL_MS));
+    const response = await api.get(`/analysis/jobs/${job.job_id}`);
+    job = response.data;
+  }
+
+  if (job.status !== 'done') {
+    throw new Error(job.error || 'Analysis failed');
+  }
+  return job.result;
+};
+
 export default api;
\ No newline at end of file
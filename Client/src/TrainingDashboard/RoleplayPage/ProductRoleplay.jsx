@@ -10,6 +10,7 @@ const ProductRolePlay = ({ onBack }) => {
   const [micOn, setMicOn] = useState(false);
   const [context, setContext] = useState("");
   const [chatHistory, setChatHistory] = useState("");
+  const [sessionId, setSessionId] = useState(null);
   const [completedScenarios, setCompletedScenarios] = useState([]);
   const [customerList, setCustomerList] = useState([]);
   const [currentCustomer, setCurrentCustomer] = useState("");
@@ -152,6 +153,7 @@ const ProductRolePlay = ({ onBack }) => {
 
       const data = await response.json();
       setContext(data.context);
+      setSessionId(data.sessionId || null);
       setCurrentBehavior(data.behavior);
       setBehaviorType(data.behaviorType);
       setCurrentCustomer(data.selectedCustomer);
@@ -182,16 +184,24 @@ const ProductRolePlay = ({ onBack }) => {
     }
 
     try {
-      const response = await fetch("http://localhost:5000/api/send_message", {
+      const postMessage = (body) => fetch("http://localhost:5000/api/send_message", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({
-          message: currentInputMessage,
-          context: context,
-          chatHistory: chatHistory,
-          behavior: currentBehavior
-        })
+        body: JSON.stringify(body)
       });
+      const fullCall = {
+        message: currentInputMessage,
+        context: context,
+        chatHistory: chatHistory,
+        behavior: currentBehavior
+      };
+
+      // The server keeps the call's context and history when it returned a session
+      let response = await postMessage(sessionId ? { message: currentInputMessage, sessionId: sessionId } : fullCall);
+      if (response.status === 404 && sessionId) {
+        // Session expired or the server restarted: send the whole call once so it can be restored
+        response = await postMessage({ ...fullCall, sessionId: sessionId });
+      }
 
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
@@ -272,6 +282,7 @@ const ProductRolePlay = ({ onBack }) => {
     setMessages([]);
     setInputMessage("");
     setContext("");
+    setSessionId(null);
     setChatHistory("");
     setCurrentBehavior("");
     setBehaviorType("");
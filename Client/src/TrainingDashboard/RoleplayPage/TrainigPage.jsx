@@ -30,6 +30,7 @@ const TrainingPage = () => {
   const [micOn, setMicOn] = useState(false);
   const [context, setContext] = useState("");
   const [chatHistory, setChatHistory] = useState("");
+  const [sessionId, setSessionId] = useState(null);
   const [behaviorType, setBehaviorType] = useState("Polite Customer");
   const [behavior, setBehavior] = useState("");
   const [isTranscribing, setIsTranscribing] = useState(false);
@@ -201,6 +202,7 @@ const TrainingPage = () => {
         ringAudio.currentTime = 0;
         
         setContext(data.context);
+        setSessionId(data.sessionId || null);
         setBehavior(data.behavior || "");
         setBehaviorType(data.behaviorType || "Polite Customer");
         
@@ -233,16 +235,24 @@ const TrainingPage = () => {
   // Send a message to the backend
   const sendMessageAPI = async (message) => {
     try {
-      const response = await fetch("http://localhost:5000/api/send_message", {
+      const postMessage = (body) => fetch("http://localhost:5000/api/send_message", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({
-          message: message,
-          context: context,
-          chatHistory: chatHistory,
-          behavior: behavior
-        })
+        body: JSON.stringify(body)
       });
+      const fullCall = {
+        message: message,
+        context: context,
+        chatHistory: chatHistory,
+        behavior: behavior
+      };
+
+      // The server keeps the call's context and history when it returned a session
+      let response = await postMessage(sessionId ? { message: message, sessionId: sessionId } : fullCall);
+      if (response.status === 404 && sessionId) {
+        // Session expired or the server restarted: send the whole call once so it can be restored
+        response = await postMessage({ ...fullCall, sessionId: sessionId });
+      }
       
       if (!response.ok) {
         throw new Error("Failed to send message");
@@ -346,6 +356,7 @@ const TrainingPage = () => {
     setMessages([]);
     setInputMessage("");
     setContext("");
+    setSessionId(null);
     setChatHistory("");
     setBehavior("");
     
@@ -383,6 +394,7 @@ const TrainingPage = () => {
     setMessages([]);
     setInputMessage("");
     setContext("");
+    setSessionId(null);
     setChatHistory("");
     setBehaviorType("Polite Customer");
     setBehavior("");
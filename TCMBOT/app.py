@@ -2,9 +2,10 @@ import os
 import random
 import pandas as pd
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from typing import Optional
 import uvicorn
 
 from langchain.prompts import ChatPromptTemplate
@@ -13,6 +14,14 @@ from langchain_openai import ChatOpenAI
 
 # Load environment variables
 load_dotenv()
+
+# Shared keep-alive connection pools for all LLM traffic (reads settings from the environment)
+from llm_transport import get_http_client, get_async_http_client, transport_stats
+from data_reload import DataReloader
+from prompt_index import PromptIndex
+from call_sessions import CallSessionStore
+from prompt_registry import PromptRegistry, register_default_call_types
+
 GROQ_API_KEY = os.getenv("Groq_API")
 HF_TOKEN = os.getenv("HF_TOKEN")
 os.environ['HF_TOKEN'] = HF_TOKEN if HF_TOKEN else ""
@@ -29,7 +38,12 @@ def initialize_llm(api_key, retries=3):
     """Initialize Groq LLM with fallback to OpenAI."""
     for attempt in range(retries):
         try:
-            return ChatGroq(groq_api_key=api_key, model="llama-3.3-70b-versatile")
+            return ChatGroq(
+                groq_api_key=api_key,
+                model="llama-3.3-70b-versatile",
+                http_client=get_http_client(),
+                http_async_client=get_async_http_client()
+            )
         except Exception as e:
             if attempt == retries - 1:
                 print(f"Failed to initialize Groq after {retries} attempts. Error: {str(e)}")
@@ -53,6 +67,8 @@ behavior_file = "Behavior.csv"
 customer_file = "customer.csv"
 
 df_prompts = pd.read_csv(prompts_file)
+# Title lookups and rendered call contexts, rebuilt whenever prompts.csv changes
+prompt_index = PromptIndex(df_prompts)
 df_behaviors = pd.read_csv(behavior_file)
 
 # Load customer data if file exists
@@ -94,39 +110,88 @@ def get_behavior_by_call_number(call_number):
 
 def get_random_scenario(used_scenarios=None):
     """Get a random scenario title from the prompts CSV, excluding used ones."""
-    if used_scenarios is None:
-        used_scenarios = []
-
-    all_scenarios = df_prompts['Title'].tolist()
-    available_scenarios = [s for s in all_scenarios if s not in used_scenarios]
+    return prompt_index.random_title(used_scenarios or ())
 
-    if not available_scenarios:
-        return None
-    return random.choice(available_scenarios)
+def find_prompt(scenario_input: str):
+    """Find the indexed scenario for a title or part of one (a random one if empty)."""
+    if not scenario_input:
+        scenario_input = get_random_scenario()
+        if scenario_input is None:
+            return None
+    return prompt_index.find(scenario_input)
 
 def get_prompt_by_scenario(scenario_input: str):
     """Retrieve prompt details based on the provided scenario."""
-    try:
-        if not scenario_input:
-            scenario_input = get_random_scenario()
-
-        result = df_prompts[df_prompts['Title'].str.contains(scenario_input, case=False, na=False)]
-        if not result.empty:
-            row = result.iloc[0]
-            return {
-                'Title': row['Title'],
-                'Scenario': row['Scenario'],
-                'Example Conversation': row['Example Conversation'],
-                'Keywords': row['Keywords']
-            }
-    except Exception as e:
-        print(f"Error getting prompt: {str(e)}")
-    return None
+    entry = find_prompt(scenario_input)
+    return entry.to_dict() if entry is not None else None
 
 # Validate behavior distribution on startup
 if not validate_behavior_distribution():
     raise Exception("Invalid behavior distribution configuration")
 
+def read_changed_csv(path, current):
+    """Read a changed CSV, rejecting it if it lost columns the loaded data has."""
+    new_df = pd.read_csv(path)
+    missing = set(current.columns) - set(new_df.columns)
+    if missing:
+        raise ValueError(f"missing columns {sorted(missing)}")
+    return new_df
+
+def reload_prompts(path):
+    """Replace the telecalling scenarios."""
+    global df_prompts, prompt_index
+    new_prompts = read_changed_csv(path, df_prompts)
+    prompt_index = PromptIndex(new_prompts)
+    df_prompts = new_prompts
+    validate_behavior_distribution()
+
+def reload_behaviors(path):
+    """Replace the behavior patterns, keeping the old ones if the distribution no longer fits."""
+    global df_behaviors
+    new_behaviors = read_changed_csv(path, df_behaviors)
+    unknown = set(behavior_distribution) - set(new_behaviors['Type'].tolist())
+    if unknown:
+        raise ValueError(f"behaviors used by the distribution are missing: {sorted(unknown)}")
+    df_behaviors = new_behaviors
+
+def reload_customers(path):
+    """Replace the banking customer profiles."""
+    global df_customers
+    df_customers = read_changed_csv(path, df_customers)
+
+# Customer prompts and chains per call type, compiled once and reused for every message.
+# New call types register a template (and optionally a context detector) here.
+prompt_registry = PromptRegistry(llm, default="telecalling")
+register_default_call_types(prompt_registry)
+
+# Summarizes call messages that fell out of the rolling history window
+summary_prompt = ChatPromptTemplate.from_messages([
+    ("system", (
+        "Summarize this part of a phone call between an agent and a customer so the customer "
+        "role-play can continue consistently. Keep names, numbers, the customer's concerns and mood, "
+        "and anything the agent offered or promised. Write at most 80 words.\n\n"
+        "SUMMARY SO FAR:\n"
+        "{summary}\n\n"
+        "NEW MESSAGES:\n"
+        "{messages}"
+    ))
+])
+summary_chain = summary_prompt | llm
+
+def summarize_call(summary, lines):
+    """Fold older call messages into the running summary with the LLM."""
+    response_obj = summary_chain.invoke({"summary": summary or "(none)", "messages": "\n".join(lines)})
+    return response_obj.content if hasattr(response_obj, "content") else str(response_obj)
+
+# Server-side call state, so send_message only needs the session id and the new message
+call_sessions = CallSessionStore(summarize_call)
+
+# Reload the CSV files when their content changes, without restarting
+data_reloader = DataReloader()
+data_reloader.watch("prompts", prompts_file, reload_prompts)
+data_reloader.watch("behaviors", behavior_file, reload_behaviors)
+data_reloader.watch("customers", customer_file, reload_customers)
+
 app = FastAPI()
 
 # Add CORS middleware to allow cross-origin requests
@@ -138,6 +203,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def start_data_reloader():
+    data_reloader.start()
+
+@app.on_event("shutdown")
+async def stop_data_reloader():
+    await data_reloader.stop()
+
 # Pydantic models for request bodies
 class StartCallRequest(BaseModel):
     scenario: str = ""
@@ -145,8 +218,12 @@ class StartCallRequest(BaseModel):
 
 class SendMessageRequest(BaseModel):
     message: str
-    context: str
-    chatHistory: str
+    # Returned by start_call / start_customer_call; the server then owns context,
+    # chatHistory and behavior. Clients send them with the sessionId only to
+    # retry after a 404, so the server can restore an expired or lost session
+    sessionId: Optional[str] = None
+    context: str = ""
+    chatHistory: str = ""
     behavior: str = ""
 
 # New model for banking customer service
@@ -187,25 +264,39 @@ def start_call(request_data: StartCallRequest):
         if scenario_input is None:
             raise HTTPException(status_code=400, detail="No more unused scenarios available")
 
-    prompt_details = get_prompt_by_scenario(scenario_input)
-    if prompt_details is None:
+    prompt_entry = find_prompt(scenario_input)
+    if prompt_entry is None:
         raise HTTPException(status_code=500, detail="Failed to get scenario prompt")
 
-    context = (
-        f"Title: {prompt_details['Title']}\n"
-        f"Scenario: {prompt_details['Scenario']}\n"
-        f"Example Conversation: {prompt_details['Example Conversation']}\n"
-        f"Keywords: {prompt_details['Keywords']}"
-    ).strip()
+    customer_greeting = "Hello"
+    session = call_sessions.create(
+        prompt_entry.context, behavior_data['behavior'], [f"Customer: {customer_greeting}"], call_type="telecalling"
+    )
 
     return {
-        "context": context,
-        "customerGreeting": "Hello",
-        "selectedScenario": prompt_details['Title'],
+        "sessionId": session.id,
+        "context": prompt_entry.context,
+        "customerGreeting": customer_greeting,
+        "selectedScenario": prompt_entry.title,
         "behavior": behavior_data['behavior'],
         "behaviorType": behavior_data['type']
     }
 
+@app.get("/api/llm_transport_stats")
+def llm_transport_stats():
+    """Return LLM connection pool settings and connection reuse metrics."""
+    return transport_stats()
+
+@app.get("/api/call_session_stats")
+def call_session_stats():
+    """Return active call sessions and rolling summary metrics."""
+    return call_sessions.stats()
+
+@app.get("/api/data_reload_stats")
+def data_reload_stats():
+    """Return the watched CSV files and their reload history."""
+    return data_reloader.stats()
+
 #################################
 # New Banking Customer Endpoints
 #################################
@@ -310,7 +401,10 @@ def start_customer_call(request_data: StartCustomerCallRequest):
         else:
             greeting = "Finally! I've been waiting forever to speak with someone. I need help with my account right now."
 
+    session = call_sessions.create(context, behavior_data['behavior'], call_type="banking")
+
     return {
+        "sessionId": session.id,
         "context": context,
         "selectedCustomer": customer_details['Title'],
         "behavior": behavior_data['behavior'],
@@ -322,70 +416,37 @@ def start_customer_call(request_data: StartCustomerCallRequest):
 #################################
 
 @app.post("/api/send_message")
-def send_message(request_data: SendMessageRequest):
+def send_message(request_data: SendMessageRequest, background_tasks: BackgroundTasks):
     """Handle messages for both telecalling and banking customers."""
     user_message = request_data.message
-    context = request_data.context
-    chat_history = request_data.chatHistory
-    behavior = request_data.behavior
 
-    # Determine if this is a banking customer or telecalling scenario
-    is_banking = "CustomerType:" in context
-    
-    if is_banking:
-        system_prompt_template = (
-            "You are a real customer in a phone conversation. Keep your responses SHORT and NATURAL like in a real phone call.\n\n"
-            "CUSTOMER DETAILS:\n"
-            "{context}\n\n"
-            "BEHAVIOR PATTERN:\n"
-            "{behavior}\n\n"
-            "INSTRUCTIONS:\n"
-            "1. Keep responses brief and conversational (20-50 words maximum)\n"
-            "2. Don't provide all information at once - reveal details gradually as the conversation progresses\n"
-            "3. Proper initiation of the conversation (greeting, introduction of the issue)\n"
-            "4. Customer is not aware of who is calling so ask for the agent's name and details in case if he is not mentioning it\n"
-            "2. Use natural speech patterns with filler words (um, uh, well, hmm)\n"
-            "3. Ask one question at a time, not multiple questions\n"
-            "4. Respond directly to what the agent just said\n"
-            "6. If the agent resolves your issues completely, naturally end the conversation with a brief thank you and goodbye\n"
-            "7. Show natural impatience or satisfaction depending on how well your needs are being met\n\n"
-            "CONVERSATION PROGRESSION:\n"
-            "- Start with your initial concern\n"
-            "- Ask clarifying questions about solutions\n"
-            "- Express satisfaction or dissatisfaction with proposed solutions\n"
-            "- End the call naturally when your issue is resolved (thank you, goodbye, etc.)\n\n"
-            "CONVERSATION HISTORY:\n"
-            "{chat_history}\n\n"
-            "CURRENT MESSAGE FROM AGENT:\n"
-            "{input}\n\n"
-            "Respond briefly and naturally as a real customer would on a phone call. If your issue is fully resolved, end the conversation politely."
-        ).strip()
+    # With a session the server owns the context and history; without one the
+    # client sends them on every turn
+    session = None
+    if request_data.sessionId:
+        session = call_sessions.get(request_data.sessionId)
+        if session is None:
+            # The client retries a 404 once with its copy of the call
+            if not request_data.context:
+                raise HTTPException(status_code=404, detail="Call session not found or expired")
+            # Expired, evicted or lost in a restart: continue from the client's copy
+            print(f"Call session {request_data.sessionId} not found, restoring it from the request")
+            session = call_sessions.restore(
+                request_data.sessionId, request_data.context, request_data.behavior, request_data.chatHistory
+            )
+        context = session.context
+        chat_history = session.chat_history()
+        behavior = session.behavior
     else:
-        system_prompt_template = (
-            "You are an AI simulating a customer in a telecalling scenario.\n\n"
-            "SCENARIO CONTEXT:\n"
-            "{context}\n\n"
-            "BEHAVIOR PATTERN:\n"
-            "{behavior}\n\n"
-            "INSTRUCTIONS:\n"
-            "1. Follow the scenario context to understand the situation and background\n"
-            "2. Adopt the specified behavior pattern in your responses\n"
-            "3. Maintain consistency with both the scenario and behavior throughout the conversation\n"
-            "4. Keep responses natural and realistic while exhibiting the assigned traits\n"
-            "5. Pay attention to the conversation history for context\n\n"
-            "CONVERSATION HISTORY:\n"
-            "{chat_history}\n\n"
-            "CURRENT MESSAGE FROM AGENT:\n"
-            "{input}\n\n"
-            "Respond as the customer, ensuring your response aligns with both the scenario context and behavior pattern."
-        ).strip()
-
-    chat_prompt = ChatPromptTemplate.from_messages([
-        ("system", system_prompt_template)
-    ])
-
-    # Compose the conversation chain by combining the prompt template with the LLM
-    conversation_chain = chat_prompt | llm
+        context = request_data.context
+        chat_history = request_data.chatHistory
+        behavior = request_data.behavior
+
+    # Sessions know their call type; otherwise detect banking vs telecalling from the context
+    call_type = (session.call_type if session is not None else None) or prompt_registry.resolve(context)
+
+    # Prompt template and chain compiled once per call type
+    conversation_chain = prompt_registry.chain(call_type)
 
     try:
         response_obj = conversation_chain.invoke({
@@ -395,7 +456,12 @@ def send_message(request_data: SendMessageRequest):
             "behavior": behavior
         })
         response = response_obj.content if hasattr(response_obj, "content") else str(response_obj)
-        return {"response": response.strip()}
+        response = response.strip()
+        if session is not None:
+            session.append(f"Agent: {user_message}", f"Customer: {response}")
+            # Summarize messages that left the window after the reply is sent
+            background_tasks.add_task(call_sessions.fold, session)
+        return {"response": response}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -0,0 +1,91 @@
+"""
+Prompt Chain Benchmark
+----------------------
+Measures the per-message overhead of send_message before the LLM call:
+building the system prompt, ChatPromptTemplate and chain on every request
+(previous behavior) versus reusing the chains compiled by the prompt
+registry. The LLM is replaced by a stub, so the numbers are pure local
+overhead.
+
+Usage (from the TCMBOT directory):
+    python benchmarks/prompt_chains.py
+    python benchmarks/prompt_chains.py --messages 20000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+TCMBOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, TCMBOT_DIR)
+
+from langchain_core.messages import AIMessage
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+from prompt_registry import (
+    PromptRegistry, register_default_call_types, BANKING_CUSTOMER_TEMPLATE, TELECALLING_CUSTOMER_TEMPLATE
+)
+
+stub_llm = RunnableLambda(lambda prompt_value: AIMessage(content="Okay, tell me more."))
+
+CONTEXTS = [
+    "Title: Prompt 2: Busy Customer\nScenario: The customer indicates they are busy.\nExample Conversation: ...\nKeywords: busy, callback",
+    "Title: Premium Account Holder\nCustomerType: A long-time premium customer asking about account benefits."
+]
+
+
+def legacy_chain(context):
+    """What send_message did on every message."""
+    template = (BANKING_CUSTOMER_TEMPLATE if "CustomerType:" in context else TELECALLING_CUSTOMER_TEMPLATE).strip()
+    chat_prompt = ChatPromptTemplate.from_messages([("system", template)])
+    return chat_prompt | stub_llm
+
+
+def inputs(context, turn):
+    return {
+        "input": f"Agent message number {turn}",
+        "context": context,
+        "chat_history": "Customer: Hello\nAgent: Good afternoon\n" * 4,
+        "behavior": "Polite and patient"
+    }
+
+
+def timed(make_chain, count, invoke):
+    """Median microseconds per message over five passes."""
+    runs = []
+    for _ in range(5):
+        started = time.perf_counter()
+        for turn in range(count):
+            context = CONTEXTS[turn % len(CONTEXTS)]
+            chain = make_chain(context)
+            if invoke:
+                chain.invoke(inputs(context, turn))
+        runs.append((time.perf_counter() - started) / count * 1e6)
+    return statistics.median(runs)
+
+
+def main(args):
+    registry = PromptRegistry(stub_llm, default="telecalling")
+    register_default_call_types(registry)
+
+    def registry_chain(context):
+        return registry.chain(registry.resolve(context))
+
+    # Same prompt text either way
+    for context in CONTEXTS:
+        expected = legacy_chain(context).first.format_messages(**inputs(context, 0))
+        assert registry_chain(context).first.format_messages(**inputs(context, 0)) == expected
+
+    print(f"Chain setup only       per request {timed(legacy_chain, args.messages, False):8.1f} us"
+          f"   registry {timed(registry_chain, args.messages, False):8.2f} us")
+    print(f"Setup + format + stub  per request {timed(legacy_chain, args.messages, True):8.1f} us"
+          f"   registry {timed(registry_chain, args.messages, True):8.1f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-message prompt chain overhead in send_message")
+    parser.add_argument("--messages", type=int, default=2000)
+    main(parser.parse_args())
@@ -0,0 +1,278 @@
+"""
+Call Sessions
+-------------
+This module keeps the state of each call started by /api/start_call or
+/api/start_customer_call on the server, so /api/send_message only needs the
+session id and the new message instead of the full context and chat
+history, and the prompt stops growing with every turn.
+
+Key components:
+1. CallSession: stored context and behavior plus an appendable history
+2. Rolling window: the most recent messages go to the prompt verbatim and
+   older ones are folded into a running summary, a batch at a time
+3. Thread-safe in-memory store with idle expiry and an LRU size cap
+4. Session restore from the client's copy of the call, after expiry or a restart
+5. Session and summary metrics for monitoring
+
+Folding runs after the reply is sent. Until a fold finishes, the messages
+it covers are still sent verbatim, so nothing drops out of the prompt.
+
+Settings:
+    CALL_SESSION_TTL_SECONDS   Idle time before a session expires (default 3600)
+    CALL_SESSION_MAX_ENTRIES   Sessions kept before the least recently used is dropped (default 5000)
+    CALL_HISTORY_WINDOW        Messages always sent verbatim (default 8)
+    CALL_SUMMARY_BATCH         Messages past the window that trigger a fold (default 6)
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+CALL_SESSION_TTL_SECONDS = float(os.environ.get("CALL_SESSION_TTL_SECONDS", "3600"))
+CALL_SESSION_MAX_ENTRIES = int(os.environ.get("CALL_SESSION_MAX_ENTRIES", "5000"))
+CALL_HISTORY_WINDOW = int(os.environ.get("CALL_HISTORY_WINDOW", "8"))
+CALL_SUMMARY_BATCH = int(os.environ.get("CALL_SUMMARY_BATCH", "6"))
+
+# Longest summary kept when the summarizer is unavailable
+FALLBACK_SUMMARY_CHARS = 1500
+FALLBACK_LINE_CHARS = 160
+
+
+def fallback_summary(summary: str, lines: List[str]) -> str:
+    """Fold messages into the summary without an LLM: clipped lines, newest kept."""
+    clipped = [line if len(line) <= FALLBACK_LINE_CHARS else line[:FALLBACK_LINE_CHARS] + "..." for line in lines]
+    combined = " ".join(part for part in [summary] + clipped if part)
+    return combined[-FALLBACK_SUMMARY_CHARS:]
+
+
+class CallSession:
+    """Context, behavior and history of one call."""
+
+    def __init__(
+        self,
+        session_id: str,
+        context: str,
+        behavior: str,
+        history: Iterable[str] = (),
+        call_type: Optional[str] = None
+    ):
+        """
+        Args:
+            session_id: Id returned to the client
+            context: Scenario or customer context for the system prompt
+            behavior: Behavior pattern for the system prompt
+            history: Initial messages, e.g. the customer's greeting
+            call_type: Prompt registry call type; None to detect it from the context
+        """
+        self.id = session_id
+        self.context = context
+        self.behavior = behavior
+        self.call_type = call_type
+        self.history: List[str] = list(history)
+        self.summary = ""
+        self.summarized_messages = 0
+        self.last_access = time.monotonic()
+        self._lock = threading.Lock()
+        self._folding = False
+
+    def append(self, *lines: str) -> None:
+        """Append messages formatted as "Speaker: text"."""
+        with self._lock:
+            self.history.extend(lines)
+
+    def chat_history(self) -> str:
+        """The prompt's conversation history: summary of older turns plus the recent messages."""
+        with self._lock:
+            recent = "".join(f"{line}\n" for line in self.history)
+            if not self.summary:
+                return recent
+            return f"Summary of the earlier conversation: {self.summary}\n{recent}"
+
+    def take_overflow(self, window: int, batch: int) -> Optional[Tuple[str, List[str]]]:
+        """
+        Reserve the messages that fell out of the window for folding.
+
+        Returns:
+            (current summary, messages to fold), or None if there is nothing
+            to fold yet or another fold is running
+        """
+        with self._lock:
+            if self._folding or len(self.history) < window + batch:
+                return None
+            self._folding = True
+            return self.summary, self.history[:len(self.history) - window]
+
+    def finish_fold(self, folded: int, summary: Optional[str]) -> None:
+        """
+        Replace the folded messages with the new summary.
+
+        Args:
+            folded: Number of messages from take_overflow
+            summary: New summary, or None to keep the messages (fold failed)
+        """
+        with self._lock:
+            if summary is not None:
+                # Only appends happen meanwhile, so the folded messages are still first
+                del self.history[:folded]
+                self.summary = summary
+                self.summarized_messages += folded
+            self._folding = False
+
+
+class CallSessionStore:
+    """In-memory call sessions with idle expiry and an LRU cap."""
+
+    def __init__(
+        self,
+        summarize: Callable[[str, List[str]], str],
+        ttl_seconds: float = CALL_SESSION_TTL_SECONDS,
+        max_entries: int = CALL_SESSION_MAX_ENTRIES,
+        window: int = CALL_HISTORY_WINDOW,
+        batch: int = CALL_SUMMARY_BATCH
+    ):
+        """
+        Args:
+            summarize: (previous summary, messages) -> new summary; may raise,
+                in which case fallback_summary is used
+            ttl_seconds: Idle time after which a session expires
+            max_entries: Maximum number of sessions kept at once
+            window: Messages always sent verbatim
+            batch: Messages past the window that trigger a fold
+        """
+        self.summarize = summarize
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.window = window
+        self.batch = max(1, batch)
+        self._sessions: "OrderedDict[str, CallSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._created = 0
+        self._restored = 0
+        self._expired = 0
+        self._evicted = 0
+        self._misses = 0
+        self._folds = 0
+        self._fold_failures = 0
+
+    def _purge_expired(self, now: float) -> None:
+        # Sessions are kept in access order, so expired ones are at the front
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_access <= self.ttl_seconds:
+                break
+            self._sessions.popitem(last=False)
+            self._expired += 1
+
+    def create(
+        self,
+        context: str,
+        behavior: str,
+        history: Iterable[str] = (),
+        call_type: Optional[str] = None
+    ) -> CallSession:
+        """Start a session and return it; its id goes back to the client."""
+        session = CallSession(uuid.uuid4().hex, context, behavior, history, call_type)
+        with self._lock:
+            self._add(session)
+            self._created += 1
+        return session
+
+    def restore(self, session_id: str, context: str, behavior: str, chat_history: str) -> CallSession:
+        """
+        Rebuild an expired or lost session (e.g. after a restart) from the client's copy.
+
+        Blocking (may call the summarizer): messages before the window are
+        folded into the summary right away, so a long call does not go to the
+        LLM verbatim.
+
+        Args:
+            session_id: Id the client still holds; the session keeps it
+            context: Context returned when the call started
+            behavior: Behavior returned when the call started
+            chat_history: Client transcript, one "Speaker: text" message per line
+
+        Returns:
+            The restored session, or the live one if another request restored it first
+        """
+        history = [line for line in chat_history.splitlines() if line.strip()]
+        session = CallSession(session_id, context, behavior, history)
+        with self._lock:
+            existing = self._sessions.get(session_id)
+            if existing is not None:
+                return existing
+            self._add(session)
+            self._restored += 1
+        self.fold(session, batch=1)
+        return session
+
+    def _add(self, session: CallSession) -> None:
+        """Store a session, dropping expired and least recently used ones. Caller must hold the lock."""
+        self._purge_expired(session.last_access)
+        while len(self._sessions) >= self.max_entries:
+            self._sessions.popitem(last=False)
+            self._evicted += 1
+        self._sessions[session.id] = session
+
+    def get(self, session_id: str) -> Optional[CallSession]:
+        """Return the session and refresh its idle timer, or None if unknown or expired."""
+        now = time.monotonic()
+        with self._lock:
+            self._purge_expired(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                self._misses += 1
+                return None
+            session.last_access = now
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def fold(self, session: CallSession, batch: Optional[int] = None) -> bool:
+        """
+        Fold the messages that fell out of the window into the summary.
+
+        Blocking (may call the summarizer); run it after the response.
+
+        Args:
+            session: Session to fold
+            batch: Messages past the window needed to fold; defaults to the store's batch
+
+        Returns:
+            True if messages were folded
+        """
+        overflow = session.take_overflow(self.window, batch or self.batch)
+        if overflow is None:
+            return False
+        summary, lines = overflow
+
+        try:
+            new_summary = self.summarize(summary, lines).strip() or fallback_summary(summary, lines)
+        except Exception as e:
+            print(f"Summarizing call {session.id} failed, clipping the history instead: {e}")
+            self._fold_failures += 1
+            new_summary = fallback_summary(summary, lines)
+
+        session.finish_fold(len(lines), new_summary)
+        self._folds += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Return session counts and summary metrics for monitoring."""
+        with self._lock:
+            active = len(self._sessions)
+        return {
+            "active": active,
+            "created": self._created,
+            "restored": self._restored,
+            "expired": self._expired,
+            "evicted": self._evicted,
+            "misses": self._misses,
+            "folds": self._folds,
+            "fold_failures": self._fold_failures,
+            "window": self.window,
+            "batch": self.batch,
+            "ttl_seconds": self.ttl_seconds
+        }
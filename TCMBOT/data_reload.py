@@ -0,0 +1,185 @@
+"""
+Data Reload
+-----------
+This module watches the CSV data files and reloads the ones whose content
+changed, so catalog and scenario edits go live without a restart (which
+would drop every in-memory conversation).
+
+Key components:
+1. Cheap change detection by mtime and size, confirmed by a content hash so
+   a touched but unchanged file is not reloaded
+2. One reload callback per file, so only the affected data is rebuilt
+3. Background polling loop that runs reloads off the event loop
+4. Reload metrics for monitoring
+
+Callbacks build the new data completely and then swap it in with a single
+assignment, so requests see either the old or the new version, never a mix.
+A callback that raises keeps the old data; the same content is not retried
+until the file changes again.
+
+Settings:
+    DATA_RELOAD_INTERVAL_SECONDS   Polling interval, 0 disables watching (default 30)
+"""
+
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+DATA_RELOAD_INTERVAL_SECONDS = float(os.environ.get("DATA_RELOAD_INTERVAL_SECONDS", "30"))
+
+
+def file_digest(path: str) -> str:
+    """Return the sha256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class WatchedFile:
+    """A data file and the reload callback for it."""
+
+    def __init__(self, name: str, path: str, on_change: Callable[[str], None]):
+        self.name = name
+        self.path = path
+        self.on_change = on_change
+        self.mtime_ns, self.size = self.stat()
+        self.digest = file_digest(path) if self.mtime_ns is not None else None
+        self.failed_digest: Optional[str] = None
+        self.reloads = 0
+        self.failures = 0
+        self.last_reload: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def stat(self):
+        """Return (mtime_ns, size), or (None, None) while the file is missing."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None, None
+        return stat.st_mtime_ns, stat.st_size
+
+
+class DataReloader:
+    """Polls watched files and reloads the ones whose content changed."""
+
+    def __init__(self, interval: float = DATA_RELOAD_INTERVAL_SECONDS):
+        """
+        Args:
+            interval: Seconds between checks; 0 disables the background loop
+        """
+        self.interval = interval
+        self._files: Dict[str, WatchedFile] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._checks = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def watch(self, name: str, path: str, on_change: Callable[[str], None]) -> None:
+        """
+        Start watching a file. Its current content counts as already loaded.
+
+        Args:
+            name: Short name used in logs and stats
+            path: File to watch
+            on_change: Called with the path when the content changed; should
+                load the file and swap the new data in
+        """
+        with self._lock:
+            self._files[name] = WatchedFile(name, path, on_change)
+
+    def check(self) -> List[str]:
+        """
+        Reload every watched file whose content changed since the last check.
+
+        Blocking; async callers should run it in a thread.
+
+        Returns:
+            Names of the files that were reloaded
+        """
+        reloaded = []
+        # Only one check at a time, so a slow rebuild is never run twice
+        with self._lock:
+            self._checks += 1
+            for watched in self._files.values():
+                mtime_ns, size = watched.stat()
+                if mtime_ns is None or (mtime_ns, size) == (watched.mtime_ns, watched.size):
+                    continue
+
+                try:
+                    digest = file_digest(watched.path)
+                except OSError:
+                    continue
+
+                watched.mtime_ns, watched.size = mtime_ns, size
+                if digest == watched.digest or digest == watched.failed_digest:
+                    continue
+
+                started = time.monotonic()
+                try:
+                    watched.on_change(watched.path)
+                except Exception as e:
+                    watched.failures += 1
+                    watched.failed_digest = digest
+                    watched.last_error = str(e)
+                    print(f"Reloading {watched.name} from {watched.path} failed, keeping the previous data: {e}")
+                    continue
+
+                watched.digest = digest
+                watched.failed_digest = None
+                watched.last_error = None
+                watched.reloads += 1
+                watched.last_reload = time.time()
+                reloaded.append(watched.name)
+                print(f"Reloaded {watched.name} from {watched.path} in {(time.monotonic() - started) * 1000:.0f}ms")
+        return reloaded
+
+    async def run(self) -> None:
+        """Check the watched files every interval until cancelled."""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.check)
+            except Exception as e:
+                print(f"Data reload check failed: {e}")
+
+    def start(self) -> None:
+        """Start the background loop. Must be called from the running event loop."""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Cancel the background loop."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return per-file reload metrics for monitoring."""
+        return {
+            "interval_seconds": self.interval,
+            "running": self._task is not None,
+            "checks": self._checks,
+            "files": {
+                watched.name: {
+                    "path": watched.path,
+                    "digest": watched.digest[:16] if watched.digest else None,
+                    "reloads": watched.reloads,
+                    "failures": watched.failures,
+                    "last_reload": watched.last_reload,
+                    "last_error": watched.last_error
+                }
+                for watched in self._files.values()
+            }
+        }
@@ -0,0 +1,180 @@
+"""
+LLM Transport
+-------------
+This module owns the HTTP connection pools used for all LLM traffic, so the
+Groq SDK clients and LangChain ChatGroq instances share keep-alive
+connections instead of each opening (and TLS-handshaking) their own.
+
+Key components:
+1. One lazily created sync and one async httpx client per process
+2. HTTP/2 keep-alive when the optional `h2` package is installed
+3. Pool size and timeout settings from environment variables
+4. Connection reuse metrics collected from httpcore trace events
+5. Response listeners, e.g. for rate-limit headers and 429s
+
+Settings:
+    LLM_HTTP2                 Use HTTP/2 when available (default True)
+    LLM_MAX_CONNECTIONS       Maximum open connections per pool (default 100)
+    LLM_MAX_KEEPALIVE         Idle keep-alive connections kept per pool (default 20)
+    LLM_KEEPALIVE_EXPIRY      Seconds an idle connection is kept (default 60)
+    LLM_CONNECT_TIMEOUT       Connect timeout in seconds (default 5)
+    LLM_READ_TIMEOUT          Read timeout in seconds (default 60)
+"""
+
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+try:
+    import h2  # noqa: F401 - httpx needs it for HTTP/2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+LLM_HTTP2 = os.environ.get("LLM_HTTP2", "True").lower() == "true" and HTTP2_AVAILABLE
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE = int(os.environ.get("LLM_MAX_KEEPALIVE", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.environ.get("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.environ.get("LLM_READ_TIMEOUT", "60"))
+
+
+class TransportMetrics:
+    """Counts requests against new TCP connections and TLS handshakes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+        self.errors = 0
+
+    def _record(self, event_name: str) -> None:
+        with self._lock:
+            if event_name == "connection.connect_tcp.complete":
+                self.new_connections += 1
+            elif event_name == "connection.start_tls.complete":
+                self.tls_handshakes += 1
+
+    def trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        """httpcore trace callback for the sync client."""
+        self._record(event_name)
+
+    async def atrace(self, event_name: str, info: Dict[str, Any]) -> None:
+        """httpcore trace callback for the async client."""
+        self._record(event_name)
+
+    def on_request(self, request: httpx.Request) -> None:
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self.trace
+
+    async def on_request_async(self, request: httpx.Request) -> None:
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self.atrace
+
+    def on_response(self, response: httpx.Response) -> None:
+        if response.status_code >= 400:
+            with self._lock:
+                self.errors += 1
+        for listener in _response_listeners:
+            try:
+                listener(response)
+            except Exception as e:
+                print(f"LLM transport: response listener failed: {e}")
+
+    async def on_response_async(self, response: httpx.Response) -> None:
+        self.on_response(response)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            reused = max(0, self.requests - self.new_connections)
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "tls_handshakes": self.tls_handshakes,
+                "reused_connections": reused,
+                "reuse_rate": reused / self.requests if self.requests else 0.0,
+                "error_responses": self.errors
+            }
+
+
+_response_listeners: List[Callable[[httpx.Response], None]] = []
+
+sync_metrics = TransportMetrics()
+async_metrics = TransportMetrics()
+
+_http_client: Optional[httpx.Client] = None
+_async_http_client: Optional[httpx.AsyncClient] = None
+_client_lock = threading.Lock()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+
+
+def get_http_client() -> httpx.Client:
+    """Return the process-wide sync HTTP client for LLM calls."""
+    global _http_client
+    with _client_lock:
+        if _http_client is None or _http_client.is_closed:
+            _http_client = httpx.Client(
+                http2=LLM_HTTP2,
+                limits=_limits(),
+                timeout=_timeout(),
+                event_hooks={"request": [sync_metrics.on_request], "response": [sync_metrics.on_response]}
+            )
+        return _http_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Return the process-wide async HTTP client for LLM calls."""
+    global _async_http_client
+    with _client_lock:
+        if _async_http_client is None or _async_http_client.is_closed:
+            _async_http_client = httpx.AsyncClient(
+                http2=LLM_HTTP2,
+                limits=_limits(),
+                timeout=_timeout(),
+                event_hooks={"request": [async_metrics.on_request_async], "response": [async_metrics.on_response_async]}
+            )
+        return _async_http_client
+
+
+def add_response_listener(listener: Callable[[httpx.Response], None]) -> None:
+    """Call `listener` with every LLM response received on either client."""
+    _response_listeners.append(listener)
+
+
+async def close_http_clients() -> None:
+    """Close both pools, e.g. on application shutdown."""
+    if _http_client is not None:
+        _http_client.close()
+    if _async_http_client is not None:
+        await _async_http_client.aclose()
+
+
+def transport_stats() -> Dict[str, Any]:
+    """Return pool settings and connection reuse metrics for monitoring."""
+    return {
+        "http2": LLM_HTTP2,
+        "http2_available": HTTP2_AVAILABLE,
+        "max_connections": LLM_MAX_CONNECTIONS,
+        "max_keepalive_connections": LLM_MAX_KEEPALIVE,
+        "keepalive_expiry": LLM_KEEPALIVE_EXPIRY,
+        "connect_timeout": LLM_CONNECT_TIMEOUT,
+        "read_timeout": LLM_READ_TIMEOUT,
+        "sync": sync_metrics.snapshot(),
+        "async": async_metrics.snapshot()
+    }
@@ -0,0 +1,142 @@
+"""
+Prompt Index
+------------
+This module indexes the telecalling scenarios in prompts.csv once at load,
+so starting a call no longer scans the prompts DataFrame with a regex built
+from user input.
+
+Key components:
+1. Exact lookup by lowercased title
+2. Trigram index over the lowercased titles for partial (substring)
+   matches: candidates are the titles containing every trigram of the
+   query, then checked with a plain substring test
+3. Call context string rendered once per scenario
+4. Random scenario selection that excludes used titles with a set
+
+Matching is case-insensitive and literal: characters such as "(" or "+" in
+the input are matched as text, not as regex syntax. An exact title wins;
+otherwise the first title in file order containing the input is used, as
+with the previous str.contains lookup. Rows without a title are skipped.
+"""
+
+import random
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+import pandas as pd
+
+# Random picks tried before falling back to filtering the used titles
+RANDOM_PICK_ATTEMPTS = 8
+
+
+class PromptEntry(NamedTuple):
+    """One telecalling scenario and its rendered call context."""
+    title: str
+    scenario: str
+    example_conversation: str
+    keywords: str
+    context: str
+
+    def to_dict(self) -> Dict[str, str]:
+        """The prompt details in the shape get_prompt_by_scenario returns."""
+        return {
+            'Title': self.title,
+            'Scenario': self.scenario,
+            'Example Conversation': self.example_conversation,
+            'Keywords': self.keywords
+        }
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class PromptIndex:
+    """Telecalling scenarios indexed by title."""
+
+    def __init__(self, df_prompts: pd.DataFrame):
+        """
+        Args:
+            df_prompts: Scenarios as read from prompts.csv
+        """
+        entries: List[PromptEntry] = []
+        for row in df_prompts.to_dict("records"):
+            if not isinstance(row['Title'], str) or not row['Title'].strip():
+                continue
+            context = (
+                f"Title: {row['Title']}\n"
+                f"Scenario: {row['Scenario']}\n"
+                f"Example Conversation: {row['Example Conversation']}\n"
+                f"Keywords: {row['Keywords']}"
+            ).strip()
+            entries.append(PromptEntry(
+                row['Title'], row['Scenario'], row['Example Conversation'], row['Keywords'], context
+            ))
+
+        self.entries = tuple(entries)
+        self.lowered = tuple(entry.title.lower() for entry in entries)
+
+        # The first row wins for a duplicated title, as with iloc[0]
+        self.by_title: Dict[str, int] = {}
+        for position, title in enumerate(self.lowered):
+            self.by_title.setdefault(title, position)
+
+        self.postings: Dict[str, Set[int]] = {}
+        for position, title in enumerate(self.lowered):
+            for gram in trigrams(title):
+                self.postings.setdefault(gram, set()).add(position)
+
+        # Unique titles in file order, for random selection
+        self.titles = tuple(dict.fromkeys(entry.title for entry in entries))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def find(self, scenario_input: str) -> Optional[PromptEntry]:
+        """
+        Find the scenario for a title or part of one.
+
+        Args:
+            scenario_input: Full title or any part of it (any case)
+
+        Returns:
+            The matching scenario, or None
+        """
+        query = scenario_input.lower()
+        position = self.by_title.get(query)
+        if position is not None:
+            return self.entries[position]
+
+        if len(query) < 3:
+            candidates = range(len(self.lowered))
+        else:
+            grams = trigrams(query)
+            postings = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+            candidates = sorted(set.intersection(*postings)) if postings[0] else []
+
+        for position in candidates:
+            if query in self.lowered[position]:
+                return self.entries[position]
+        return None
+
+    def random_title(self, used_scenarios: Iterable[str] = ()) -> Optional[str]:
+        """
+        Pick a random scenario title that is not in used_scenarios.
+
+        Args:
+            used_scenarios: Titles already played in this session
+
+        Returns:
+            A title, or None when every scenario has been used
+        """
+        if not self.titles:
+            return None
+        used = set(used_scenarios)
+
+        # Cheap while most scenarios are still unused
+        for _ in range(RANDOM_PICK_ATTEMPTS):
+            title = random.choice(self.titles)
+            if title not in used:
+                return title
+
+        available = [title for title in self.titles if title not in used]
+        return random.choice(available) if available else None
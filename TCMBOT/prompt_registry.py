@@ -0,0 +1,169 @@
+"""
+Prompt Registry
+---------------
+This module compiles the customer simulation prompts and their LLM chains
+once and reuses them for every message, instead of rebuilding the system
+prompt string, the ChatPromptTemplate and the chain on each request.
+
+Key components:
+1. CallType: a name, a system prompt template and an optional detector
+   that recognizes the call type from a call's context
+2. PromptRegistry: register() hook for new call types, with templates and
+   chains compiled lazily on first use and cached
+3. Call type resolution in registration order, falling back to a default
+4. The built-in telecalling and banking customer templates
+
+Templates receive {context}, {behavior}, {chat_history} and {input}.
+"""
+
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from langchain_core.prompts import ChatPromptTemplate
+
+# ==============================
+# Built-in Templates
+# ==============================
+
+BANKING_CUSTOMER_TEMPLATE = (
+    "You are a real customer in a phone conversation. Keep your responses SHORT and NATURAL like in a real phone call.\n\n"
+    "CUSTOMER DETAILS:\n"
+    "{context}\n\n"
+    "BEHAVIOR PATTERN:\n"
+    "{behavior}\n\n"
+    "INSTRUCTIONS:\n"
+    "1. Keep responses brief and conversational (20-50 words maximum)\n"
+    "2. Don't provide all information at once - reveal details gradually as the conversation progresses\n"
+    "3. Proper initiation of the conversation (greeting, introduction of the issue)\n"
+    "4. Customer is not aware of who is calling so ask for the agent's name and details in case if he is not mentioning it\n"
+    "2. Use natural speech patterns with filler words (um, uh, well, hmm)\n"
+    "3. Ask one question at a time, not multiple questions\n"
+    "4. Respond directly to what the agent just said\n"
+    "6. If the agent resolves your issues completely, naturally end the conversation with a brief thank you and goodbye\n"
+    "7. Show natural impatience or satisfaction depending on how well your needs are being met\n\n"
+    "CONVERSATION PROGRESSION:\n"
+    "- Start with your initial concern\n"
+    "- Ask clarifying questions about solutions\n"
+    "- Express satisfaction or dissatisfaction with proposed solutions\n"
+    "- End the call naturally when your issue is resolved (thank you, goodbye, etc.)\n\n"
+    "CONVERSATION HISTORY:\n"
+    "{chat_history}\n\n"
+    "CURRENT MESSAGE FROM AGENT:\n"
+    "{input}\n\n"
+    "Respond briefly and naturally as a real customer would on a phone call. If your issue is fully resolved, end the conversation politely."
+)
+
+TELECALLING_CUSTOMER_TEMPLATE = (
+    "You are an AI simulating a customer in a telecalling scenario.\n\n"
+    "SCENARIO CONTEXT:\n"
+    "{context}\n\n"
+    "BEHAVIOR PATTERN:\n"
+    "{behavior}\n\n"
+    "INSTRUCTIONS:\n"
+    "1. Follow the scenario context to understand the situation and background\n"
+    "2. Adopt the specified behavior pattern in your responses\n"
+    "3. Maintain consistency with both the scenario and behavior throughout the conversation\n"
+    "4. Keep responses natural and realistic while exhibiting the assigned traits\n"
+    "5. Pay attention to the conversation history for context\n\n"
+    "CONVERSATION HISTORY:\n"
+    "{chat_history}\n\n"
+    "CURRENT MESSAGE FROM AGENT:\n"
+    "{input}\n\n"
+    "Respond as the customer, ensuring your response aligns with both the scenario context and behavior pattern."
+)
+
+
+# ==============================
+# Registry
+# ==============================
+
+
+class CallType(NamedTuple):
+    """A kind of simulated call and the system prompt for it."""
+    name: str
+    template: str
+    detect: Optional[Callable[[str], bool]]
+
+
+class PromptRegistry:
+    """Call types with their prompts and chains compiled once."""
+
+    def __init__(self, llm: Any, default: str):
+        """
+        Args:
+            llm: Model every chain ends in
+            default: Call type used when no detector matches the context
+        """
+        self.llm = llm
+        self.default = default
+        self._call_types: Dict[str, CallType] = {}
+        self._prompts: Dict[str, ChatPromptTemplate] = {}
+        self._chains: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, template: str, detect: Optional[Callable[[str], bool]] = None) -> None:
+        """
+        Add or replace a call type.
+
+        Args:
+            name: Call type name, stored with call sessions
+            template: System prompt template
+            detect: Recognizes the call type from a context string, for
+                requests that arrive without a session; checked in
+                registration order
+        """
+        with self._lock:
+            self._call_types[name] = CallType(name, template.strip(), detect)
+            # Recompile on next use
+            self._prompts.pop(name, None)
+            self._chains.pop(name, None)
+
+    def names(self) -> List[str]:
+        return list(self._call_types)
+
+    def resolve(self, context: str) -> str:
+        """Return the first call type whose detector matches the context, else the default."""
+        for call_type in list(self._call_types.values()):
+            if call_type.detect is not None and call_type.detect(context):
+                return call_type.name
+        return self.default
+
+    def prompt(self, name: str) -> ChatPromptTemplate:
+        """
+        Return the compiled prompt of a call type.
+
+        Raises:
+            KeyError: If the call type is not registered
+        """
+        prompt = self._prompts.get(name)
+        if prompt is None:
+            with self._lock:
+                prompt = self._prompts.get(name)
+                if prompt is None:
+                    prompt = ChatPromptTemplate.from_messages([("system", self._call_types[name].template)])
+                    self._prompts[name] = prompt
+        return prompt
+
+    def chain(self, name: str) -> Any:
+        """
+        Return the prompt | llm chain of a call type.
+
+        Raises:
+            KeyError: If the call type is not registered
+        """
+        chain = self._chains.get(name)
+        if chain is None:
+            prompt = self.prompt(name)
+            with self._lock:
+                chain = self._chains.get(name)
+                if chain is None:
+                    chain = prompt | self.llm
+                    self._chains[name] = chain
+        return chain
+
+
+def register_default_call_types(registry: PromptRegistry) -> None:
+    """Register the telecalling and banking customer prompts."""
+    # Banking customer contexts are built as "Title: ...\nCustomerType: ..."
+    registry.register("banking", BANKING_CUSTOMER_TEMPLATE, detect=lambda context: "CustomerType:" in context)
+    registry.register("telecalling", TELECALLING_CUSTOMER_TEMPLATE)
@@ -0,0 +1,398 @@
+"""
+Analysis Jobs
+-------------
+This module runs conversation analysis in a background worker pool so the
+API can answer immediately with a job id instead of holding the request
+open for the LLM call and the progress writes.
+
+Jobs are idempotent per conversation and user: submitting the same
+conversation at the same history version for the same user returns the
+existing job, so a double-click or an eager trigger followed by the report
+page only pays for one analysis. A request for another user gets its own
+job, so progress is always recorded for the user who asked.
+
+With a MongoDB collection attached, job state is shared by every uvicorn
+worker and pod: a conversation version is claimed with a unique insert, so
+only one worker runs (and pays for) its analysis, and any worker can answer
+a poll for it. Without one, jobs live in process memory and the API must
+run as a single worker.
+
+Key components:
+1. AnalysisJob records with status, timings and the final result
+2. Fixed pool of asyncio workers fed by a FIFO queue
+3. Deduplication keyed on the conversation, history version and user
+4. Optional MongoDB job records shared across workers, expired by a TTL index
+5. Bounded retention of finished jobs and queue metrics
+"""
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from conversation_store import ensure_ttl_index
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class AnalysisJob:
+    """One analysis of a conversation at a given history version."""
+
+    def __init__(self, conversation_id: str, version: int, payload: Dict[str, Any]):
+        """
+        Args:
+            conversation_id: Conversation being analyzed
+            version: Conversation history version the analysis covers
+            payload: Snapshot of everything the worker needs (persona, scenario,
+                history, user_id, ...), so it does not depend on the conversation
+                still being in the store
+        """
+        # False for a view of a job run by another worker
+        self.local = True
+        self.job_id = str(uuid.uuid4())
+        self.conversation_id = conversation_id
+        self.version = version
+        self.payload = payload
+        # User whose progress the analysis is recorded for
+        self.user_id: Optional[str] = payload.get("user_id")
+        self.status = JOB_QUEUED
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._finished = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JOB_DONE, JOB_FAILED)
+
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the job to finish. Returns False if the timeout passed first."""
+        try:
+            await asyncio.wait_for(self._finished.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Public view of the job returned by the poll endpoint."""
+        return {
+            "job_id": self.job_id,
+            "conversation_id": self.conversation_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error
+        }
+
+    @property
+    def claim_key(self) -> str:
+        """MongoDB _id shared by every job for this conversation version and user."""
+        return f"{self.conversation_id}:{self.version}:{self.user_id or ''}"
+
+    def to_document(self) -> Dict[str, Any]:
+        """MongoDB record of the job; the payload stays with the worker running it."""
+        document = self.to_dict()
+        document.update({
+            "_id": self.claim_key,
+            "version": self.version,
+            "user_id": self.user_id,
+            "updated_at": datetime.utcnow()
+        })
+        return document
+
+    def update_from(self, document: Dict[str, Any]) -> None:
+        """Copy status, timings and result from a MongoDB record."""
+        for field in ("status", "started_at", "finished_at", "result", "error"):
+            setattr(self, field, document.get(field))
+
+    @classmethod
+    def from_document(cls, document: Dict[str, Any]) -> "AnalysisJob":
+        """View of a job claimed by another worker."""
+        job = cls(document["conversation_id"], document["version"], {"user_id": document.get("user_id")})
+        job.local = False
+        job.job_id = document["job_id"]
+        job.created_at = document["created_at"]
+        job.update_from(document)
+        return job
+
+
+class AnalysisJobQueue:
+    """Background worker pool for conversation analysis jobs."""
+
+    def __init__(
+        self,
+        run: Callable[[AnalysisJob], Awaitable[Dict[str, Any]]],
+        workers: int = 2,
+        max_finished_jobs: int = 1000,
+        ttl_seconds: float = 24 * 3600,
+        stale_seconds: float = 600,
+        poll_interval: float = 0.5
+    ):
+        """
+        Args:
+            run: Async function that analyzes a job's payload and returns the result
+            workers: Number of jobs analyzed concurrently
+            max_finished_jobs: Finished jobs kept for polling before the oldest are dropped
+            ttl_seconds: Age after which MongoDB removes a job record
+            stale_seconds: Time without progress after which another worker may
+                take over an unfinished job (its worker probably stopped)
+            poll_interval: Seconds between MongoDB reads while waiting for a job
+                run by another worker
+        """
+        self.run = run
+        self.workers = max(1, workers)
+        self.max_finished_jobs = max_finished_jobs
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.poll_interval = poll_interval
+        self.collection = None
+
+        self._jobs: "OrderedDict[str, AnalysisJob]" = OrderedDict()
+        # (conversation_id, user_id) -> job_id of its latest job
+        self._latest: Dict[Tuple[str, Optional[str]], str] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list = []
+
+        self._submitted = 0
+        self._deduplicated = 0
+        self._remote = 0
+        self._completed = 0
+        self._failed = 0
+        self._total_run_seconds = 0.0
+        self._total_wait_seconds = 0.0
+
+    def attach(self, collection) -> None:
+        """Share job state with other workers through this MongoDB collection from now on."""
+        ensure_ttl_index(collection, "updated_at", self.ttl_seconds)
+        collection.create_index("job_id")
+        collection.create_index([("conversation_id", 1), ("created_at", -1)])
+        self.collection = collection
+
+    def start(self) -> None:
+        """Start the worker tasks on the running event loop."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Cancel the worker tasks, e.g. on application shutdown."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, conversation_id: str, version: int, payload: Dict[str, Any]) -> AnalysisJob:
+        """
+        Queue an analysis, or return the existing job for this conversation version and user.
+
+        A failed job is replaced by a new one, so callers can retry.
+
+        Args:
+            conversation_id: Conversation to analyze
+            version: Current history version of the conversation
+            payload: Snapshot passed to the run function; its user_id is part
+                of the job's identity
+
+        Returns:
+            The queued, running or finished job, possibly run by another worker
+        """
+        job = AnalysisJob(conversation_id, version, payload)
+        existing = self._jobs.get(self._latest.get((conversation_id, job.user_id)))
+        if existing is not None and existing.version == version and existing.status != JOB_FAILED:
+            self._deduplicated += 1
+            return existing
+
+        if self.collection is not None:
+            owner = await asyncio.to_thread(self._claim, job)
+            if owner is not None:
+                self._deduplicated += 1
+                self._remote += 1
+                return owner
+
+        self._jobs[job.job_id] = job
+        self._latest[(conversation_id, job.user_id)] = job.job_id
+        self._submitted += 1
+        self._queue.put_nowait(job)
+        self._evict_finished()
+        return job
+
+    async def get(self, job_id: str) -> Optional[AnalysisJob]:
+        """Return the job, looking in MongoDB if another worker runs it."""
+        job = self._jobs.get(job_id)
+        if job is None and self.collection is not None:
+            document = await asyncio.to_thread(self._load, {"job_id": job_id})
+            job = AnalysisJob.from_document(document) if document else None
+        return job
+
+    async def find(self, conversation_id: str, user_id: Optional[str] = None) -> Optional[AnalysisJob]:
+        """
+        Return the latest job for a conversation, if it is still retained.
+
+        Args:
+            conversation_id: Conversation whose job to find
+            user_id: Only return a job recording progress for this user; None
+                for the latest job of any user
+        """
+        job = self._find_local(conversation_id, user_id)
+        if job is None and self.collection is not None:
+            query = {"conversation_id": conversation_id}
+            if user_id is not None:
+                query["user_id"] = user_id
+            document = await asyncio.to_thread(self._load, query)
+            job = AnalysisJob.from_document(document) if document else None
+        return job
+
+    async def wait(self, job: AnalysisJob, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for a job to finish, polling MongoDB if another worker runs it.
+
+        Returns:
+            False if the timeout passed first
+        """
+        if job.local:
+            return await job.wait(timeout)
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not job.finished:
+            delay = self.poll_interval
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                delay = min(delay, remaining)
+            await asyncio.sleep(delay)
+            document = await asyncio.to_thread(self._load, {"job_id": job.job_id})
+            if document is None:
+                # Expired from MongoDB; report it as failed so the caller can retry
+                job.status = JOB_FAILED
+                job.error = "Analysis job record expired"
+            else:
+                job.update_from(document)
+        return True
+
+    def _find_local(self, conversation_id: str, user_id: Optional[str]) -> Optional[AnalysisJob]:
+        if user_id is not None:
+            return self._jobs.get(self._latest.get((conversation_id, user_id)))
+        # Any user: newest retained job for the conversation
+        for job in reversed(self._jobs.values()):
+            if job.conversation_id == conversation_id:
+                return job
+        return None
+
+    def _claim(self, job: AnalysisJob) -> Optional[AnalysisJob]:
+        """
+        Claim the job's conversation version in MongoDB. Blocking; run in a thread.
+
+        Returns:
+            None if this worker should run the job, otherwise the job another
+            worker already runs
+        """
+        document = job.to_document()
+        try:
+            self.collection.insert_one(document)
+            return None
+        except DuplicateKeyError:
+            pass
+        except Exception as e:
+            print(f"Analysis jobs: MongoDB claim failed, running job {job.job_id} in this worker only: {e}")
+            return None
+
+        # Take over a failed job, or one whose worker stopped before finishing
+        stale_before = datetime.utcnow() - timedelta(seconds=self.stale_seconds)
+        fields = {key: value for key, value in document.items() if key != "_id"}
+        try:
+            taken = self.collection.find_one_and_update(
+                {"_id": job.claim_key, "$or": [
+                    {"status": JOB_FAILED},
+                    {"status": {"$in": [JOB_QUEUED, JOB_RUNNING]}, "updated_at": {"$lt": stale_before}}
+                ]},
+                {"$set": fields}
+            )
+            if taken is not None:
+                return None
+            current = self.collection.find_one({"_id": job.claim_key})
+        except Exception as e:
+            print(f"Analysis jobs: MongoDB claim failed, running job {job.job_id} in this worker only: {e}")
+            return None
+        return AnalysisJob.from_document(current) if current else None
+
+    def _load(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return the newest job record matching the query. Blocking; run in a thread."""
+        try:
+            return self.collection.find_one(query, sort=[("created_at", -1)])
+        except Exception as e:
+            print(f"Analysis jobs: MongoDB lookup failed: {e}")
+            return None
+
+    def _persist(self, job: AnalysisJob) -> None:
+        """Write a local job's progress to MongoDB. Blocking; run in a thread."""
+        fields = {key: value for key, value in job.to_document().items() if key != "_id"}
+        try:
+            # Match the job_id too, so a worker whose job was taken over cannot overwrite it
+            self.collection.update_one({"_id": job.claim_key, "job_id": job.job_id}, {"$set": fields})
+        except Exception as e:
+            print(f"Analysis jobs: MongoDB write failed: {e}")
+
+    def _evict_finished(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            job = self._jobs.pop(job_id)
+            if self._latest.get((job.conversation_id, job.user_id)) == job_id:
+                del self._latest[(job.conversation_id, job.user_id)]
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            job.status = JOB_RUNNING
+            job.started_at = time.time()
+            self._total_wait_seconds += job.started_at - job.created_at
+            if self.collection is not None:
+                await asyncio.to_thread(self._persist, job)
+            try:
+                job.result = await self.run(job)
+                job.status = JOB_DONE
+                self._completed += 1
+            except Exception as e:
+                print(f"Analysis job {job.job_id} for conversation {job.conversation_id} failed: {e}")
+                job.error = str(e)
+                job.status = JOB_FAILED
+                self._failed += 1
+            finally:
+                job.finished_at = time.time()
+                self._total_run_seconds += job.finished_at - job.started_at
+                if self.collection is not None:
+                    await asyncio.to_thread(self._persist, job)
+                job._finished.set()
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth, throughput and timing metrics for monitoring."""
+        finished = self._completed + self._failed
+        started = finished + sum(1 for job in self._jobs.values() if job.status == JOB_RUNNING)
+        return {
+            "persistent": self.collection is not None,
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "running": sum(1 for job in self._jobs.values() if job.status == JOB_RUNNING),
+            "retained_jobs": len(self._jobs),
+            "submitted": self._submitted,
+            "deduplicated": self._deduplicated,
+            "run_by_other_workers": self._remote,
+            "completed": self._completed,
+            "failed": self._failed,
+            "average_queue_seconds": self._total_wait_seconds / started if started else 0.0,
+            "average_run_seconds": self._total_run_seconds / finished if finished else 0.0
+        }
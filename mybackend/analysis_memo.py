@@ -0,0 +1,217 @@
+"""
+Analysis Memo
+-------------
+This module remembers finished conversation analyses by a hash of the exact
+analysis inputs (scenario, persona and formatted transcript), so reopening a
+report costs no LLM tokens, and records which conversations were already
+written to a user's training progress, so it does not record a second attempt.
+
+Key components:
+1. In-process LRU of analysis results
+2. Optional MongoDB persistence so results survive restarts and are shared
+   by every worker, expired by a TTL index
+3. Per-conversation record of attempts already written to training progress
+
+The two are keyed differently on purpose: two separate sessions can have
+identical analysis inputs (e.g. short sessions of the same scenario that end
+the same way) and share one analysis result, but each is its own attempt.
+
+All MongoDB calls are blocking; async callers should run them in a thread.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from conversation_store import ensure_ttl_index
+
+
+class AnalysisMemo:
+    """Memo of analysis results keyed by transcript hash."""
+
+    def __init__(self, max_entries: int = 2000, ttl_seconds: float = 30 * 24 * 3600):
+        """
+        Args:
+            max_entries: Results kept in process memory
+            ttl_seconds: Age after which MongoDB expires a persisted result
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.collection = None
+
+        # key -> analysis result
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._memory_hits = 0
+        self._mongo_hits = 0
+        self._misses = 0
+        self._stores = 0
+
+    def attach(self, collection) -> None:
+        """Persist results to this MongoDB collection from now on."""
+        ensure_ttl_index(collection, "created_at", self.ttl_seconds)
+        self.collection = collection
+
+    def _remember(self, key: str, result: Dict[str, Any]) -> None:
+        """Add an entry to the in-process LRU. Caller must hold the lock."""
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the memoized analysis for this key, or None."""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self._memory_hits += 1
+                return result
+
+        if self.collection is not None:
+            try:
+                document = self.collection.find_one({"_id": key})
+            except Exception as e:
+                print(f"Analysis memo: MongoDB lookup failed: {e}")
+                document = None
+            if document is not None and "result" in document:
+                with self._lock:
+                    self._mongo_hits += 1
+                    self._remember(key, document["result"])
+                return document["result"]
+
+        with self._lock:
+            self._misses += 1
+        return None
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """Memoize an analysis result. Only store real LLM analyses, never fallbacks."""
+        with self._lock:
+            self._remember(key, result)
+            self._stores += 1
+
+        if self.collection is not None:
+            try:
+                self.collection.update_one(
+                    {"_id": key},
+                    {"$set": {"result": result, "created_at": datetime.utcnow()}},
+                    upsert=True
+                )
+            except Exception as e:
+                print(f"Analysis memo: MongoDB write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return memo size and hit-rate metrics for monitoring."""
+        with self._lock:
+            hits = self._memory_hits + self._mongo_hits
+            lookups = hits + self._misses
+            return {
+                "persistent": self.collection is not None,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "memory_hits": self._memory_hits,
+                "mongo_hits": self._mongo_hits,
+                "misses": self._misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "stores": self._stores
+            }
+
+
+class RecordedAttempts:
+    """
+    Conversations already written to each user's training progress.
+
+    A conversation is claimed before its attempt is written, so a report
+    opened twice (or analyzed by two workers) records one attempt. With a
+    MongoDB collection attached the claim is a unique insert, which holds
+    across workers.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 30 * 24 * 3600):
+        """
+        Args:
+            max_entries: Claims kept in process memory
+            ttl_seconds: Age after which MongoDB forgets a claim
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.collection = None
+
+        self._claimed: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._recorded = 0
+        self._skipped_writes = 0
+
+    def attach(self, collection) -> None:
+        """Keep claims in this MongoDB collection from now on."""
+        ensure_ttl_index(collection, "created_at", self.ttl_seconds)
+        self.collection = collection
+
+    @staticmethod
+    def _key(conversation_id: str, user_id: str) -> str:
+        return f"{user_id}:{conversation_id}"
+
+    def claim(self, conversation_id: str, user_id: str) -> bool:
+        """
+        Reserve the attempt for this conversation and user.
+
+        Returns:
+            True if the caller should write the attempt, False if it was
+            already recorded (or is being recorded by another request)
+        """
+        key = self._key(conversation_id, user_id)
+        with self._lock:
+            if key in self._claimed:
+                self._skipped_writes += 1
+                return False
+            self._claimed[key] = None
+            while len(self._claimed) > self.max_entries:
+                self._claimed.popitem(last=False)
+
+        if self.collection is not None:
+            try:
+                self.collection.insert_one({
+                    "_id": key,
+                    "user_id": user_id,
+                    "conversation_id": conversation_id,
+                    "created_at": datetime.utcnow()
+                })
+            except DuplicateKeyError:
+                with self._lock:
+                    self._skipped_writes += 1
+                return False
+            except Exception as e:
+                # Still record the attempt; only this process dedupes it
+                print(f"Recorded attempts: MongoDB write failed: {e}")
+        return True
+
+    def release(self, conversation_id: str, user_id: str) -> None:
+        """Give up a claim whose attempt could not be written, so a retry records it."""
+        key = self._key(conversation_id, user_id)
+        with self._lock:
+            self._claimed.pop(key, None)
+
+        if self.collection is not None:
+            try:
+                self.collection.delete_one({"_id": key})
+            except Exception as e:
+                print(f"Recorded attempts: MongoDB delete failed: {e}")
+
+    def mark_recorded(self) -> None:
+        with self._lock:
+            self._recorded += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return how many attempts were recorded and how many duplicate writes were skipped."""
+        with self._lock:
+            return {
+                "persistent": self.collection is not None,
+                "claims_in_memory": len(self._claimed),
+                "recorded": self._recorded,
+                "skipped_progress_writes": self._skipped_writes
+            }
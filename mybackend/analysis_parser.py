@@ -0,0 +1,243 @@
+"""
+Analysis Parser
+---------------
+This module turns the analysis LLM's output into the score dictionary used
+by the reports. It accepts a strict JSON object (JSON mode) and falls back to
+the markdown format requested by the analysis prompt.
+
+Key components:
+1. Strict JSON parsing with type checks and 0-100 clamping
+2. One precompiled pass over the text for the **Overall Score** /
+   **Grammar Score** / **Customer Handling Score** headers
+3. Linear-time suggestion tokenizer: item boundaries are found once with
+   finditer and sliced, instead of lazy DOTALL patterns with lookaheads that
+   rescan the rest of the text for every candidate (quadratic on long or
+   malformed outputs)
+4. The same fallbacks as before, in order: bold numbered items, numbered
+   items, bullets, plain lines
+
+The markdown path returns exactly what the previous regex chain returned;
+benchmarks/analysis_parsing.py checks this on recorded and fuzzed outputs.
+"""
+
+import json
+import re
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional
+
+DEFAULT_SCORE = 50
+MAX_SUGGESTIONS = 5
+
+SCORE_PATTERN = re.compile(r"(overall|grammar|customer (?:handling|respect)) score:?\s*(\d+)", re.IGNORECASE)
+NUMBER_MARKER = re.compile(r"\d+\.\s+")
+BOLD_ITEM_MARKER = re.compile(r"\d+\.\s+\*\*")
+BULLET_ITEM = re.compile(r"[\*\-•]\s+([^\*\-•]*)")
+LEADING_MARKER = re.compile(r"^\d+\.\s+|^[\*\-•]\s+")
+JSON_FENCE = re.compile(r"^```(?:json)?\s*(.*?)\s*```$", re.DOTALL)
+
+CATEGORY_FIELDS = [
+    "grammar", "customer_handling", "communication", "customer_respect", "product_knowledge", "solution_approach"
+]
+
+
+def default_analysis() -> Dict[str, Any]:
+    """Analysis values used for anything the output does not provide."""
+    return {
+        "overall_score": DEFAULT_SCORE,
+        "category_scores": {field: DEFAULT_SCORE for field in CATEGORY_FIELDS},
+        "improvement_suggestions": [],
+        "observations": [],
+        "highlight": "Performance review completed."
+    }
+
+
+# ==============================
+# JSON Mode
+# ==============================
+
+def _score(value: Any) -> Optional[int]:
+    """Coerce a JSON score to an int in 0-100, or None if it is not a number."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value.strip())
+    if isinstance(value, (int, float)):
+        return max(0, min(100, int(round(value))))
+    return None
+
+
+def _strings(value: Any) -> List[str]:
+    if not isinstance(value, list):
+        return []
+    return [item.strip() for item in value if isinstance(item, str) and item.strip()]
+
+
+def strip_json_fence(text: str) -> str:
+    """Remove surrounding whitespace and an optional ```json code fence."""
+    text = text.strip()
+    fenced = JSON_FENCE.match(text)
+    return fenced.group(1) if fenced else text
+
+
+def parse_analysis_json(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Parse a JSON-mode analysis.
+
+    Args:
+        text: Raw model output, optionally wrapped in a ```json fence
+
+    Returns:
+        The analysis dictionary, or None if the text is not a JSON object
+        with an overall score
+    """
+    text = strip_json_fence(text)
+    if not text.startswith("{"):
+        return None
+
+    try:
+        payload = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(payload, dict):
+        return None
+
+    overall = _score(payload.get("overall_score"))
+    if overall is None:
+        return None
+
+    data = default_analysis()
+    data["overall_score"] = overall
+
+    categories = payload.get("category_scores")
+    if isinstance(categories, dict):
+        for field in CATEGORY_FIELDS:
+            score = _score(categories.get(field))
+            if score is not None:
+                data["category_scores"][field] = score
+        # Legacy fields mirror the two reported categories when missing
+        if _score(categories.get("communication")) is None:
+            data["category_scores"]["communication"] = data["category_scores"]["grammar"]
+        if _score(categories.get("customer_respect")) is None:
+            data["category_scores"]["customer_respect"] = data["category_scores"]["customer_handling"]
+
+    suggestions = _strings(payload.get("improvement_suggestions"))[:MAX_SUGGESTIONS]
+    data["improvement_suggestions"] = suggestions
+    data["observations"] = _strings(payload.get("observations"))[:MAX_SUGGESTIONS] or suggestions
+    if isinstance(payload.get("highlight"), str) and payload["highlight"].strip():
+        data["highlight"] = payload["highlight"].strip()
+    return data
+
+
+# ==============================
+# Markdown Output
+# ==============================
+
+def _bold_items(text: str) -> List[str]:
+    """
+    Items shaped like "1. **Title**: details", up to the next such item.
+
+    Matches re.findall(r'\\d+\\.\\s+\\*\\*(.*?)\\*\\*:(.*?)(?=\\d+\\.\\s+\\*\\*|\\Z)', text, re.DOTALL)
+    using precomputed positions instead of rescanning the text per candidate.
+    """
+    markers = list(BOLD_ITEM_MARKER.finditer(text))
+    if not markers:
+        return []
+    starts = [marker.start() for marker in markers]
+
+    items = []
+    index = 0
+    while index < len(markers):
+        title_start = markers[index].end()
+        title_end = text.find("**:", title_start)
+        if title_end == -1:
+            # No later item can close its title either
+            break
+        content_start = title_end + 3
+        next_index = bisect_left(starts, content_start)
+        content_end = starts[next_index] if next_index < len(starts) else len(text)
+        items.append(f"{text[title_start:title_end].strip()}: {text[content_start:content_end].strip()}")
+        if next_index >= len(markers):
+            break
+        index = next_index
+    return items
+
+
+def _numbered_items(text: str) -> List[str]:
+    """Text after each "N. " marker up to the next marker."""
+    markers = list(NUMBER_MARKER.finditer(text))
+    return [
+        text[marker.end():markers[i + 1].start() if i + 1 < len(markers) else len(text)]
+        for i, marker in enumerate(markers)
+    ]
+
+
+def parse_analysis_markdown(text: str) -> Dict[str, Any]:
+    """
+    Extract scores and suggestions from the markdown analysis format.
+
+    Args:
+        text: Raw model output
+
+    Returns:
+        The analysis dictionary; missing values keep their defaults
+    """
+    data = default_analysis()
+
+    # Every score header in one pass; the first occurrence of each wins
+    seen = set()
+    for match in SCORE_PATTERN.finditer(text):
+        kind = match.group(1).lower()
+        kind = "customer" if kind.startswith("customer") else kind
+        if kind in seen:
+            continue
+        seen.add(kind)
+        score = int(match.group(2))
+        if kind == "overall":
+            data["overall_score"] = score
+        elif kind == "grammar":
+            data["category_scores"]["grammar"] = score
+            data["category_scores"]["communication"] = score  # For compatibility
+        else:
+            data["category_scores"]["customer_handling"] = score
+            data["category_scores"]["customer_respect"] = score  # For compatibility
+        if len(seen) == 3:
+            break
+
+    # Numbered bold items are the requested format; fall back to looser shapes
+    suggestions = _bold_items(text)
+    if not suggestions:
+        suggestions = [s.strip() for s in _numbered_items(text) if len(s.strip()) > 10]
+    if not suggestions:
+        suggestions = [s.strip() for s in BULLET_ITEM.findall(text) if len(s.strip()) > 10]
+    if not suggestions:
+        suggestions = [
+            line.strip() for line in text.split("\n")
+            if 15 < len(line.strip()) < 200 and not line.strip().startswith("*")
+        ][:MAX_SUGGESTIONS]
+
+    cleaned_suggestions = []
+    for suggestion in suggestions:
+        # Drop markdown emphasis, then any leading number or bullet
+        cleaned = LEADING_MARKER.sub("", suggestion.replace("*", "").strip(), count=1).strip()
+        if cleaned and len(cleaned) > 10:
+            cleaned_suggestions.append(cleaned)
+
+    if cleaned_suggestions:
+        data["improvement_suggestions"] = cleaned_suggestions[:MAX_SUGGESTIONS]
+        data["observations"] = cleaned_suggestions[:MAX_SUGGESTIONS]
+
+    return data
+
+
+def parse_analysis_output(text: str) -> Dict[str, Any]:
+    """
+    Parse analysis output in JSON mode or the markdown format.
+
+    Args:
+        text: Raw model output
+
+    Returns:
+        Dictionary with overall_score, category_scores, improvement_suggestions,
+        observations and highlight
+    """
+    return parse_analysis_json(text) or parse_analysis_markdown(text)
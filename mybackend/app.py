@@ -17,8 +17,11 @@ from fastapi import Query
 from retail_schema import UserRetailTraining, ScenarioProgress, AttemptModel
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse, Response
 from pydantic import BaseModel
 import pandas as pd
+import asyncio
+import json
 import uuid
 from datetime import datetime
 from typing import List, Dict, Any, Optional
@@ -33,18 +36,86 @@ db = None
 
 # Import conversation manager components
 from conversation_manager import (
-    generate_customer_response,
-    generate_customer_response_direct,  # New direct implementation
-    analyze_conversation,
+    generate_customer_response_async,
+    generate_customer_response_direct_async,  # Non-blocking direct implementation
+    generate_conversation_analysis_async,
+    fallback_analysis,
+    analysis_cache_key,
+    analysis_output_stats,
+    generate_initial_greeting_async,
+    semantic_cache,
+    embedding_engine,
+    llm_scheduler,
+    stream_customer_response,
+    stream_customer_response_direct,
     initialize_product_db,
-    active_conversations,
-    simplify_persona
+    prepare_scenario_products,
+    product_search_stats,
+    simplify_persona,
+    is_conversation_ending,
+    fold_history_summary,
+    history_summary_stats
 )
+from llm_transport import transport_stats, close_http_clients
+from rate_limiter import PRIORITY_BACKGROUND
+from conversation_store import InMemoryConversationStore, MongoConversationStore, ConversationConflictError
+from greeting_pool import GreetingPool
+from analysis_jobs import AnalysisJobQueue, AnalysisJob, JOB_FAILED
+from analysis_memo import AnalysisMemo, RecordedAttempts
+from data_reload import DataReloader
+from catalog import ScenarioCatalog, RecordPool, PersonaRecord, TraitRecord, build_personas, build_traits
+from history_summary import pending_fold, HISTORY_SUMMARY_MODE
 
 # Toggle between direct API and LangChain implementation
 # This allows easy switching between the two approaches
 USE_DIRECT_API = os.environ.get("USE_DIRECT_API", "True").lower() == "true"
 
+# Active conversation storage: "memory" (single process) or "mongo" (shared by all workers/pods)
+CONVERSATION_STORE_BACKEND = os.environ.get("CONVERSATION_STORE", "memory").lower()
+CONVERSATION_TTL_SECONDS = float(os.environ.get("CONVERSATION_TTL_SECONDS", "7200"))
+CONVERSATION_MAX_ENTRIES = int(os.environ.get("CONVERSATION_MAX_ENTRIES", "10000"))
+CONVERSATION_PURGE_INTERVAL = float(os.environ.get("CONVERSATION_PURGE_INTERVAL", "60"))
+
+# Pre-generated greeting pool settings (GREETING_POOL_SIZE=0 disables the pool)
+GREETING_POOL_SIZE = int(os.environ.get("GREETING_POOL_SIZE", "3"))
+GREETING_MAX_AGE_SECONDS = float(os.environ.get("GREETING_MAX_AGE_SECONDS", "3600"))
+GREETING_REFRESH_INTERVAL = float(os.environ.get("GREETING_REFRESH_INTERVAL", "600"))
+GREETING_WARM_CONCURRENCY = int(os.environ.get("GREETING_WARM_CONCURRENCY", "4"))
+
+# Background analysis settings
+ANALYSIS_WORKERS = int(os.environ.get("ANALYSIS_WORKERS", "2"))
+ANALYSIS_WAIT_TIMEOUT = float(os.environ.get("ANALYSIS_WAIT_TIMEOUT", "60"))
+# Job records are shared by all workers/pods through MongoDB; without MongoDB run a single worker
+ANALYSIS_JOB_TTL_HOURS = float(os.environ.get("ANALYSIS_JOB_TTL_HOURS", "24"))
+ANALYSIS_JOB_STALE_SECONDS = float(os.environ.get("ANALYSIS_JOB_STALE_SECONDS", "600"))
+# Start the analysis as soon as a conversation reaches its natural end
+ANALYSIS_EAGER = os.environ.get("ANALYSIS_EAGER", "True").lower() == "true"
+ANALYSIS_MEMO_MAX_ENTRIES = int(os.environ.get("ANALYSIS_MEMO_MAX_ENTRIES", "2000"))
+ANALYSIS_MEMO_TTL_DAYS = float(os.environ.get("ANALYSIS_MEMO_TTL_DAYS", "30"))
+
+# Conversations with a history summary fold in progress in this process
+history_folds_running = set()
+
+# Active conversations storage (replaced with the MongoDB store on startup if configured)
+conversation_store = InMemoryConversationStore(
+    ttl_seconds=CONVERSATION_TTL_SECONDS,
+    max_entries=CONVERSATION_MAX_ENTRIES
+)
+
+async def generate_pooled_greeting(customer: Dict[str, Any], scenario: Dict[str, Any]) -> str:
+    """Generate a greeting for the pool using the configured implementation."""
+    return await generate_initial_greeting_async(
+        customer, scenario, use_direct_api=USE_DIRECT_API, priority=PRIORITY_BACKGROUND
+    )
+
+# Initial greetings pre-generated per (persona, scenario) combination
+greeting_pool = GreetingPool(
+    generate_pooled_greeting,
+    pool_size=GREETING_POOL_SIZE,
+    max_age_seconds=GREETING_MAX_AGE_SECONDS,
+    warm_concurrency=GREETING_WARM_CONCURRENCY
+)
+
 app = FastAPI(title="Retail Sales Training API")
 
 # Enable CORS for local development
@@ -62,12 +133,20 @@ SCENARIOS_CSV = "data/scenarios.csv"
 TRAITS_CSV = "data/traits.csv"
 PRODUCTS_CSV = "data/products.csv"
 
-# Data storage (loaded on startup)
+# Data storage (loaded on startup, replaced when a file changes)
 customers_df = None
 scenarios_df = None
 traits_df = None
 products_df = None
 
+# Indexed records built from the data files, used by the request handlers
+scenario_catalog: Optional[ScenarioCatalog] = None
+persona_pool: Optional[RecordPool[PersonaRecord]] = None
+trait_pool: Optional[RecordPool[TraitRecord]] = None
+
+# Watches the data files and reloads changed ones without a restart
+data_reloader = DataReloader()
+
 # ==============================
 # Pydantic Data Models
 # ==============================
@@ -89,6 +168,33 @@ class ScenarioDetail(Scenario):
     training_focus: str
     ideal_resolution: str
 
+def scenario_summary(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate a scenario row as a /scenarios list item."""
+    return Scenario(
+        scenario_id=row["scenario_id"],
+        title=row["title"],
+        difficulty=row["difficulty"],
+        product_category=row["product_category"],
+        customer_objective=row["customer_objective"],
+        scenario_description=row["scenario_description"]
+    ).dict()
+
+def scenario_detail(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate a scenario row as a /scenarios/{id} body."""
+    return ScenarioDetail(
+        scenario_id=row["scenario_id"],
+        title=row["title"],
+        difficulty=row["difficulty"],
+        product_category=row["product_category"],
+        customer_objective=row["customer_objective"],
+        entry_behavior=row["entry_behavior"],
+        specific_interests=row["specific_interests"],
+        exit_condition=row["exit_condition"],
+        training_focus=row["training_focus"],
+        scenario_description=row["scenario_description"],
+        ideal_resolution=row["ideal_resolution"]
+    ).dict()
+
 class StartConversationRequest(BaseModel):
     """Request model for starting a new conversation"""
     scenario_id: str
@@ -117,6 +223,53 @@ class MessageResponse(BaseModel):
 # App Lifecycle Events
 # ==============================
 
+def read_changed_csv(path: str, current: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """Read a changed data file, rejecting it if it lost columns the loaded data has."""
+    new_df = pd.read_csv(path)
+    if current is not None:
+        missing = set(current.columns) - set(new_df.columns)
+        if missing:
+            raise ValueError(f"missing columns {sorted(missing)}")
+    return new_df
+
+def reload_customers(path: str):
+    """Replace the customer personas."""
+    global customers_df, persona_pool
+    new_customers_df = read_changed_csv(path, customers_df)
+    persona_pool = build_personas(new_customers_df, simplify_persona)
+    customers_df = new_customers_df
+
+def reload_scenarios(path: str):
+    """Replace the scenarios and resolve their candidate products."""
+    global scenarios_df, scenario_catalog
+    new_scenarios_df = read_changed_csv(path, scenarios_df)
+    new_catalog = ScenarioCatalog(new_scenarios_df, scenario_summary, scenario_detail)
+    prepare_scenario_products(new_scenarios_df)
+    scenario_catalog = new_catalog
+    scenarios_df = new_scenarios_df
+
+def reload_traits(path: str):
+    """Replace the behavioral traits."""
+    global traits_df, trait_pool
+    new_traits_df = read_changed_csv(path, traits_df)
+    trait_pool = build_traits(new_traits_df)
+    traits_df = new_traits_df
+
+def reload_products(path: str):
+    """Rebuild the product lookup and index; only changed products are re-embedded."""
+    global products_df
+    new_products_df = read_changed_csv(path, products_df)
+    initialize_product_db(new_products_df, path)
+    products_df = new_products_df
+
+async def purge_expired_conversations():
+    """Periodically drop conversations that passed their idle TTL."""
+    while True:
+        await asyncio.sleep(CONVERSATION_PURGE_INTERVAL)
+        removed = await conversation_store.purge_expired_async()
+        if removed:
+            print(f"Purged {removed} expired conversations")
+
 @app.on_event("startup")
 async def startup_event():
     """
@@ -126,7 +279,8 @@ async def startup_event():
     initializes the product vector database for knowledge retrieval, and
     establishes a connection with MongoDB.
     """
-    global customers_df, scenarios_df, traits_df, products_df, mongo_client, db    
+    global customers_df, scenarios_df, traits_df, products_df, mongo_client, db, conversation_store
+    global scenario_catalog, persona_pool, trait_pool
     print("Loading data files...")
     try:
         customers_df = pd.read_csv(CUSTOMERS_CSV)
@@ -139,8 +293,19 @@ async def startup_event():
         print(f"Loaded {len(traits_df)} behavioral traits")
         print(f"Loaded {len(products_df)} products")
         
+        # Index the records the request handlers read
+        scenario_catalog = ScenarioCatalog(scenarios_df, scenario_summary, scenario_detail)
+        persona_pool = build_personas(customers_df, simplify_persona)
+        trait_pool = build_traits(traits_df)
+        
         # Initialize product knowledge base for retrieval
-        initialize_product_db(products_df)
+        initialize_product_db(products_df, PRODUCTS_CSV)
+        prepare_scenario_products(scenarios_df)
+        
+        data_reloader.watch("customers", CUSTOMERS_CSV, reload_customers)
+        data_reloader.watch("scenarios", SCENARIOS_CSV, reload_scenarios)
+        data_reloader.watch("traits", TRAITS_CSV, reload_traits)
+        data_reloader.watch("products", PRODUCTS_CSV, reload_products)
         
     except Exception as e:
         print(f"Error loading data: {e}")
@@ -184,6 +349,58 @@ async def startup_event():
     except Exception as e:
         print(f"MongoDB setup error: {e}")
         print("WARNING: Application will run but database features will be unavailable")
+        if CONVERSATION_STORE_BACKEND == "mongo":
+            print("WARNING: Falling back to in-memory conversation store")
+    
+    if db is not None:
+        # Share conversation state across workers through MongoDB
+        if CONVERSATION_STORE_BACKEND == "mongo":
+            try:
+                conversation_store = MongoConversationStore(
+                    db.retail_conversations,
+                    ttl_seconds=CONVERSATION_TTL_SECONDS
+                )
+                print("Using MongoDB conversation store")
+            except Exception as e:
+                print(f"MongoDB conversation store setup error: {e}")
+                print("WARNING: Falling back to in-memory conversation store")
+        
+        # Persist memoized analyses so repeat report views survive restarts
+        try:
+            analysis_memo.attach(db.retail_analysis_results)
+        except Exception as e:
+            print(f"Analysis memo setup error, keeping results in memory only: {e}")
+        
+        # Share recorded attempts across workers so each conversation counts once
+        try:
+            recorded_attempts.attach(db.retail_recorded_attempts)
+        except Exception as e:
+            print(f"Recorded attempts setup error, deduping in this process only: {e}")
+        
+        # Share analysis jobs so any worker can answer a poll and each analysis runs once
+        try:
+            analysis_jobs.attach(db.retail_analysis_jobs)
+        except Exception as e:
+            print(f"Analysis job store setup error, jobs need a single worker: {e}")
+    
+    # Expire idle conversations in the background
+    asyncio.create_task(purge_expired_conversations())
+    analysis_jobs.start()
+    data_reloader.start()
+    
+    # Pre-generate greetings for every persona and scenario in the background
+    if greeting_pool.enabled and persona_pool is not None and scenario_catalog is not None:
+        personas = [dict(persona.simplified) for persona in persona_pool.records]
+        scenarios = [record.to_dict() for record in scenario_catalog.records]
+        asyncio.create_task(greeting_pool.warm([(p, s) for p in personas for s in scenarios]))
+        asyncio.create_task(greeting_pool.refresh_loop(GREETING_REFRESH_INTERVAL))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the background workers and close the shared LLM connection pools."""
+    await data_reloader.stop()
+    await analysis_jobs.stop()
+    await close_http_clients()
 
 # ==============================
 # Debug Endpoints
@@ -192,7 +409,7 @@ async def startup_event():
 @app.get("/debug/mongo-status")
 async def debug_mongo_status():
     """Debug endpoint to check MongoDB connection status"""
-    if not mongo_client or not db:
+    if mongo_client is None or db is None:
         return {
             "status": "error", 
             "message": "MongoDB connection not established",
@@ -224,10 +441,76 @@ async def debug_mongo_status():
             "message": str(e)
         }
 
+@app.get("/debug/conversation-store")
+async def debug_conversation_store():
+    """Debug endpoint exposing live conversation count, bytes and eviction metrics"""
+    return await conversation_store.stats_async()
+
+@app.get("/debug/greeting-pool")
+async def debug_greeting_pool():
+    """Debug endpoint exposing greeting pool size and hit rate"""
+    return greeting_pool.stats()
+
+@app.get("/debug/semantic-cache")
+async def debug_semantic_cache():
+    """Debug endpoint exposing semantic response cache size and hit rate"""
+    return semantic_cache.stats()
+
+@app.get("/debug/llm-transport")
+async def debug_llm_transport():
+    """Debug endpoint exposing LLM connection pool settings and reuse metrics"""
+    return transport_stats()
+
+@app.get("/debug/embeddings")
+async def debug_embeddings():
+    """Debug endpoint exposing embedding backend, cache hits and encode latency"""
+    return embedding_engine.stats()
+
+@app.get("/debug/product-search")
+async def debug_product_search():
+    """Debug endpoint exposing how product queries were answered (exact, BM25 or vector)"""
+    return product_search_stats()
+
+@app.get("/debug/data-reload")
+async def debug_data_reload():
+    """Debug endpoint exposing watched data files and their reload history"""
+    return data_reloader.stats()
+
+@app.post("/debug/data-reload")
+async def debug_reload_data():
+    """Check the data files now instead of waiting for the next poll"""
+    reloaded = await asyncio.to_thread(data_reloader.check)
+    return {"reloaded": reloaded}
+
+@app.get("/debug/rate-limiter")
+async def debug_rate_limiter():
+    """Debug endpoint exposing LLM queue depth, wait times and 429 counts"""
+    return llm_scheduler.stats()
+
+@app.get("/debug/analysis-jobs")
+async def debug_analysis_jobs():
+    """Debug endpoint exposing analysis queue depth and job timings"""
+    return analysis_jobs.stats()
+
+@app.get("/debug/analysis-memo")
+async def debug_analysis_memo():
+    """Debug endpoint exposing memoized analysis count and hit rate"""
+    return {**analysis_memo.stats(), "progress": recorded_attempts.stats()}
+
+@app.get("/debug/analysis-output")
+async def debug_analysis_output():
+    """Debug endpoint exposing analysis routes (local heuristic, compact, full) and JSON repair rates"""
+    return analysis_output_stats()
+
+@app.get("/debug/history-summary")
+async def debug_history_summary():
+    """Debug endpoint exposing the history summary settings and fold counts"""
+    return history_summary_stats()
+
 @app.post("/debug/test-insert")
 async def test_insert_document():
     """Test inserting a document into MongoDB"""
-    if not db:
+    if db is None:
         return {"status": "error", "message": "MongoDB connection not established"}
     
     try:
@@ -261,28 +544,27 @@ async def root():
     """Root endpoint to check if the API is running"""
     return {"message": "Retail Sales Training API is running"}
 
+def scenario_records() -> ScenarioCatalog:
+    """The loaded scenario catalog, for handlers that need the records rather than the JSON bodies."""
+    catalog = scenario_catalog
+    if catalog is None:
+        raise HTTPException(status_code=500, detail="Scenario data not loaded")
+    return catalog
+
 @app.get("/scenarios", response_model=List[Scenario])
 async def get_scenarios():
     """
     Get all available training scenarios.
     
     Returns a list of scenarios with basic information that can be used
-    to select a scenario for training.
+    to select a scenario for training. The body is serialized when the
+    scenarios are loaded.
     """
-    if scenarios_df is None:
+    catalog = scenario_catalog
+    if catalog is None:
         raise HTTPException(status_code=500, detail="Scenario data not loaded")
     
-    scenarios = []
-    for _, row in scenarios_df.iterrows():
-        scenarios.append(Scenario(
-            scenario_id=row["scenario_id"],
-            title=row["title"],
-            difficulty=row["difficulty"],
-            product_category=row["product_category"],
-            customer_objective=row["customer_objective"],
-            scenario_description=row["scenario_description"]
-        ))
-    return scenarios
+    return Response(content=catalog.list_json, media_type="application/json")
 
 @app.get("/scenarios/{scenario_id}", response_model=ScenarioDetail)
 async def get_scenario(scenario_id: str):
@@ -298,27 +580,15 @@ async def get_scenario(scenario_id: str):
     Returns:
         Detailed scenario information
     """
-    if scenarios_df is None:
+    catalog = scenario_catalog
+    if catalog is None:
         raise HTTPException(status_code=500, detail="Scenario data not loaded")
     
-    scenario = scenarios_df[scenarios_df["scenario_id"] == scenario_id]
-    if scenario.empty:
+    scenario = catalog.get(scenario_id)
+    if scenario is None:
         raise HTTPException(status_code=404, detail="Scenario not found")
     
-    row = scenario.iloc[0]
-    return ScenarioDetail(
-        scenario_id=row["scenario_id"],
-        title=row["title"],
-        difficulty=row["difficulty"],
-        product_category=row["product_category"],
-        customer_objective=row["customer_objective"],
-        entry_behavior=row["entry_behavior"],
-        specific_interests=row["specific_interests"],
-        exit_condition=row["exit_condition"],
-        training_focus=row["training_focus"],
-        scenario_description=row["scenario_description"],
-        ideal_resolution=row["ideal_resolution"]
-    )
+    return Response(content=scenario.detail_json, media_type="application/json")
 
 @app.post("/conversation/start", response_model=StartConversationResponse)
 async def start_conversation(request: StartConversationRequest):
@@ -334,40 +604,45 @@ async def start_conversation(request: StartConversationRequest):
     Returns:
         Conversation details including ID, customer info, and initial message
     """
-    if scenarios_df is None or customers_df is None or traits_df is None:
+    catalog, personas, traits = scenario_catalog, persona_pool, trait_pool
+    if catalog is None or personas is None or traits is None:
         raise HTTPException(status_code=500, detail="Required data not loaded")
     
     scenario_id = request.scenario_id
     
     # Find the scenario
-    scenario = scenarios_df[scenarios_df["scenario_id"] == scenario_id]
-    if scenario.empty:
+    scenario = catalog.get(scenario_id)
+    if scenario is None:
         raise HTTPException(status_code=404, detail="Scenario not found")
     
     # Select an appropriate customer persona
     # In a more sophisticated system, you could match customer to scenario
-    customer_row = customers_df.sample(1).iloc[0]
+    persona = personas.pick()
     
     # Select random behavioral traits
-    trait_row = traits_df.sample(1).iloc[0]
+    trait = traits.pick()
     
-    # Extract data
-    scenario_data = scenario.iloc[0].to_dict()
-    customer_data = customer_row.to_dict()
-    trait_data = trait_row.to_dict()
+    # Extract data (copies, since the conversation owns them from here on)
+    scenario_data = scenario.to_dict()
+    trait_data = dict(trait.data)
     
-    # Simplify complex personas to focus on key traits
-    # This improves response consistency by focusing on 2-3 distinctive traits
-    simplified_customer_data = simplify_persona(customer_data)
+    # Personas are simplified once at load to focus on 2-3 distinctive traits,
+    # which improves response consistency
+    simplified_customer_data = dict(persona.simplified)
     
     # Generate conversation ID
     conversation_id = str(uuid.uuid4())
     
+    # Serve a pre-generated greeting when one is available
+    initial_message = greeting_pool.take(simplified_customer_data, scenario_data)
+    
     # Choose which implementation to use based on configuration
     # This allows easy switching between direct API and LangChain
-    if USE_DIRECT_API:
+    if initial_message is not None:
+        print("Using pooled greeting")
+    elif USE_DIRECT_API:
         print("Using direct Groq API implementation")
-        initial_message = generate_customer_response_direct(
+        initial_message = await generate_customer_response_direct_async(
             simplified_customer_data,
             scenario_data,
             trait_data,
@@ -376,7 +651,7 @@ async def start_conversation(request: StartConversationRequest):
         )
     else:
         print("Using LangChain implementation")
-        initial_message = generate_customer_response(
+        initial_message = await generate_customer_response_async(
             simplified_customer_data,
             scenario_data,
             trait_data,
@@ -385,7 +660,7 @@ async def start_conversation(request: StartConversationRequest):
         )
     
     # Store conversation context for future reference
-    active_conversations[conversation_id] = {
+    await conversation_store.create_async(conversation_id, {
         "scenario_id": scenario_id,
         "user_id": request.user_id,  # Store user_id in the conversation
         "scenario_data": scenario_data,
@@ -394,7 +669,7 @@ async def start_conversation(request: StartConversationRequest):
         "use_direct_api": USE_DIRECT_API,
         "history": [{"role": "customer", "message": initial_message}],
         "start_time": datetime.now().isoformat()
-    }
+    })
     
     # Return response with initial message
     return StartConversationResponse(
@@ -415,6 +690,36 @@ async def start_conversation(request: StartConversationRequest):
         initial_message=initial_message
     )
 
+async def fold_conversation_history(conversation_id: str, history: List[Dict[str, str]], summary: Optional[Dict[str, Any]]) -> None:
+    """Fold older messages into the conversation's stored summary."""
+    try:
+        new_summary = await fold_history_summary(history, summary)
+        if new_summary is not None:
+            await conversation_store.update_summary_async(conversation_id, new_summary)
+    except Exception as e:
+        print(f"[{conversation_id}] Error updating history summary: {e}")
+    finally:
+        history_folds_running.discard(conversation_id)
+
+def schedule_history_fold(conversation_id: str, conversation: Dict[str, Any]) -> None:
+    """
+    Start a summary fold in the background once enough messages left the window.
+
+    The reply has already been generated, so the fold never delays it; the
+    next prompt summarizes any messages a pending fold has not covered yet.
+    """
+    if HISTORY_SUMMARY_MODE == "off" or conversation_id in history_folds_running:
+        return
+    
+    # Snapshot the history, since later appends change the stored list
+    history = list(conversation["history"])
+    summary = conversation.get("history_summary")
+    if pending_fold(history, summary) is None:
+        return
+    
+    history_folds_running.add(conversation_id)
+    asyncio.create_task(fold_conversation_history(conversation_id, history, summary))
+
 @app.post("/conversation/message", response_model=MessageResponse)
 async def send_message(request: MessageRequest):
     """
@@ -433,15 +738,15 @@ async def send_message(request: MessageRequest):
     conversation_id = request.conversation_id
     user_message = request.message
     
-    # Verify conversation exists
-    if conversation_id not in active_conversations:
-        raise HTTPException(status_code=404, detail="Conversation not found")
-    
     # Get conversation data
-    conversation = active_conversations[conversation_id]
+    conversation = await conversation_store.get_async(conversation_id)
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
     
-    # Add user message to history
-    conversation["history"].append({"role": "user", "message": user_message})
+    # Include the user message in the history used for generation
+    user_entry = {"role": "user", "message": user_message}
+    history = conversation["history"] + [user_entry]
+    version = conversation["version"]
     
     # Use the same implementation method that was used to start the conversation
     use_direct_api = conversation.get("use_direct_api", USE_DIRECT_API)
@@ -449,28 +754,43 @@ async def send_message(request: MessageRequest):
     # Generate customer response using the appropriate method
     if use_direct_api:
         print(f"[{conversation_id}] Using direct API for response")
-        customer_message = generate_customer_response_direct(
+        customer_message = await generate_customer_response_direct_async(
             conversation["customer_data"],
             conversation["scenario_data"],
             conversation["trait_data"],
-            conversation["history"],
-            user_message
+            history,
+            user_message,
+            conversation_id=conversation_id,
+            history_summary=conversation.get("history_summary")
         )
     else:
         print(f"[{conversation_id}] Using LangChain for response")
-        customer_message = generate_customer_response(
+        customer_message = await generate_customer_response_async(
             conversation["customer_data"],
             conversation["scenario_data"],
             conversation["trait_data"],
-            conversation["history"],
-            user_message
+            history,
+            user_message,
+            conversation_id=conversation_id,
+            history_summary=conversation.get("history_summary")
         )
     
-    # Add customer response to conversation history
-    conversation["history"].append({"role": "customer", "message": customer_message})
+    # Add both turns to the stored conversation history, unless another
+    # request changed the conversation while this reply was generated
+    try:
+        updated = await conversation_store.append_history_async(conversation_id, [
+            user_entry,
+            {"role": "customer", "message": customer_message}
+        ], expected_version=version)
+    except ConversationConflictError:
+        raise HTTPException(status_code=409, detail="Conversation was updated by another request, please resend the message")
+    
+    if updated is not None:
+        schedule_history_fold(conversation_id, updated)
     
-    # Update conversation in storage
-    active_conversations[conversation_id] = conversation
+    # Get the report ready before the trainee asks for it
+    if ANALYSIS_EAGER and updated is not None and is_conversation_ending(user_message, history):
+        await submit_analysis(conversation_id, updated)
     
     # Debug output for tracking
     print(f"[{conversation_id}] User: {user_message}")
@@ -478,181 +798,426 @@ async def send_message(request: MessageRequest):
     
     return MessageResponse(customer_message=customer_message)
 
-@app.get("/analysis/{conversation_id}")
-async def get_analysis(conversation_id: str, userId: str = Query(None)):
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Encode one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/conversation/message/stream")
+async def stream_message(request: MessageRequest):
     """
-    Analyze the conversation and generate performance feedback.
-    
-    This endpoint evaluates the sales associate's performance and stores
-    the results in MongoDB if a user ID is provided.
-    
+    Send a message and stream the customer's reply as Server-Sent Events.
+
+    Emits a `token` event for every token as it arrives from the LLM and a
+    final `done` event with the validated, persona-adjusted reply. The
+    conversation history is only updated once the reply is complete, so an
+    aborted stream leaves the conversation unchanged.
+
     Args:
-        conversation_id: ID of the conversation to analyze
-        userId: Optional user ID for storing progress
-        
+        request: Contains conversation_id and message text
+
     Returns:
-        Analysis results including scores and feedback
+        A text/event-stream response
     """
-    if conversation_id not in active_conversations:
+    conversation_id = request.conversation_id
+    user_message = request.message
+
+    conversation = await conversation_store.get_async(conversation_id)
+    if conversation is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
-    
-    # Get conversation data
-    conversation = active_conversations[conversation_id]
-    
-    # Analyze conversation using LLM
-    analysis = analyze_conversation(
-        conversation["customer_data"],
-        conversation["scenario_data"],
-        conversation["history"]
-    )
-    
-    print(f"Analysis type: {type(analysis)}")
-    print(f"Analysis content (preview): {str(analysis)[:100]}...")
-    
-    # Get user_id either from query param or from conversation data
-    user_id = None
-    if userId and userId != "undefined":
-        user_id = userId
+
+    user_entry = {"role": "user", "message": user_message}
+    history = conversation["history"] + [user_entry]
+    version = conversation["version"]
+
+    if conversation.get("use_direct_api", USE_DIRECT_API):
+        events = stream_customer_response_direct(
+            conversation["customer_data"],
+            conversation["scenario_data"],
+            conversation["trait_data"],
+            history,
+            user_message,
+            conversation_id=conversation_id,
+            history_summary=conversation.get("history_summary")
+        )
     else:
-        user_id = conversation.get("user_id")
-        
-      # Don't proceed with DB operations if we still have invalid user_id
-    if not user_id or user_id == "undefined":
-        print("Warning: Invalid user_id, skipping MongoDB storage")
-        return analysis
-    
-    # Store in MongoDB if user_id is provided and MongoDB is connected
-    if db is not None and user_id:
+        events = stream_customer_response(
+            conversation["customer_data"],
+            conversation["scenario_data"],
+            conversation["trait_data"],
+            history,
+            user_message,
+            conversation_id=conversation_id,
+            history_summary=conversation.get("history_summary")
+        )
+
+    async def event_stream():
+        async for event in events:
+            if event["event"] == "done":
+                customer_message = event["customer_message"]
+
+                # Commit both turns together once the reply is final
+                try:
+                    updated = await conversation_store.append_history_async(conversation_id, [
+                        user_entry,
+                        {"role": "customer", "message": customer_message}
+                    ], expected_version=version)
+                except ConversationConflictError:
+                    yield format_sse("error", {"detail": "Conversation was updated by another request, please resend the message"})
+                    return
+
+                if updated is not None:
+                    schedule_history_fold(conversation_id, updated)
+                if ANALYSIS_EAGER and updated is not None and is_conversation_ending(user_message, history):
+                    await submit_analysis(conversation_id, updated)
+
+                print(f"[{conversation_id}] User: {user_message}")
+                print(f"[{conversation_id}] Customer: {customer_message}")
+                yield format_sse("done", {"customer_message": customer_message})
+            else:
+                yield format_sse("token", {"text": event["text"]})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ==============================
+# Analysis Jobs
+# ==============================
+
+def save_analysis_progress(
+    user_id: str,
+    conversation_id: str,
+    scenario_id: str,
+    scenario_title: str,
+    analysis: Dict[str, Any]
+) -> bool:
+    """
+    Record an analysis as a scenario attempt in the user's training progress.
+
+    Makes blocking MongoDB calls, so async code runs it in a worker thread.
+
+    Args:
+        user_id: User whose progress is updated
+        conversation_id: Analyzed conversation
+        scenario_id: Scenario the conversation belongs to
+        scenario_title: Scenario title stored with a first attempt
+        analysis: Analysis result with overall and category scores
+
+    Returns:
+        True if the attempt was stored
+    """
+    try:
+        # Current timestamp
+        current_time = datetime.now()
+
+        # Extract data from analysis object
+        # This handles both dictionary-like objects and class instances
         try:
-            # Current timestamp
-            current_time = datetime.now()
-            
-            # Get scenario details
-            scenario_id = conversation["scenario_id"]
-            scenario_title = conversation["scenario_data"]["title"]
-            
-            # Extract data from analysis object
-            # This handles both dictionary-like objects and class instances
-            try:
-                # Try dictionary-style access first
-                overall_score = analysis["overall_score"]
-                grammar_score = analysis["category_scores"]["grammar"]
-                customer_handling_score = analysis["category_scores"]["customer_handling"]
-                improvement_suggestions = analysis["improvement_suggestions"]
-            except (TypeError, KeyError):
-                # Fall back to attribute access
-                overall_score = getattr(analysis, "overall_score", 0)
-                category_scores = getattr(analysis, "category_scores", {})
-                
-                # Handle category_scores as either dict or object
-                if hasattr(category_scores, "grammar"):
-                    grammar_score = category_scores.grammar
-                    customer_handling_score = category_scores.customer_handling
-                else:
-                    try:
-                        grammar_score = category_scores.get("grammar", 0)
-                        customer_handling_score = category_scores.get("customer_handling", 0)
-                    except AttributeError:
-                        # If all else fails, default to 0
-                        grammar_score = 0
-                        customer_handling_score = 0
-                
-                improvement_suggestions = getattr(analysis, "improvement_suggestions", [])
-            
-            print(f"Creating attempt with scores - overall: {overall_score}, grammar: {grammar_score}, customer: {customer_handling_score}")
-            
-            # Create attempt record with the extracted data
-            attempt = AttemptModel(
-                timestamp=current_time,
-                conversation_id=conversation_id,
-                overall_score=overall_score,
-                grammar_score=grammar_score,
-                customer_handling_score=customer_handling_score,
-                improvement_suggestions=improvement_suggestions
-            )
-            
-            # Try to update an existing scenario in the user's document
-            result = db.user_retail_training.update_one(
-                {
-                    "user_id": user_id,
-                    "scenarios.scenario_id": scenario_id
+            # Try dictionary-style access first
+            overall_score = analysis["overall_score"]
+            grammar_score = analysis["category_scores"]["grammar"]
+            customer_handling_score = analysis["category_scores"]["customer_handling"]
+            improvement_suggestions = analysis["improvement_suggestions"]
+        except (TypeError, KeyError):
+            # Fall back to attribute access
+            overall_score = getattr(analysis, "overall_score", 0)
+            category_scores = getattr(analysis, "category_scores", {})
+
+            # Handle category_scores as either dict or object
+            if hasattr(category_scores, "grammar"):
+                grammar_score = category_scores.grammar
+                customer_handling_score = category_scores.customer_handling
+            else:
+                try:
+                    grammar_score = category_scores.get("grammar", 0)
+                    customer_handling_score = category_scores.get("customer_handling", 0)
+                except AttributeError:
+                    # If all else fails, default to 0
+                    grammar_score = 0
+                    customer_handling_score = 0
+
+            improvement_suggestions = getattr(analysis, "improvement_suggestions", [])
+
+        print(f"Creating attempt with scores - overall: {overall_score}, grammar: {grammar_score}, customer: {customer_handling_score}")
+
+        # Create attempt record with the extracted data
+        attempt = AttemptModel(
+            timestamp=current_time,
+            conversation_id=conversation_id,
+            overall_score=overall_score,
+            grammar_score=grammar_score,
+            customer_handling_score=customer_handling_score,
+            improvement_suggestions=improvement_suggestions
+        )
+
+        # Try to update an existing scenario in the user's document
+        result = db.user_retail_training.update_one(
+            {
+                "user_id": user_id,
+                "scenarios.scenario_id": scenario_id
+            },
+            {
+                "$set": {
+                    "last_updated": current_time,
+                    "scenarios.$.completed": True,
+                    "scenarios.$.last_attempt_date": current_time,
+                    "scenarios.$.latest_score": overall_score,
+                },
+                "$inc": {
+                    "scenarios.$.total_attempts": 1
+                },
+                # Set best_score to max of current and new score
+                "$max": {
+                    "scenarios.$.best_score": overall_score
                 },
+                # Add new attempt to beginning of attempts array, limit to 5
+                "$push": {
+                    "scenarios.$.attempts": {
+                        "$each": [attempt.dict()],
+                        "$position": 0,
+                        "$slice": 5  # Keep only the 5 most recent attempts
+                    }
+                }
+            }
+        )
+
+        # If no document was matched, this is the first time for this scenario
+        if result.matched_count == 0:
+            # Try to update the user document by adding a new scenario
+            user_exists = db.user_retail_training.update_one(
+                {"user_id": user_id},
                 {
-                    "$set": {
-                        "last_updated": current_time,
-                        "scenarios.$.completed": True,
-                        "scenarios.$.last_attempt_date": current_time,
-                        "scenarios.$.latest_score": overall_score,
-                    },
-                    "$inc": {
-                        "scenarios.$.total_attempts": 1
-                    },
-                    # Set best_score to max of current and new score
-                    "$max": {
-                        "scenarios.$.best_score": overall_score
-                    },
-                    # Add new attempt to beginning of attempts array, limit to 5
+                    "$set": {"last_updated": current_time},
                     "$push": {
-                        "scenarios.$.attempts": {
-                            "$each": [attempt.dict()],
-                            "$position": 0,
-                            "$slice": 5  # Keep only the 5 most recent attempts
+                        "scenarios": {
+                            "scenario_id": scenario_id,
+                            "scenario_title": scenario_title,
+                            "completed": True,
+                            "total_attempts": 1,
+                            "first_attempt_date": current_time,
+                            "last_attempt_date": current_time,
+                            "best_score": overall_score,
+                            "latest_score": overall_score,
+                            "attempts": [attempt.dict()]
                         }
                     }
                 }
             )
-            
-            # If no document was matched, this is the first time for this scenario
-            if result.matched_count == 0:
-                # Try to update the user document by adding a new scenario
-                user_exists = db.user_retail_training.update_one(
-                    {"user_id": user_id},
-                    {
-                        "$set": {"last_updated": current_time},
-                        "$push": {
-                            "scenarios": {
-                                "scenario_id": scenario_id,
-                                "scenario_title": scenario_title,
-                                "completed": True,
-                                "total_attempts": 1,
-                                "first_attempt_date": current_time,
-                                "last_attempt_date": current_time,
-                                "best_score": overall_score,
-                                "latest_score": overall_score,
-                                "attempts": [attempt.dict()]
-                            }
-                        }
-                    }
+
+            # If user document doesn't exist yet, create a new one
+            if user_exists.matched_count == 0:
+                new_user_training = UserRetailTraining(
+                    user_id=user_id,
+                    last_updated=current_time,
+                    scenarios=[
+                        ScenarioProgress(
+                            scenario_id=scenario_id,
+                            scenario_title=scenario_title,
+                            completed=True,
+                            total_attempts=1,
+                            first_attempt_date=current_time,
+                            last_attempt_date=current_time,
+                            best_score=overall_score,
+                            latest_score=overall_score,
+                            attempts=[attempt]
+                        )
+                    ]
                 )
-                
-                # If user document doesn't exist yet, create a new one
-                if user_exists.matched_count == 0:
-                    new_user_training = UserRetailTraining(
-                        user_id=user_id,
-                        last_updated=current_time,
-                        scenarios=[
-                            ScenarioProgress(
-                                scenario_id=scenario_id,
-                                scenario_title=scenario_title,
-                                completed=True,
-                                total_attempts=1,
-                                first_attempt_date=current_time,
-                                last_attempt_date=current_time,
-                                best_score=overall_score,
-                                latest_score=overall_score,
-                                attempts=[attempt]
-                            )
-                        ]
-                    )
-                    db.user_retail_training.insert_one(new_user_training.dict(by_alias=True))
-            
-            print(f"User progress saved to MongoDB for user {user_id}")
-            
+                db.user_retail_training.insert_one(new_user_training.dict(by_alias=True))
+
+        print(f"User progress saved to MongoDB for user {user_id}")
+        return True
+        
+    except Exception as e:
+        print(f"Error storing analysis in MongoDB: {e}")
+        return False
+
+def record_analysis_progress(
+    user_id: str,
+    conversation_id: str,
+    scenario_id: str,
+    scenario_title: str,
+    analysis: Dict[str, Any]
+) -> None:
+    """
+    Store the attempt once per conversation and user, so reopening a
+    report does not inflate the attempt count. Blocking; run in a thread.
+
+    Args:
+        user_id: User whose progress is updated
+        conversation_id: Analyzed conversation
+        scenario_id: Scenario the conversation belongs to
+        scenario_title: Scenario title stored with a first attempt
+        analysis: Analysis result with overall and category scores
+    """
+    if not recorded_attempts.claim(conversation_id, user_id):
+        print(f"Conversation {conversation_id} already recorded for user {user_id}, skipping MongoDB storage")
+        return
+    
+    if save_analysis_progress(user_id, conversation_id, scenario_id, scenario_title, analysis):
+        recorded_attempts.mark_recorded()
+    else:
+        recorded_attempts.release(conversation_id, user_id)
+
+async def run_analysis_job(job: AnalysisJob) -> Dict[str, Any]:
+    """Analyze a conversation snapshot and store the result in the user's progress."""
+    payload = job.payload
+    customer, scenario, history = payload["customer_data"], payload["scenario_data"], payload["history"]
+    
+    # Serve a previous analysis of the same transcript without an LLM call
+    memo_key = analysis_cache_key(customer, scenario, history)
+    analysis = await asyncio.to_thread(analysis_memo.get, memo_key)
+    
+    if analysis is not None:
+        print(f"Using memoized analysis for conversation {job.conversation_id}")
+    else:
+        # Analyze conversation using LLM
+        try:
+            analysis = await generate_conversation_analysis_async(customer, scenario, history)
+            await asyncio.to_thread(analysis_memo.put, memo_key, analysis)
         except Exception as e:
-            print(f"Error storing analysis in MongoDB: {e}")
+            print(f"Error analyzing conversation: {e}")
+            # Fallback scores are random, so never memoize them
+            analysis = fallback_analysis(history)
+    
+    print(f"Analysis type: {type(analysis)}")
+    print(f"Analysis content (preview): {str(analysis)[:100]}...")
+    
+    # Don't proceed with DB operations if we have an invalid user_id
+    user_id = payload.get("user_id")
+    if not user_id or user_id == "undefined":
+        print("Warning: Invalid user_id, skipping MongoDB storage")
+    elif db is not None:
+        # Keep the blocking progress writes off the event loop
+        await asyncio.to_thread(
+            record_analysis_progress,
+            user_id,
+            job.conversation_id,
+            payload["scenario_id"],
+            payload["scenario_data"]["title"],
+            analysis
+        )
     
     return analysis
 
+# Finished analyses keyed by transcript hash (persisted to MongoDB on startup)
+analysis_memo = AnalysisMemo(
+    max_entries=ANALYSIS_MEMO_MAX_ENTRIES,
+    ttl_seconds=ANALYSIS_MEMO_TTL_DAYS * 24 * 3600
+)
+
+# Conversations already written to each user's progress (persisted to MongoDB on startup)
+recorded_attempts = RecordedAttempts(ttl_seconds=ANALYSIS_MEMO_TTL_DAYS * 24 * 3600)
+
+# Background worker pool that runs analyses outside the request
+analysis_jobs = AnalysisJobQueue(
+    run_analysis_job,
+    workers=ANALYSIS_WORKERS,
+    ttl_seconds=ANALYSIS_JOB_TTL_HOURS * 3600,
+    stale_seconds=ANALYSIS_JOB_STALE_SECONDS
+)
+
+async def submit_analysis(conversation_id: str, conversation: Dict[str, Any], user_id: Optional[str] = None) -> AnalysisJob:
+    """
+    Queue an analysis of the conversation's current history.
+
+    Returns the existing job if this history version was already submitted
+    for the same user; another user gets a separate job, so progress is
+    recorded for the user who asked.
+
+    Args:
+        conversation_id: Conversation to analyze
+        conversation: Conversation snapshot from the store
+        user_id: User to record progress for; defaults to the conversation's user
+    """
+    if not user_id or user_id == "undefined":
+        user_id = conversation.get("user_id")
+    
+    return await analysis_jobs.submit(conversation_id, conversation["version"], {
+        "user_id": user_id,
+        "scenario_id": conversation["scenario_id"],
+        "scenario_data": conversation["scenario_data"],
+        "customer_data": conversation["customer_data"],
+        "history": list(conversation["history"])
+    })
+
+async def find_or_submit_analysis(conversation_id: str, user_id: Optional[str] = None) -> AnalysisJob:
+    """Submit an analysis, or return the user's last job if the conversation has already expired."""
+    conversation = await conversation_store.get_async(conversation_id)
+    if conversation is not None:
+        return await submit_analysis(conversation_id, conversation, user_id)
+    
+    if user_id == "undefined":
+        user_id = None
+    job = await analysis_jobs.find(conversation_id, user_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return job
+
+@app.post("/analysis/{conversation_id}", status_code=202)
+async def request_analysis(conversation_id: str, userId: str = Query(None)):
+    """
+    Queue a performance analysis of the conversation and return its job.
+    
+    Repeated requests for the same conversation return the same job until
+    the conversation changes.
+    
+    Args:
+        conversation_id: ID of the conversation to analyze
+        userId: Optional user ID for storing progress
+        
+    Returns:
+        The job, including its job_id for polling
+    """
+    job = await find_or_submit_analysis(conversation_id, userId)
+    return job.to_dict()
+
+@app.get("/analysis/jobs/{job_id}")
+async def get_analysis_job(job_id: str):
+    """
+    Poll an analysis job.
+    
+    Args:
+        job_id: ID returned when the analysis was queued
+        
+    Returns:
+        The job status, and the analysis result once it is done
+    """
+    job = await analysis_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Analysis job not found")
+    return job.to_dict()
+
+@app.get("/analysis/{conversation_id}")
+async def get_analysis(conversation_id: str, userId: str = Query(None)):
+    """
+    Analyze the conversation and generate performance feedback.
+    
+    This endpoint evaluates the sales associate's performance and stores
+    the results in MongoDB if a user ID is provided. The analysis runs as a
+    background job; if it was already triggered (e.g. when the conversation
+    ended) the finished result is returned right away.
+    
+    Args:
+        conversation_id: ID of the conversation to analyze
+        userId: Optional user ID for storing progress
+        
+    Returns:
+        Analysis results including scores and feedback, or the pending job
+        with status 202 if it did not finish within ANALYSIS_WAIT_TIMEOUT
+    """
+    job = await find_or_submit_analysis(conversation_id, userId)
+    
+    if not await analysis_jobs.wait(job, ANALYSIS_WAIT_TIMEOUT):
+        return JSONResponse(status_code=202, content=job.to_dict())
+    
+    if job.status == JOB_FAILED:
+        raise HTTPException(status_code=500, detail="Analysis failed, please try again")
+    
+    return job.result
+
 @app.get("/user-progress/{user_id}")
 async def get_user_progress(user_id: str):
     """
@@ -670,9 +1235,10 @@ async def get_user_progress(user_id: str):
     if db is None:
          raise HTTPException(status_code=500, detail="Database connection not available")
     
+    # All available scenarios
+    all_scenarios = [record.data for record in scenario_records().records]
+    
     try:
-        # Get all available scenarios
-        all_scenarios = await get_scenarios()
         
         # Get user's progress document
         user_progress = db.user_retail_training.find_one({"user_id": user_id})
@@ -681,9 +1247,9 @@ async def get_user_progress(user_id: str):
         if not user_progress:
             return [
                 {
-                    "scenario_id": scenario.scenario_id,
-                    "title": scenario.title,
-                    "difficulty": scenario.difficulty, 
+                    "scenario_id": scenario["scenario_id"],
+                    "title": scenario["title"],
+                    "difficulty": scenario["difficulty"],
                     "completed": False,
                     "best_score": None,
                     "attempts": 0
@@ -697,12 +1263,12 @@ async def get_user_progress(user_id: str):
         # Map each scenario to its completion status
         scenario_progress = []
         for scenario in all_scenarios:
-            user_scenario = user_scenarios.get(scenario.scenario_id)
+            user_scenario = user_scenarios.get(scenario["scenario_id"])
             
             scenario_progress.append({
-                "scenario_id": scenario.scenario_id,
-                "title": scenario.title,
-                "difficulty": scenario.difficulty,
+                "scenario_id": scenario["scenario_id"],
+                "title": scenario["title"],
+                "difficulty": scenario["difficulty"],
                 "completed": user_scenario["completed"] if user_scenario else False,
                 "best_score": user_scenario["best_score"] if user_scenario else None,
                 "attempts": user_scenario["total_attempts"] if user_scenario else 0,
@@ -730,13 +1296,15 @@ async def get_scenario_progress(user_id: str, scenario_id: str):
     Returns:
         Detailed progress information for the scenario
     """
-    if not db:
+    if db is None:
         raise HTTPException(status_code=500, detail="Database connection not available")
     
+    # Get the scenario details first
+    scenario_details = scenario_records().get(scenario_id)
+    if scenario_details is None:
+        raise HTTPException(status_code=404, detail="Scenario not found")
+    
     try:
-        # Get the scenario details first
-        scenario_details = await get_scenario(scenario_id)
-        
         # Query for the specific scenario in the user's progress
         user_scenario = db.user_retail_training.find_one(
             {
@@ -750,7 +1318,7 @@ async def get_scenario_progress(user_id: str, scenario_id: str):
         if not user_scenario or "scenarios" not in user_scenario or not user_scenario["scenarios"]:
             return {
                 "scenario_id": scenario_id,
-                "title": scenario_details.title,
+                "title": scenario_details.data["title"],
                 "completed": False,
                 "total_attempts": 0,
                 "first_attempt_date": None,
@@ -773,7 +1341,7 @@ def ensure_user_document(user_id: str):
     Ensure user document exists in the database.
     Creates it if it doesn't exist yet.
     """
-    if not db:
+    if db is None:
         return False
         
     try:
@@ -0,0 +1,219 @@
+"""
+Analysis Parsing Benchmark
+--------------------------
+Checks that analysis_parser returns exactly what the previous regex chain
+in extract_scores_from_text returned, on recorded analysis outputs and on
+fuzzed variants of them (truncated, shuffled, unclosed bold titles), and
+compares parse times, including on long malformed outputs where the old
+lazy DOTALL patterns backtrack quadratically.
+
+Usage (from the mybackend directory):
+    python benchmarks/analysis_parsing.py
+    python benchmarks/analysis_parsing.py --fuzz 20000 --pathological 4000
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from analysis_parser import parse_analysis_markdown, parse_analysis_output
+
+RECORDED_OUTPUTS = [
+    """**Overall Score: 72**
+(The associate was friendly and knowledgeable but rushed the close.)
+
+**Grammar Score: 80**
+(Clear sentences with a few informal phrases.)
+
+**Customer Handling Score: 65**
+(Did not fully adapt to the customer's low patience.)
+
+**Specific Improvement Suggestions:**
+1. **Qualify the budget early**: Ask about the price range before recommending the Galaxy S24 Ultra.
+2. **Summarize the offer**: Recap the EMI options and warranty before asking for the sale.
+3. **Match the customer's pace**: Keep answers short when the customer is impatient.
+""",
+    """Overall Score: 55
+Grammar Score: 70
+Customer Respect Score: 60
+
+Specific Improvement Suggestions:
+1. Listen to the customer's concerns about energy consumption before pitching features.
+2. Explain the 10 year compressor warranty in simple terms.
+3. Offer a comparison between the LG and Samsung refrigerators.
+""",
+    """**Overall Score: 88**
+
+**Grammar Score: 90**
+
+**Customer Handling Score: 85**
+
+**Specific Improvement Suggestions:**
+- Mention the exchange offer when the customer hesitates on price.
+- Confirm delivery and installation timelines before closing.
+- Avoid technical jargon like "inverter duty cycle" with non-technical buyers.
+""",
+    """Here is my analysis of the conversation.
+
+**Overall Score: 40**
+**Grammar Score: 45**
+**Customer Handling Score: 35**
+
+The associate ignored the customer's question about the 5.1 channel soundbar twice.
+The associate should greet the customer and introduce themselves at the start.
+Pricing was never discussed even though the customer asked about EMI.
+""",
+    """**Overall Score: 67**
+**Grammar Score: 75**
+**Customer Handling Score: 60**
+
+**Specific Improvement Suggestions:**
+1. **Ask open questions**: Find out whether the laptop is for gaming, work or study. 2. **Use the specs**: The 16GB RAM and RTX 3050 are strong selling points.
+3. **Close confidently**: Ask "Shall I process your order?" once objections are handled.
+""",
+    """{"overall_score": 78, "category_scores": {"grammar": 82, "customer_handling": 74}, "improvement_suggestions": ["Ask about budget earlier", "Explain the warranty terms clearly", "Summarize before closing"], "highlight": "Handled the price objection well."}"""
+]
+
+
+# ==============================
+# Previous implementation
+# ==============================
+
+def legacy_extract_scores_from_text(text):
+    data = {
+        "overall_score": 50,
+        "category_scores": {
+            "grammar": 50, "customer_handling": 50, "communication": 50,
+            "customer_respect": 50, "product_knowledge": 50, "solution_approach": 50
+        },
+        "improvement_suggestions": [],
+        "observations": [],
+        "highlight": "Performance review completed."
+    }
+    overall_match = re.search(r"Overall Score:?\s*(\d+)", text, re.IGNORECASE)
+    if overall_match:
+        data["overall_score"] = int(overall_match.group(1))
+    grammar_match = re.search(r"Grammar Score:?\s*(\d+)", text, re.IGNORECASE)
+    if grammar_match:
+        score = int(grammar_match.group(1))
+        data["category_scores"]["grammar"] = score
+        data["category_scores"]["communication"] = score
+    customer_match = re.search(r"Customer (Handling|Respect) Score:?\s*(\d+)", text, re.IGNORECASE)
+    if customer_match:
+        score = int(customer_match.group(2))
+        data["category_scores"]["customer_handling"] = score
+        data["category_scores"]["customer_respect"] = score
+
+    suggestions = []
+    suggestion_blocks = re.findall(r'\d+\.\s+\*\*(.*?)\*\*:(.*?)(?=\d+\.\s+\*\*|\Z)', text, re.DOTALL)
+    if suggestion_blocks:
+        for title, content in suggestion_blocks:
+            suggestions.append(f"{title.strip()}: {content.strip()}")
+    if not suggestions:
+        numbered_suggestions = re.findall(r'\d+\.\s+(.*?)(?=\d+\.\s+|\Z)', text, re.DOTALL)
+        if numbered_suggestions:
+            suggestions = [s.strip() for s in numbered_suggestions if len(s.strip()) > 10]
+    if not suggestions:
+        bullet_suggestions = re.findall(r'[\*\-•]\s+(.*?)(?=[\*\-•]|\Z)', text, re.DOTALL)
+        if bullet_suggestions:
+            suggestions = [s.strip() for s in bullet_suggestions if len(s.strip()) > 10]
+    if not suggestions:
+        potential_suggestions = [line.strip() for line in text.split('\n')
+                                 if len(line.strip()) > 15 and len(line.strip()) < 200
+                                 and not line.strip().startswith('*')]
+        suggestions = potential_suggestions[:5]
+    if suggestions:
+        cleaned_suggestions = []
+        for suggestion in suggestions:
+            cleaned = re.sub(r'\*\*|\*', '', suggestion).strip()
+            cleaned = re.sub(r'^\d+\.\s+|^[\*\-•]\s+', '', cleaned).strip()
+            if cleaned and len(cleaned) > 10:
+                cleaned_suggestions.append(cleaned)
+        if cleaned_suggestions:
+            data["improvement_suggestions"] = cleaned_suggestions[:5]
+            data["observations"] = cleaned_suggestions[:5]
+    return data
+
+
+# ==============================
+# Fuzzing
+# ==============================
+
+FRAGMENTS = ["1. ", "2. ", "12. ", "**", "**:", ": ", "* ", "- ", "• ", "\n", "  ", "Score: 7", "Overall Score: ",
+             "grammar score 9", "Customer Respect Score:", "details about EMI ", "x", "3.5 inches", "Rs. 500. "]
+
+
+def mutate(text, rng):
+    """Apply a few random edits that keep the output recognisable."""
+    for _ in range(rng.randint(1, 6)):
+        choice = rng.random()
+        position = rng.randint(0, len(text))
+        if choice < 0.35:
+            text = text[:position] + rng.choice(FRAGMENTS) + text[position:]
+        elif choice < 0.6:
+            text = text[:position] + text[position + rng.randint(1, 20):]
+        elif choice < 0.75:
+            text = text[:position]
+        else:
+            lines = text.split("\n")
+            rng.shuffle(lines)
+            text = "\n".join(lines)
+    return text
+
+
+def random_text(rng):
+    return "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 40)))
+
+
+def timed(fn, text, repeats):
+    runs = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn(text)
+        runs.append(time.perf_counter() - started)
+    return statistics.median(runs)
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    markdown_outputs = [text for text in RECORDED_OUTPUTS if not text.startswith("{")]
+
+    cases = markdown_outputs + [mutate(rng.choice(markdown_outputs), rng) for _ in range(args.fuzz)]
+    cases += [random_text(rng) for _ in range(args.fuzz)]
+    mismatches = [text for text in cases if parse_analysis_markdown(text) != legacy_extract_scores_from_text(text)]
+    print(f"Checked {len(cases)} outputs: {len(mismatches)} mismatches")
+    for text in mismatches[:5]:
+        print(f"  {text[:120]!r}")
+
+    json_result = parse_analysis_output(RECORDED_OUTPUTS[-1])
+    print(f"JSON mode: overall {json_result['overall_score']}, {len(json_result['improvement_suggestions'])} suggestions")
+    print(json.dumps(json_result["category_scores"]))
+
+    typical = RECORDED_OUTPUTS[0]
+    print(f"Typical output   legacy {timed(legacy_extract_scores_from_text, typical, 200) * 1e6:9.1f} us"
+          f"   parser {timed(parse_analysis_output, typical, 200) * 1e6:9.1f} us")
+
+    # Many numbered bold titles that are never closed with "**:"
+    for size in (args.pathological // 4, args.pathological):
+        malformed = "**Overall Score: 60**\n" + "".join(f"{i}. **Point {i} without a colon\n" for i in range(size))
+        print(f"Malformed, {size:5d} items  legacy {timed(legacy_extract_scores_from_text, malformed, 3) * 1000:9.1f} ms"
+              f"   parser {timed(parse_analysis_output, malformed, 3) * 1000:9.1f} ms")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analysis output parser benchmark and fuzz check")
+    parser.add_argument("--fuzz", type=int, default=5000)
+    parser.add_argument("--pathological", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=11)
+    main(parser.parse_args())
@@ -0,0 +1,110 @@
+"""
+Analysis Token Benchmark
+------------------------
+Estimates the analysis token spend of a mix of training sessions (many
+abandoned after a turn or two) with the previous full JSON prompt and with
+the transcript scorer routing: local heuristic analysis below the threshold,
+compact prompt above it. Also times the local scorer per transcript.
+
+Token counts use the same estimate the rate limiter reserves (prompt
+characters / 4 plus the completion budget). No LLM calls are made.
+
+Usage (from the mybackend directory):
+    python benchmarks/analysis_tokens.py
+    python benchmarks/analysis_tokens.py --sessions 5000 --abandoned 0.5
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import pandas as pd
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+import conversation_manager as cm
+from transcript_scorer import score_transcript
+
+AGENT_MESSAGES = [
+    "Hello sir, welcome to our store! My name is Rahul. May I know your name?",
+    "Sure, what budget are you looking at and how will you mainly use it?",
+    "This model is priced at Rs 64,999 and there is a festive discount of 5,000 right now.",
+    "We have no-cost EMI for 6 and 9 months with HDFC and ICICI credit cards.",
+    "It comes with a 2 year warranty and free installation at your home.",
+    "The battery easily lasts a full day and it charges fully in under an hour.",
+    "Compared to the other model, this one has a better processor and more RAM.",
+    "You only need your PAN card and Aadhaar for the EMI application.",
+    "Shall I process your order? I can also check delivery to your area.",
+    "ok",
+    "hi",
+    "wait let me check"
+]
+
+CUSTOMER_MESSAGES = [
+    "Hi, I'm looking for something in this range, what options do you have?",
+    "How much would the monthly payment be with your EMI offers?",
+    "Is there any discount if I pay with my credit card?",
+    "What about the battery life and the camera quality?",
+    "Hmm, that sounds a bit expensive. Let me think about it.",
+    "Okay, that sounds good."
+]
+
+
+def session(rng, agent_turns):
+    history = []
+    for _ in range(agent_turns):
+        history.append({"role": "user", "message": rng.choice(AGENT_MESSAGES)})
+        history.append({"role": "assistant", "message": rng.choice(CUSTOMER_MESSAGES)})
+    return history
+
+
+def full_prompt_tokens(customer, scenario, history):
+    """What the previous analysis reserved: full JSON prompt, last 10 messages."""
+    inputs = cm._analysis_inputs(customer, scenario, history)
+    return cm._langchain_token_estimate(cm.analysis_json_prompt, inputs, cm.ANALYSIS_OUTPUT_TOKENS)
+
+
+def routed_tokens(customer, scenario, history):
+    """What the scorer routing reserves: nothing for trivial sessions, else the compact prompt."""
+    features, inputs = cm._prepare_analysis(customer, scenario, history)
+    if inputs is None:
+        return 0
+    return cm._langchain_token_estimate(cm.analysis_compact_prompt, inputs, cm.ANALYSIS_COMPACT_OUTPUT_TOKENS)
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    scenarios = pd.read_csv("data/scenarios.csv").to_dict("records")
+    customers = pd.read_csv("data/customers.csv").to_dict("records")
+
+    sessions = []
+    for _ in range(args.sessions):
+        turns = rng.randint(1, 2) if rng.random() < args.abandoned else rng.randint(3, 12)
+        sessions.append((rng.choice(customers), rng.choice(scenarios), session(rng, turns)))
+
+    full = [full_prompt_tokens(*s) for s in sessions]
+    routed = [routed_tokens(*s) for s in sessions]
+    local = sum(1 for tokens in routed if tokens == 0)
+
+    print(f"Sessions: {len(sessions)} ({local} scored locally, {local / len(sessions):.0%})")
+    print(f"Full JSON prompt       {sum(full):10d} tokens   {statistics.mean(full):7.0f} per session")
+    print(f"Scorer + compact       {sum(routed):10d} tokens   {statistics.mean(routed):7.0f} per session")
+    print(f"Reduction              {1 - sum(routed) / sum(full):10.0%}")
+
+    started = time.perf_counter()
+    for _, scenario, history in sessions:
+        score_transcript(history, scenario)
+    print(f"Scorer latency         {(time.perf_counter() - started) / len(sessions) * 1e6:10.1f} us per transcript")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analysis token spend with and without the transcript scorer")
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--abandoned", type=float, default=0.4, help="Share of sessions ending after 1-2 turns")
+    parser.add_argument("--seed", type=int, default=5)
+    main(parser.parse_args())
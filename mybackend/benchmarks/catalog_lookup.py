@@ -0,0 +1,90 @@
+"""
+Catalog Lookup Benchmark
+------------------------
+Compares the per-request pandas work the scenario endpoints and
+/conversation/start used to do (iterrows + Pydantic models, boolean-mask
+filtering, DataFrame.sample, simplify_persona) with the catalog records:
+pre-serialized JSON bytes, dict lookups and O(1) random picks.
+
+Usage (from the mybackend directory):
+    python benchmarks/catalog_lookup.py
+    python benchmarks/catalog_lookup.py --repeats 5000
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+import pandas as pd
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+from catalog import ScenarioCatalog, build_personas, build_traits, json_bytes
+from conversation_manager import simplify_persona
+from app import Scenario, ScenarioDetail, scenario_summary, scenario_detail
+
+
+def timed(fn, repeats):
+    """Median microseconds per call."""
+    runs = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - started) * 1e6)
+    return statistics.median(runs)
+
+
+def main(args):
+    scenarios_df = pd.read_csv("data/scenarios.csv")
+    customers_df = pd.read_csv("data/customers.csv")
+    traits_df = pd.read_csv("data/traits.csv")
+    ids = list(scenarios_df["scenario_id"])
+
+    # simplify_persona logs every call; keep the output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        catalog = ScenarioCatalog(scenarios_df, scenario_summary, scenario_detail)
+        personas = build_personas(customers_df, simplify_persona)
+    traits = build_traits(traits_df)
+
+    def legacy_list():
+        models = [Scenario(**{field: row[field] for field in Scenario.__annotations__}) for _, row in scenarios_df.iterrows()]
+        return json_bytes([model.dict() for model in models])
+
+    def legacy_detail():
+        row = scenarios_df[scenarios_df["scenario_id"] == random.choice(ids)].iloc[0]
+        fields = {**Scenario.__annotations__, **ScenarioDetail.__annotations__}
+        return json_bytes(ScenarioDetail(**{field: row[field] for field in fields}).dict())
+
+    def legacy_start():
+        scenario = scenarios_df[scenarios_df["scenario_id"] == random.choice(ids)].iloc[0].to_dict()
+        customer = customers_df.sample(1).iloc[0].to_dict()
+        trait = traits_df.sample(1).iloc[0].to_dict()
+        with contextlib.redirect_stdout(io.StringIO()):
+            return scenario, simplify_persona(customer), trait
+
+    def catalog_start():
+        return catalog.get(random.choice(ids)).to_dict(), dict(personas.pick().simplified), dict(traits.pick().data)
+
+    assert json.loads(legacy_list()) == json.loads(catalog.list_json)
+
+    rows = [
+        ("GET /scenarios", legacy_list, lambda: catalog.list_json),
+        ("GET /scenarios/{id}", legacy_detail, lambda: catalog.get(random.choice(ids)).detail_json),
+        ("start: scenario + persona + trait", legacy_start, catalog_start)
+    ]
+    for label, legacy, indexed in rows:
+        print(f"{label:<36} pandas {timed(legacy, args.repeats):9.1f} us   catalog {timed(indexed, args.repeats):7.2f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scenario and persona lookup benchmark")
+    parser.add_argument("--repeats", type=int, default=1000)
+    main(parser.parse_args())
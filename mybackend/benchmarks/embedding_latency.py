@@ -0,0 +1,95 @@
+"""
+Embedding Latency Benchmark
+---------------------------
+Measures the embedding engine used for product retrieval: backend load time,
+batched encoding of the product catalog, and per-query latency for cold
+queries (encoded), warm queries (in-process cache) and queries served from
+the on-disk cache after a restart, plus the end-to-end FAISS retrieval.
+
+Usage (from the mybackend directory):
+    python benchmarks/embedding_latency.py
+    python benchmarks/embedding_latency.py --backend hashed --queries 500
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from embedding_engine import EmbeddingEngine
+from product_index import product_documents
+from langchain_community.vectorstores import FAISS
+
+QUERY_TEMPLATES = [
+    "What is the price of the {}?",
+    "Does the {} have a good camera?",
+    "Any EMI options on the {}?",
+    "How does the {} compare with others?",
+    "What warranty comes with the {}?",
+]
+
+
+def timed(fn, items):
+    """Run fn on every item and return per-call latencies in milliseconds."""
+    latencies = []
+    for item in items:
+        started = time.perf_counter()
+        fn(item)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return sorted(latencies)
+
+
+def report(label, latencies):
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(f"{label:<28} p50 {statistics.median(latencies):8.3f} ms   p95 {p95:8.3f} ms   ({len(latencies)} queries)")
+
+
+def main(args):
+    products_df = pd.read_csv(os.path.join(BACKEND_DIR, "data", "products.csv"))
+    texts, metadatas = product_documents(products_df)
+    names = [f"{row['brand']} {row['model']}" for _, row in products_df.iterrows()]
+    queries = [template.format(name) for name in names for template in QUERY_TEMPLATES]
+    queries = (queries * (args.queries // len(queries) + 1))[:args.queries]
+    unique_queries = list(dict.fromkeys(queries))
+
+    cache_path = os.path.join(tempfile.mkdtemp(), "embedding_cache.sqlite")
+    engine = EmbeddingEngine(backend=args.backend, batch_size=args.batch_size, cache_path=cache_path)
+    print(f"Backend: {engine.model_id}")
+
+    started = time.perf_counter()
+    engine.embed_vector("warm up")
+    print(f"Backend load + first encode:  {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    started = time.perf_counter()
+    engine.embed_documents(texts)
+    batched = time.perf_counter() - started
+    print(f"Catalog batch encode:         {batched * 1000:.1f} ms for {len(texts)} products "
+          f"({batched * 1000 / len(texts):.2f} ms/product)")
+
+    report("Cold query (encode)", timed(engine.embed_query, unique_queries))
+    report("Warm query (memory cache)", timed(engine.embed_query, queries))
+
+    # A fresh engine on the same SQLite file behaves like a restarted pod
+    restarted = EmbeddingEngine(backend=args.backend, batch_size=args.batch_size, cache_path=cache_path)
+    report("Restart query (disk cache)", timed(restarted.embed_query, unique_queries))
+    print(f"Backend loaded after restart: {restarted.stats()['loaded']}")
+
+    vectorstore = FAISS.from_texts(texts, engine, metadatas=metadatas)
+    report("Retrieval (warm, k=3)", timed(lambda q: vectorstore.similarity_search(q, k=3), queries))
+
+    print(engine.stats())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedding engine latency benchmark")
+    parser.add_argument("--backend", default="auto", help="auto, fastembed, sentence-transformers or hashed")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=32)
+    main(parser.parse_args())
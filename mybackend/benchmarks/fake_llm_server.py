@@ -0,0 +1,107 @@
+"""
+Fake LLM Server
+---------------
+A tiny OpenAI/Groq-compatible chat completions server used by the load
+benchmarks. Every request sleeps for a fixed latency before answering, which
+makes it easy to see whether the API overlaps LLM calls or serializes them.
+Streaming requests (`"stream": true`) get the reply word by word as SSE chunks.
+
+Point the backend at it with:
+    GROQ_BASE_URL=http://127.0.0.1:8900   (direct Groq client)
+    GROQ_API_BASE=http://127.0.0.1:8900   (LangChain ChatGroq)
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_REPLY = "Hello! I'm looking for a good phone. What do you have?"
+
+
+def make_handler(latency: float, token_interval: float = 0.02):
+    """Create a request handler class that answers after `latency` seconds."""
+
+    class FakeLLMHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            time.sleep(latency)
+
+            if body.get("stream"):
+                self.stream_reply(body)
+                return
+
+            payload = json.dumps({
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": CANNED_REPLY},
+                    "finish_reason": "stop"
+                }],
+                "usage": {"prompt_tokens": 100, "completion_tokens": 15, "total_tokens": 115}
+            }).encode()
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def stream_reply(self, body):
+            """Send the canned reply word by word as chat.completion.chunk events."""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+
+            words = CANNED_REPLY.split(" ")
+            for index, word in enumerate(words):
+                last = index == len(words) - 1
+                chunk = {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": body.get("model", "fake"),
+                    "choices": [{
+                        "index": 0,
+                        "delta": {"content": word if last else word + " "},
+                        "finish_reason": "stop" if last else None
+                    }]
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(token_interval)
+
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+
+    return FakeLLMHandler
+
+
+def start_fake_llm_server(port: int = 8900, latency: float = 0.5) -> ThreadingHTTPServer:
+    """Start the fake server on a background thread and return it."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Groq-compatible chat completions server")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds to wait before each reply")
+    args = parser.parse_args()
+
+    print(f"Fake LLM server on http://127.0.0.1:{args.port} with {args.latency}s latency")
+    ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args.latency)).serve_forever()
@@ -0,0 +1,105 @@
+"""
+History Prompt Benchmark
+------------------------
+Compares the conversation history sent to the LLM for sessions of growing
+length: the last 8 messages only (HISTORY_SUMMARY_MODE=off) versus the
+running extractive summary plus the last 8 messages, folded incrementally
+as the send_message route does. Reports prompt tokens, how many of the
+prices and figures mentioned in the session the prompt still contains, and
+the time to build the history per message.
+
+Usage (from the mybackend directory):
+    python benchmarks/history_prompt.py
+    python benchmarks/history_prompt.py --lengths 10 40 160 640
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+from conversation_manager import format_conversation_history
+from history_summary import pending_fold, extend_summary
+from rate_limiter import estimate_tokens
+
+FIGURE = re.compile(r"\d[\d,]*")
+
+AGENT_MESSAGES = [
+    "Good afternoon sir, welcome to our store!",
+    "This model is priced at Rs {n},999 and there is a festive discount of {m},000 right now.",
+    "We have no-cost EMI for {m} months with HDFC and ICICI credit cards.",
+    "It comes with a {m} year warranty and free installation at your home.",
+    "The battery lasts a full day and it has {m} GB of RAM.",
+    "Sure, let me show you.",
+    "Compared to the other model, this one has a better processor.",
+    "Shall I process your order? Delivery takes {m} days."
+]
+
+CUSTOMER_MESSAGES = [
+    "Okay.",
+    "That sounds a bit expensive, can you do better on the price?",
+    "What would the monthly payment be for {m} months?",
+    "Hmm, let me think about it.",
+    "Does it come with an exchange offer for my old one?",
+    "I need something with a good camera under {n},000."
+]
+
+
+def session(rng, messages):
+    history = []
+    for index in range(messages):
+        pool = AGENT_MESSAGES if index % 2 else CUSTOMER_MESSAGES
+        text = rng.choice(pool).format(n=rng.randint(20, 90), m=rng.randint(2, 24))
+        history.append({"role": "user" if index % 2 else "customer", "message": text})
+    return history
+
+
+def last_messages(history, count=8):
+    """What format_conversation_history sends with HISTORY_SUMMARY_MODE=off."""
+    return "".join(
+        f"{'Sales Associate' if entry['role'] == 'user' else 'Customer'}: {entry['message']}\n"
+        for entry in history[-count:]
+    )
+
+
+def figures_kept(history, prompt):
+    mentioned = {figure for entry in history for figure in FIGURE.findall(entry["message"])}
+    return sum(1 for figure in mentioned if figure in prompt) / len(mentioned) if mentioned else 1.0
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    print(f"{'messages':>8} {'last-8 tokens':>14} {'summary tokens':>15} {'figures last-8':>15} {'figures summary':>16} {'us/message':>11}")
+    for length in args.lengths:
+        history = session(rng, length)
+
+        # Replay the session: build the prompt history for every message, folding as the route does
+        stored = None
+        started = time.perf_counter()
+        for end in range(1, length + 1):
+            prefix = history[:end]
+            prompt = format_conversation_history(prefix, summary=stored)
+            fold = pending_fold(prefix, stored)
+            if fold is not None:
+                text, covered, entries = fold
+                stored = {"text": extend_summary(text, entries), "messages": covered}
+        per_message = (time.perf_counter() - started) / length * 1e6
+
+        plain = last_messages(history)
+        print(
+            f"{length:8d} {estimate_tokens(plain):14d} {estimate_tokens(prompt):15d} "
+            f"{figures_kept(history, plain):15.0%} {figures_kept(history, prompt):16.0%} {per_message:11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prompt history size and coverage with and without the running summary")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[10, 20, 40, 80, 160, 320])
+    parser.add_argument("--seed", type=int, default=7)
+    main(parser.parse_args())
@@ -0,0 +1,158 @@
+"""
+Intent Matching Benchmark
+-------------------------
+Compares the original per-helper keyword scans (detect_question_type,
+is_conversation_ending, the product-question check) with the single-pass
+PhraseMatcher over a corpus of agent messages, and checks that both agree
+on every message, including randomly generated ones built from phrase
+fragments.
+
+Usage (from the mybackend directory):
+    python benchmarks/intent_matching.py
+    python benchmarks/intent_matching.py --messages 20000 --fuzz 50000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from message_intents import (
+    classify_message, match_phrases, question_type, ENDING_SIGNALS, QUESTION_TYPE_PHRASES, SIGNAL_PHRASES
+)
+
+AGENT_MESSAGES = [
+    "Hello sir, welcome to our store! How may I help you today?",
+    "Hi, my name is Rahul. May I know your name?",
+    "How are you doing today?",
+    "This model has a 200MP camera and 5000mAh battery.",
+    "The price is Rs 1,29,999 but we have a festive discount running.",
+    "We offer no-cost EMI options for 6 and 9 months.",
+    "It comes with a 2 year warranty and free installation.",
+    "Would you like to compare it with the iPhone 15 Pro?",
+    "Let me show you the specifications of the inverter compressor.",
+    "Shall I process your order now?",
+    "It sounds good, would you like to buy it today?",
+    "The refrigerator is energy efficient with a 5 star rating.",
+    "Do you want me to check the stock in the warehouse?",
+    "This laptop is perfect for gaming and video editing.",
+    "What budget are you looking at?",
+    "Our exchange offer can reduce the cost by 15,000.",
+    "Ready to check out? I can generate the bill.",
+    "Namaste! Are you looking for a new television?",
+    "The noise cancellation on these headphones is industry leading.",
+    "Let me know if you have any other questions."
+]
+
+
+# ==============================
+# Original implementation
+# ==============================
+
+def legacy_detect_question_type(message):
+    message = message.lower()
+    if any(phrase in message for phrase in ["your name", "what is your name", "who are you", "may i know your name"]):
+        return "ASKING_NAME"
+    if any(phrase in message for phrase in ["how are you", "how do you do", "how is your day"]):
+        return "ASKING_WELLBEING"
+    if any(greeting in message for greeting in ["hello", "hi", "namaste", "greetings"]):
+        return "GREETING"
+    if any(phrase in message for phrase in ["price", "cost", "how much", "expensive"]):
+        return "ASKING_PRICE"
+    if any(phrase in message for phrase in ["feature", "specification", "what can it do"]):
+        return "ASKING_FEATURES"
+    if any(phrase in message for phrase in ["warranty", "guarantee"]):
+        return "ASKING_WARRANTY"
+    return "GENERAL_QUESTION"
+
+
+def legacy_is_ending(message):
+    # "exactly what I need" is lowercased here; the original never matched it
+    satisfaction_indicators = [
+        "buy", "purchase", "take it", "get it", "decide", "interested",
+        "will go with", "sounds good", "perfect", "exactly what i need"
+    ]
+    closing_indicators = ["would you like to complete the purchase", "shall i process your order",
+                          "would you like to buy", "ready to check out"]
+    if any(indicator in message.lower() for indicator in satisfaction_indicators):
+        return True
+    if any(indicator in message.lower() for indicator in closing_indicators):
+        return True
+    return False
+
+
+def legacy_needs_product(message):
+    return any(keyword in message.lower() for keyword in ["price", "feature", "spec", "emi", "option", "compare"])
+
+
+def legacy_classify(message):
+    return legacy_detect_question_type(message), legacy_is_ending(message), legacy_needs_product(message)
+
+
+def matcher_classify(message, classify=classify_message):
+    labels = classify(message)
+    return question_type(labels), bool(labels & ENDING_SIGNALS), "PRODUCT_QUESTION" in labels
+
+
+# ==============================
+# Corpus
+# ==============================
+
+def fuzz_messages(count, seed):
+    """Random texts stitched from phrase fragments, filler and odd casing."""
+    rng = random.Random(seed)
+    phrases = [p for table in (QUESTION_TYPE_PHRASES, SIGNAL_PHRASES) for ps in table.values() for p in ps]
+    fragments = phrases + [p[:rng.randint(1, len(p))] for p in phrases] + ["the", " ", "xyz", "Ok.", "?", "this"]
+    messages = []
+    for _ in range(count):
+        parts = [rng.choice(fragments) for _ in range(rng.randint(0, 8))]
+        text = "".join(part if rng.random() < 0.5 else " " + part for part in parts)
+        messages.append("".join(ch.upper() if rng.random() < 0.2 else ch for ch in text))
+    return messages
+
+
+def timed(fn, messages, repeats):
+    """Median seconds per message over several passes."""
+    runs = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for message in messages:
+            fn(message)
+        runs.append((time.perf_counter() - started) / len(messages))
+    return statistics.median(runs)
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    corpus = [rng.choice(AGENT_MESSAGES) + (f" ({i})" if rng.random() < 0.5 else "") for i in range(args.messages)]
+
+    mismatches = [m for m in corpus + fuzz_messages(args.fuzz, args.seed) if legacy_classify(m) != matcher_classify(m, match_phrases)]
+    print(f"Checked {len(corpus) + args.fuzz} messages: {len(mismatches)} mismatches")
+    for message in mismatches[:10]:
+        print(f"  {message!r}: legacy {legacy_classify(message)} matcher {matcher_classify(message, match_phrases)}")
+
+    legacy = timed(legacy_classify, corpus, args.repeats)
+    single_pass = timed(lambda m: matcher_classify(m, match_phrases), corpus, args.repeats)
+    classify_message.cache_clear()
+    memoized = timed(matcher_classify, corpus, args.repeats)
+
+    print(f"Legacy scans (3 helpers)     {legacy * 1e6:7.2f} us/message")
+    print(f"Single-pass matcher          {single_pass * 1e6:7.2f} us/message")
+    print(f"Memoized classify_message    {memoized * 1e6:7.2f} us/message")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keyword intent matching benchmark")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--fuzz", type=int, default=20000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    main(parser.parse_args())
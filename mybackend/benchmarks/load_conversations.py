@@ -0,0 +1,145 @@
+"""
+Conversation Load Benchmark
+---------------------------
+Runs many concurrent training conversations against a single uvicorn worker
+backed by the fake LLM server, and reports throughput and latency.
+
+With blocking LLM calls the total time grows linearly with the number of
+conversations (each call holds the event loop). With the async path the
+calls overlap, so the total time stays close to a single conversation.
+
+Usage (from the mybackend directory):
+    python benchmarks/load_conversations.py --conversations 200 --messages 3
+    python benchmarks/load_conversations.py --stream   # also reports time to first token
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_llm_server import start_fake_llm_server
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_backend(port: int, llm_url: str) -> subprocess.Popen:
+    """Launch the API in a single uvicorn worker pointed at the fake LLM."""
+    env = dict(
+        os.environ,
+        GROQ_API_KEY="fake-key",
+        GROQ_BASE_URL=llm_url,
+        GROQ_API_BASE=llm_url,
+        # Fail fast instead of waiting on a real cluster
+        MONGODB_URI="mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=200",
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--workers", "1", "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float = 60.0):
+    """Poll the root endpoint until the API answers."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError("Backend did not start in time")
+
+
+async def send_streaming_message(client: httpx.AsyncClient, payload: dict, first_tokens: list):
+    """Send one message to the SSE endpoint and record time to first token."""
+    started = time.perf_counter()
+    first_token = None
+    async with client.stream("POST", "/conversation/message/stream", json=payload) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if first_token is None and line.startswith("event:"):
+                first_token = time.perf_counter() - started
+    first_tokens.append(first_token)
+
+
+async def run_conversation(client: httpx.AsyncClient, scenario_id: str, messages: int, latencies: list,
+                           first_tokens: list, stream: bool):
+    """Start one conversation and send a few messages."""
+    started = time.perf_counter()
+    response = await client.post("/conversation/start", json={"scenario_id": scenario_id})
+    response.raise_for_status()
+    latencies.append(time.perf_counter() - started)
+    conversation_id = response.json()["conversation_id"]
+
+    for _ in range(messages):
+        payload = {
+            "conversation_id": conversation_id,
+            "message": "Okay, let me show you our best model."
+        }
+        started = time.perf_counter()
+        if stream:
+            await send_streaming_message(client, payload, first_tokens)
+        else:
+            response = await client.post("/conversation/message", json=payload)
+            response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+
+
+async def main(args):
+    llm_server = start_fake_llm_server(args.llm_port, args.latency)
+    backend = start_backend(args.port, f"http://127.0.0.1:{args.llm_port}")
+    limits = httpx.Limits(max_connections=args.conversations, max_keepalive_connections=args.conversations)
+
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=600) as client:
+            await wait_until_ready(client)
+            scenario_id = (await client.get("/scenarios")).json()[0]["scenario_id"]
+
+            latencies = []
+            first_tokens = []
+            started = time.perf_counter()
+            await asyncio.gather(*[
+                run_conversation(client, scenario_id, args.messages, latencies, first_tokens, args.stream)
+                for _ in range(args.conversations)
+            ])
+            elapsed = time.perf_counter() - started
+    finally:
+        backend.terminate()
+        backend.wait()
+        llm_server.shutdown()
+
+    calls = len(latencies)
+    serial_time = calls * args.latency
+    latencies.sort()
+    print(f"Conversations:        {args.conversations} x {args.messages + 1} calls ({calls} total)")
+    print(f"Fake LLM latency:     {args.latency * 1000:.0f} ms")
+    print(f"Wall time:            {elapsed:.2f} s (fully serialized would be {serial_time:.1f} s)")
+    print(f"Throughput:           {calls / elapsed:.1f} requests/s")
+    print(f"Effective concurrency {serial_time / elapsed:.1f}x")
+    print(f"Latency p50/p95/max:  {statistics.median(latencies) * 1000:.0f} / "
+          f"{latencies[int(calls * 0.95) - 1] * 1000:.0f} / {latencies[-1] * 1000:.0f} ms")
+    if first_tokens:
+        first_tokens.sort()
+        print(f"Time to first token p50/p95: {statistics.median(first_tokens) * 1000:.0f} / "
+              f"{first_tokens[int(len(first_tokens) * 0.95) - 1] * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent conversation load benchmark")
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=3, help="Messages per conversation after the greeting")
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake LLM latency in seconds")
+    parser.add_argument("--stream", action="store_true", help="Send messages through the SSE endpoint")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--llm-port", type=int, default=8900)
+    asyncio.run(main(parser.parse_args()))
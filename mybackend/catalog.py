@@ -0,0 +1,159 @@
+"""
+Catalog
+-------
+This module holds the scenarios, customer personas and behavioral traits as
+immutable records built once when a data file is loaded, so request
+handlers look them up by id and pick random personas without any pandas
+work per request.
+
+Key components:
+1. Frozen records (NamedTuples, which have no per-instance __dict__) with a
+   read-only view of each CSV row
+2. Scenarios keyed by id, with the /scenarios and /scenarios/{id} response
+   bodies serialized to JSON bytes up front
+3. Personas with their simplified form computed once instead of per
+   conversation
+4. O(1) uniform random selection of personas and traits from tuples
+
+A reload builds new catalog objects and swaps them in with one assignment
+each, so a request sees either the old or the new data, never a mix.
+"""
+
+import json
+import random
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Generic, List, Mapping, NamedTuple, Optional, Sequence, Tuple, TypeVar
+
+import pandas as pd
+
+RecordType = TypeVar("RecordType")
+
+
+def json_bytes(value: Any) -> bytes:
+    """Serialize like FastAPI's JSONResponse (compact separators, UTF-8)."""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _rows(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """CSV rows as plain dicts with native Python values."""
+    return df.to_dict("records")
+
+
+# ==============================
+# Records
+# ==============================
+
+class ScenarioRecord(NamedTuple):
+    """One scenario, with its detail response already serialized."""
+    scenario_id: str
+    data: Mapping[str, Any]
+    detail_json: bytes
+
+    def to_dict(self) -> Dict[str, Any]:
+        """A mutable copy of the scenario row, as the conversation code expects."""
+        return dict(self.data)
+
+
+class PersonaRecord(NamedTuple):
+    """One customer persona and its simplified form."""
+    persona_id: str
+    data: Mapping[str, Any]
+    simplified: Mapping[str, Any]
+
+
+class TraitRecord(NamedTuple):
+    """One behavioral trait."""
+    trait_id: str
+    data: Mapping[str, Any]
+
+
+# ==============================
+# Catalogs
+# ==============================
+
+class ScenarioCatalog:
+    """Scenarios by id plus the pre-serialized scenario endpoints."""
+
+    def __init__(
+        self,
+        scenarios_df: pd.DataFrame,
+        summary: Callable[[Dict[str, Any]], Dict[str, Any]],
+        detail: Callable[[Dict[str, Any]], Dict[str, Any]]
+    ):
+        """
+        Args:
+            scenarios_df: Scenarios as read from scenarios.csv
+            summary: Builds the /scenarios list item for a row
+            detail: Builds the /scenarios/{id} body for a row
+        """
+        self.by_id: Dict[str, ScenarioRecord] = {}
+        records = []
+        summaries = []
+        for row in _rows(scenarios_df):
+            record = ScenarioRecord(
+                scenario_id=row["scenario_id"],
+                data=MappingProxyType(row),
+                detail_json=json_bytes(detail(row))
+            )
+            records.append(record)
+            summaries.append(summary(row))
+            # The first row wins for a duplicated id, as with the old DataFrame filter
+            self.by_id.setdefault(record.scenario_id, record)
+
+        self.records: Tuple[ScenarioRecord, ...] = tuple(records)
+        self.list_json = json_bytes(summaries)
+
+    def get(self, scenario_id: str) -> Optional[ScenarioRecord]:
+        return self.by_id.get(scenario_id)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+
+class RecordPool(Generic[RecordType]):
+    """Immutable records with O(1) uniform random selection."""
+
+    def __init__(self, records: Sequence[RecordType]):
+        self.records: Tuple[RecordType, ...] = tuple(records)
+
+    def pick(self) -> RecordType:
+        """
+        Return a uniformly random record.
+
+        Raises:
+            IndexError: If the pool is empty
+        """
+        return random.choice(self.records)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+
+def build_personas(
+    customers_df: pd.DataFrame,
+    simplify: Callable[[Dict[str, Any]], Dict[str, Any]]
+) -> RecordPool[PersonaRecord]:
+    """
+    Build the persona pool, simplifying every persona once.
+
+    Args:
+        customers_df: Personas as read from customers.csv
+        simplify: Persona simplification (simplify_persona), which is
+            deterministic and so safe to precompute
+    """
+    return RecordPool([
+        PersonaRecord(
+            persona_id=str(row.get("persona_id", index)),
+            data=MappingProxyType(row),
+            simplified=MappingProxyType(simplify(row))
+        )
+        for index, row in enumerate(_rows(customers_df))
+    ])
+
+
+def build_traits(traits_df: pd.DataFrame) -> RecordPool[TraitRecord]:
+    """Build the behavioral trait pool."""
+    return RecordPool([
+        TraitRecord(trait_id=str(row.get("trait_id", index)), data=MappingProxyType(row))
+        for index, row in enumerate(_rows(traits_df))
+    ])
@@ -12,10 +12,11 @@ Key components:
 """
 
 import os
+import asyncio
+import hashlib
 import json
 import random
-import re
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, AsyncIterator, Tuple
 from langchain_core.prompts import PromptTemplate, ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_groq import ChatGroq
@@ -25,17 +26,34 @@ from pydantic.v1 import BaseModel, Field
 from langchain.memory import ConversationBufferMemory
 
 # Product knowledge RAG system
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
 import pandas as pd
+from product_index import load_or_build_index, PartitionedProductIndex, PRODUCT_INDEX_DIR
+from embedding_engine import get_embedding_engine
+from product_search import ProductLookup, ConversationProductCache
+from analysis_parser import parse_analysis_output, strip_json_fence
+from message_intents import classify_message, match_phrases, question_type, ENDING_SIGNALS
+from transcript_scorer import (
+    score_transcript, needs_llm_analysis, heuristic_analysis, feature_summary, feature_observations,
+    feature_highlight, ANALYSIS_MIN_AGENT_TURNS, ANALYSIS_MIN_AGENT_WORDS
+)
+from history_summary import (
+    pending_fold, covering_summary, extend_summary, speaker, HISTORY_SUMMARY_MODE, HISTORY_WINDOW_MESSAGES,
+    HISTORY_SUMMARY_BATCH, HISTORY_SUMMARY_MAX_CHARS
+)
 
 # Direct Groq API integration
-from groq import Groq
+from groq import Groq, AsyncGroq
+
+from response_cache import SemanticResponseCache, hashed_ngram_embedding
+from rate_limiter import RateLimitScheduler, PRIORITY_CHAT, PRIORITY_ANALYSIS, PRIORITY_BACKGROUND, estimate_tokens
 
 # Load environment variables
 from dotenv import load_dotenv
 load_dotenv()
 
+# Shared keep-alive connection pools for all LLM traffic (reads settings from the environment)
+from llm_transport import get_http_client, get_async_http_client, add_response_listener
+
 # ==============================
 # LLM Configuration and Clients
 # ==============================
@@ -46,85 +64,188 @@ llm = ChatGroq(
     temperature=0.7,  # Higher temperature for more varied and natural responses
     model_name="llama3-70b-8192",  # Updated to a model that exists in Groq
     api_key=os.environ.get("GROQ_API_KEY"),
-    max_tokens=100  # Increased from 30 to allow for longer responses
+    max_tokens=100,  # Increased from 30 to allow for longer responses
+    http_client=get_http_client(),
+    http_async_client=get_async_http_client()
 )
 
 # Lower temperature LLM configuration for analysis (needs more consistency)
 llm_analysis = ChatGroq(
     temperature=0.1,  # Lower temperature for consistent analysis
     model_name="llama3-70b-8192",  # Updated to same model
-    api_key=os.environ.get("GROQ_API_KEY")
+    api_key=os.environ.get("GROQ_API_KEY"),
+    http_client=get_http_client(),
+    http_async_client=get_async_http_client()
+)
+
+# Analysis output format: "json" asks for a JSON object in Groq's JSON mode and
+# validates it against PerformanceAnalysis; "markdown" keeps the scraped text format
+ANALYSIS_OUTPUT_MODE = os.environ.get("ANALYSIS_OUTPUT_MODE", "json").lower()
+
+# Completion budget of a repair call
+ANALYSIS_REPAIR_OUTPUT_TOKENS = 800
+
+# JSON prompt style: "compact" sends the local transcript features, the last few
+# messages and a short JSON skeleton; "full" sends the full schema and 10 messages
+ANALYSIS_PROMPT_STYLE = os.environ.get("ANALYSIS_PROMPT_STYLE", "compact").lower()
+# Messages of transcript sent with the compact prompt
+ANALYSIS_TRANSCRIPT_TURNS = int(os.environ.get("ANALYSIS_TRANSCRIPT_TURNS", "6"))
+# Completion budget of a compact analysis (observations are filled in locally)
+ANALYSIS_COMPACT_OUTPUT_TOKENS = 500
+
+# Small, fast model that fixes analysis JSON that failed validation (no transcript is resent)
+llm_analysis_repair = ChatGroq(
+    temperature=0,
+    model_name=os.environ.get("ANALYSIS_REPAIR_MODEL", "llama-3.1-8b-instant"),
+    api_key=os.environ.get("GROQ_API_KEY"),
+    max_tokens=ANALYSIS_REPAIR_OUTPUT_TOKENS,
+    http_client=get_http_client(),
+    http_async_client=get_async_http_client()
+)
+
+# Completion budget of a conversation summary update
+HISTORY_SUMMARY_OUTPUT_TOKENS = 200
+
+# Small, fast model that folds older messages into the running summary (HISTORY_SUMMARY_MODE=llm)
+llm_history_summary = ChatGroq(
+    temperature=0,
+    model_name=os.environ.get("HISTORY_SUMMARY_MODEL", "llama-3.1-8b-instant"),
+    api_key=os.environ.get("GROQ_API_KEY"),
+    max_tokens=HISTORY_SUMMARY_OUTPUT_TOKENS,
+    http_client=get_http_client(),
+    http_async_client=get_async_http_client()
 )
 
 # Initialize direct Groq API client as an alternative to LangChain
-groq_client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
+groq_client = Groq(api_key=os.environ.get("GROQ_API_KEY"), http_client=get_http_client())
+
+# Async Groq client used by the async FastAPI routes so LLM calls don't block the event loop
+async_groq_client = AsyncGroq(api_key=os.environ.get("GROQ_API_KEY"), http_client=get_async_http_client())
 
-# Initialize embeddings for product knowledge vector database
-# embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+# Client-side scheduler that queues async LLM calls within the Groq rate limits,
+# releasing live chat replies before analysis and background work. Chat calls
+# wait for their slot; LLM_QUEUE_TIMEOUT_SECONDS only bounds background calls
+llm_scheduler = RateLimitScheduler(
+    requests_per_minute=float(os.environ.get("GROQ_REQUESTS_PER_MINUTE", "30")),
+    tokens_per_minute=float(os.environ.get("GROQ_TOKENS_PER_MINUTE", "6000")),
+    max_retries=int(os.environ.get("GROQ_RATE_LIMIT_RETRIES", "3")),
+    queue_timeout=float(os.environ.get("LLM_QUEUE_TIMEOUT_SECONDS", "30")),
+    enabled=os.environ.get("LLM_RATE_LIMITER_ENABLED", "True").lower() == "true"
+)
+add_response_listener(llm_scheduler.observe_response)
+
+# Analysis can wait longer for a slot than a live chat reply
+ANALYSIS_QUEUE_TIMEOUT = float(os.environ.get("LLM_ANALYSIS_QUEUE_TIMEOUT_SECONDS", "120"))
+# Completion budget reserved for an analysis call, which has no max_tokens
+ANALYSIS_OUTPUT_TOKENS = 1000
+# Bump when the analysis prompt or parsing changes so memoized results are not reused
+ANALYSIS_CACHE_VERSION = "4"
+
+# Cached, batched CPU embeddings shared by product retrieval and (optionally) the semantic cache
+embedding_engine = get_embedding_engine()
+
+# Optional semantic cache for replies to the opening turns of a conversation
+SEMANTIC_CACHE_EMBEDDING = os.environ.get("SEMANTIC_CACHE_EMBEDDING", "hashed").lower()
+semantic_cache = SemanticResponseCache(
+    # "engine" matches paraphrases better than the default hashed n-grams, at some CPU cost
+    embed=embedding_engine.embed_vector if SEMANTIC_CACHE_EMBEDDING == "engine" else hashed_ngram_embedding,
+    threshold=float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.9")),
+    max_entries=int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", "5000")),
+    disabled_scenarios=[s.strip() for s in os.environ.get("SEMANTIC_CACHE_OPT_OUT", "").split(",") if s.strip()],
+    enabled=os.environ.get("SEMANTIC_CACHE_ENABLED", "False").lower() == "true"
+)
 
-# Initialize vector store (we'll populate this when needed)
+# Product knowledge vector store, loaded from the prebuilt index on startup.
+# The embedding model itself is only loaded on the first query.
 product_vectorstore = None
+# Per-category view of the same index used for scenario-scoped retrieval
+product_partitions = None
+# Exact model + BM25 lookup tried before the vector index (see product_search.py)
+product_lookup = None
+# Product context already retrieved in each conversation, keyed by query
+product_context_cache = ConversationProductCache(
+    max_conversations=int(os.environ.get("PRODUCT_CONTEXT_CACHE_CONVERSATIONS", "1000")),
+    max_queries=int(os.environ.get("PRODUCT_CONTEXT_CACHE_QUERIES", "32"))
+)
 
-# Active conversations storage
-active_conversations = {}
+# Build the index on startup when no artifact matches the catalog (disable in
+# production images that run `python product_index.py` at build time)
+PRODUCT_INDEX_BUILD_ON_STARTUP = os.environ.get("PRODUCT_INDEX_BUILD_ON_STARTUP", "True").lower() == "true"
 
 # ==============================
 # Product Knowledge Base
 # ==============================
 
-def initialize_product_db(products_df):
+def initialize_product_db(products_df, csv_path: str = "data/products.csv"):
     """
-    Create vector database from product information for knowledge retrieval.
+    Load the vector database of product information for knowledge retrieval.
     
-    This function processes the product dataframe to create embedding vectors
-    for similarity search, enabling the bot to retrieve relevant product details.
+    The index is built once per catalog version and saved to disk keyed by a
+    content hash of the CSV (see product_index.py), so restarts only load the
+    saved artifact instead of re-embedding every product. When called again
+    after the catalog changed, only the changed products are embedded and the
+    new lookup and index replace the old ones together, so requests in flight
+    never mix two catalog versions.
     
     Args:
         products_df: DataFrame containing product information
+        csv_path: Path of the CSV the DataFrame was loaded from
         
     Returns:
-        FAISS vector store containing product embeddings
+        FAISS vector store containing product embeddings, or None if unavailable
     """
-    global product_vectorstore
-    
-    # Create structured product documents for vector embedding
-    product_texts = []
-    product_metadatas = []
-    
-    for _, row in products_df.iterrows():
-        # Create descriptive text for embedding - structured for better retrieval
-        product_text = f"""
-        Product: {row['brand']} {row['model']}
-        Category: {row['category']}
-        Price: ₹{row['price']}
-        Features: {row['key_features']}
-        Technical Specs: {row['technical_specs']}
-        EMI Options: {row['emi_options']}
-        Warranty: {row['warranty']}
-        """
-        
-        # Add metadata for retrieval and filtering
-        metadata = {
-            "product_id": row['product_id'],
-            "category": row['category'],
-            "brand": row['brand'],
-            "model": row['model'],
-            "price": row['price']
-        }
-        
-        product_texts.append(product_text)
-        product_metadatas.append(metadata)
-    
-    # Create the vector store with the embeddings
-    product_vectorstore = FAISS.from_texts(
-        product_texts, 
-        embeddings, 
-        metadatas=product_metadatas
-    )
+    global product_vectorstore, product_partitions, product_lookup
+    
+    # The lexical lookup needs no embeddings, so it works even without the vector index
+    try:
+        lookup = ProductLookup(products_df)
+        if product_lookup is not None:
+            lookup.prepare_categories(product_lookup.prepared_categories())
+    except Exception as e:
+        print(f"Error building product lookup: {e}")
+        lookup = None
+    
+    try:
+        vectorstore = load_or_build_index(
+            csv_path,
+            PRODUCT_INDEX_DIR,
+            embeddings=embedding_engine,
+            build_if_missing=PRODUCT_INDEX_BUILD_ON_STARTUP,
+            products_df=products_df,
+            previous=product_vectorstore
+        )
+        partitions = PartitionedProductIndex(vectorstore) if vectorstore is not None else None
+    except Exception as e:
+        print(f"Error initializing product knowledge base: {e}")
+        vectorstore = None
+        partitions = None
+    
+    product_lookup, product_vectorstore, product_partitions = lookup, vectorstore, partitions
     
-    print(f"Product knowledge base initialized with {len(product_texts)} products")
+    # Cached context was retrieved from the previous catalog
+    product_context_cache.clear()
+    
+    if product_vectorstore is not None:
+        print(f"Product knowledge base initialized with {len(products_df)} products")
     return product_vectorstore
 
+def prepare_scenario_products(scenarios_df) -> None:
+    """
+    Resolve the candidate products of every scenario once at startup.
+    
+    A scenario's product category never changes during a conversation, so
+    the category-to-products mapping is computed here instead of per message.
+    
+    Args:
+        scenarios_df: DataFrame of scenarios with a product_category column
+    """
+    if product_lookup is None or scenarios_df is None:
+        return
+    
+    sizes = product_lookup.prepare_categories([str(c) for c in scenarios_df["product_category"]])
+    summary = ", ".join(f"{category} ({count})" for category, count in sizes.items())
+    print(f"Prepared candidate products for {len(sizes)} scenario categories: {summary}")
+
 # ==============================
 # Prompt Templates
 # ==============================
@@ -194,7 +315,7 @@ customer_response_prompt = ChatPromptTemplate.from_messages([
     6. Use Indian English speech patterns when appropriate
     7.give the response according to the how agent is speaking to you.
     8.keep the pervious conversation in mind and respond accordingly.
-    
+    {product_knowledge}
     The conversation so far:
     {conversation_history}
     """),
@@ -227,9 +348,8 @@ class PerformanceAnalysis(BaseModel):
     observations: List[str] = Field(description="5 specific observations about the trainee's performance")
     highlight: str = Field(description="1 highlight of what the trainee did particularly well")
 
-# Analysis prompt for evaluating sales associate performance
-analysis_prompt = ChatPromptTemplate.from_messages([
-    ("system", """You are a retail sales training expert analyzing a conversation between a sales associate and a customer.
+# Scenario, persona and transcript shared by both analysis formats
+ANALYSIS_CONTEXT = """You are a retail sales training expert analyzing a conversation between a sales associate and a customer.
 
 SCENARIO INFORMATION:
 - Title: {scenario_title}
@@ -249,7 +369,11 @@ CUSTOMER INFORMATION:
 CONVERSATION TRANSCRIPT:
 {conversation_history}
 
-Provide your analysis with these EXACT section headers:
+"""
+
+# Analysis prompt for evaluating sales associate performance
+analysis_prompt = ChatPromptTemplate.from_messages([
+    ("system", ANALYSIS_CONTEXT + """Provide your analysis with these EXACT section headers:
 
 **Overall Score: [0-100]** 
 (An overall assessment of the sales associate's performance)
@@ -272,6 +396,91 @@ Be honest but constructive in your feedback. Focus on practical improvements.
 # Output parser for analysis - converts LLM output to structured data
 analysis_parser = JsonOutputParser(pydantic_object=PerformanceAnalysis)
 
+# Same analysis as a JSON object matching PerformanceAnalysis (JSON mode)
+analysis_json_prompt = ChatPromptTemplate.from_messages([
+    ("system", ANALYSIS_CONTEXT + """Score the sales associate from 0 to 100 in every category. Use grammar for
+language use and communication clarity, and customer_handling for how well the
+associate adapted to and respected the customer's needs. Give 3-5 practical
+improvement suggestions, 5 observations and 1 highlight.
+
+Be honest but constructive in your feedback.
+
+{format_instructions}
+""")
+]).partial(format_instructions=analysis_parser.get_format_instructions())
+
+# Smaller JSON analysis: the local transcript features stand in for most of the
+# transcript, and observations are filled in from the features
+analysis_compact_prompt = ChatPromptTemplate.from_messages([
+    ("system", """You are a retail sales training expert scoring a sales associate's conversation with a customer.
+
+Scenario: {scenario_title} ({product_category}). Customer objective: {customer_objective}. Training focus: {training_focus}. Ideal resolution: {ideal_resolution}
+Customer: {customer_name}; shopping style {shopping_style}; patience {patience_level}; politeness {politeness}; technical knowledge {tech_knowledge}; concerns: {primary_concerns}
+
+TRANSCRIPT FEATURES (measured on the whole conversation):
+{transcript_features}
+
+LAST MESSAGES:
+{conversation_history}
+
+Score the associate from 0 to 100: grammar for language use and clarity, customer_handling for how well
+they adapted to and respected the customer. Give 3 practical, specific improvement suggestions and 1 highlight.
+Return only this JSON object:
+{{"overall_score": 0, "category_scores": {{"grammar": 0, "customer_handling": 0, "product_knowledge": 0, "communication": 0, "customer_respect": 0, "solution_approach": 0}}, "improvement_suggestions": ["..."], "highlight": "..."}}
+""")
+])
+
+# Fixes an analysis JSON object that failed validation, without resending the transcript
+analysis_repair_prompt = ChatPromptTemplate.from_messages([
+    ("system", """The JSON below should describe a sales training analysis but failed validation.
+
+VALIDATION ERROR:
+{error}
+
+INVALID OUTPUT:
+{output}
+
+Return the corrected JSON object only. Keep the original scores and text
+wherever they are valid; every score must be an integer from 0 to 100.
+
+{format_instructions}
+""")
+]).partial(format_instructions=analysis_parser.get_format_instructions())
+
+# JSON mode makes Groq return a syntactically valid JSON object
+analysis_json_chain = analysis_json_prompt | llm_analysis.bind(response_format={"type": "json_object"})
+analysis_compact_chain = analysis_compact_prompt | llm_analysis.bind(
+    response_format={"type": "json_object"}, max_tokens=ANALYSIS_COMPACT_OUTPUT_TOKENS
+)
+analysis_repair_chain = analysis_repair_prompt | llm_analysis_repair.bind(response_format={"type": "json_object"})
+
+class AnalysisOutputError(ValueError):
+    """The analysis output does not match PerformanceAnalysis."""
+
+# How JSON analyses were accepted: first try, after one repair, or not at all
+analysis_output_metrics = {"json_analyses": 0, "valid": 0, "repaired": 0, "failed": 0}
+# How analyses were produced: locally for trivial sessions, or with the compact or full prompt
+analysis_route_metrics = {"heuristic": 0, "compact": 0, "full": 0}
+
+# ==============================
+# Conversation History Summary
+# ==============================
+
+# Updates the running summary of a conversation with the messages that left the window
+history_summary_prompt = ChatPromptTemplate.from_messages([
+    ("system", """You keep a running summary of a retail sales training conversation between a
+sales associate and a customer. Update the summary with the new messages.
+
+Keep what matters later in the conversation: what the customer wants and their budget, the
+products, prices, offers and features mentioned, the customer's questions and objections, and
+any decisions. Leave out greetings and small talk. Reply with the summary only, in at most 80 words."""),
+    ("human", "CURRENT SUMMARY:\n{summary}\n\nNEW MESSAGES:\n{messages}")
+])
+history_summary_chain = history_summary_prompt | llm_history_summary
+
+# How stored summaries were updated
+history_summary_metrics = {"extractive_folds": 0, "llm_folds": 0, "llm_failures": 0, "folded_messages": 0}
+
 # ==============================
 # Conversation Utility Functions
 # ==============================
@@ -281,7 +490,8 @@ def detect_question_type(message: str) -> str:
     Determine what type of question the user/sales associate is asking.
     
     This helps the bot respond appropriately to common question types
-    without always needing to call the LLM, improving reliability.
+    without always needing to call the LLM, improving reliability. The
+    phrase tables live in message_intents.QUESTION_TYPE_PHRASES.
     
     Args:
         message: The user's message text
@@ -289,31 +499,8 @@ def detect_question_type(message: str) -> str:
     Returns:
         String identifier of the question type
     """
-    message = message.lower()
-    
-    # Check for personal questions about the bot/customer
-    if any(phrase in message for phrase in ["your name", "what is your name", "who are you", "may i know your name"]):
-        return "ASKING_NAME"
-    
-    if any(phrase in message for phrase in ["how are you", "how do you do", "how is your day"]):
-        return "ASKING_WELLBEING"
-        
-    # Check for greetings
-    if any(greeting in message for greeting in ["hello", "hi", "namaste", "greetings"]):
-        return "GREETING"
-    
-    # Check for product questions
-    if any(phrase in message for phrase in ["price", "cost", "how much", "expensive"]):
-        return "ASKING_PRICE"
-        
-    if any(phrase in message for phrase in ["feature", "specification", "what can it do"]):
-        return "ASKING_FEATURES"
-        
-    if any(phrase in message for phrase in ["warranty", "guarantee"]):
-        return "ASKING_WARRANTY"
-    
-    # Default case
-    return "GENERAL_QUESTION"
+    # All keyword tables are matched in one pass (see message_intents.py)
+    return question_type(classify_message(message))
 
 def generate_alternative_response():
     """
@@ -412,52 +599,91 @@ def apply_persona_to_response(response: str, customer: Dict[str, Any], traits: D
     # Don't make changes every time - sometimes keep the original for naturalness
     return modified_response if random.random() < 0.7 else response
 
-def retrieve_product_knowledge(query: str, product_category: str) -> str:
+def product_search_stats() -> Dict[str, Any]:
+    """Return lookup-path metrics for the product lookup and the vector index."""
+    return {
+        "lookup": product_lookup.stats() if product_lookup is not None else None,
+        "conversation_cache": product_context_cache.stats(),
+        "vector_index": product_partitions.stats() if product_partitions is not None else None
+    }
+
+def retrieve_product_knowledge(query: str, product_category: str, conversation_id: Optional[str] = None) -> str:
     """
     Retrieve relevant product information based on conversation context.
     
-    This function uses vector similarity search to find product information
-    that's relevant to the user's query within the specified category.
+    Products named in the query (brand/model) and keyword matches on features
+    and specs are found through in-memory indexes; vector similarity search
+    is only used when neither matches. Keyword and vector matches are restricted
+    to the scenario's category, so a smartphone scenario never retrieves
+    washing machines.
     
     Args:
         query: The user's message or query
         product_category: Product category to focus search on
+        conversation_id: Conversation the query belongs to; repeated queries
+            in the same conversation are answered from its cache
         
     Returns:
         Formatted product information string
     """
-    if product_vectorstore is None:
+    # Read both once, so a catalog reload during the search cannot mix versions
+    lookup, partitions = product_lookup, product_partitions
+    if lookup is None and partitions is None:
         return "No product information available."
     
-    # Enhance query with product category for better results
-    enhanced_query = f"{product_category}: {query}"
+    if conversation_id is not None:
+        cached = product_context_cache.get(conversation_id, query)
+        if cached is not None:
+            return cached
     
     # Retrieve relevant documents
-    docs = product_vectorstore.similarity_search(enhanced_query, k=3)
-    
-    if not docs:
-        return "No specific product information found."
+    try:
+        if lookup is not None:
+            vector_search = partitions.search if partitions is not None else None
+            texts = lookup.search(query, product_category, k=3, vector_search=vector_search)
+        else:
+            texts = [doc.page_content for doc in partitions.search(query, product_category, k=3)]
+    except Exception as e:
+        print(f"Error searching product knowledge base: {e}")
+        return "No product information available."
     
     # Format retrieved information
-    product_info = "\n\n".join([doc.page_content for doc in docs])
+    product_info = "\n\n".join(texts) if texts else "No specific product information found."
+    if conversation_id is not None:
+        product_context_cache.put(conversation_id, query, product_info)
     return product_info
 
-def format_conversation_history(history: List[Dict[str, str]], max_turns=8) -> str:
+def format_conversation_history(
+    history: List[Dict[str, str]],
+    max_turns=HISTORY_WINDOW_MESSAGES,
+    summary: Optional[Dict[str, Any]] = None
+) -> str:
     """
     Format conversation history to maintain better context for LLM prompt.
     
-    Increased from 4 to 8 turns to maintain better conversation coherence.
+    The last max_turns messages are included verbatim. Unless
+    HISTORY_SUMMARY_MODE is "off", older messages are not dropped but
+    replaced by a running summary (see history_summary.py), so the prompt
+    stays bounded however long the session runs.
     
     Args:
         history: List of conversation messages
         max_turns: Maximum number of turns to include
+        summary: Stored summary of the conversation, if any; messages it
+            does not cover yet are summarized extractively
         
     Returns:
         Formatted conversation history string
     """
-    recent_history = history[-max_turns:] if len(history) > max_turns else history
-    
     formatted = ""
+    if HISTORY_SUMMARY_MODE == "off" or len(history) <= max_turns:
+        recent_history = history[-max_turns:] if len(history) > max_turns else history
+    else:
+        summary = covering_summary(history, summary, max_turns)
+        recent_history = history[summary["messages"]:]
+        if summary["text"]:
+            formatted = f"Summary of the earlier conversation: {summary['text']}\n"
+    
     for entry in recent_history:
         role = entry["role"]
         message = entry["message"]
@@ -467,6 +693,64 @@ def format_conversation_history(history: List[Dict[str, str]], max_turns=8) -> s
             formatted += f"Customer: {message}\n"
     return formatted
 
+async def fold_history_summary(
+    history: List[Dict[str, str]],
+    summary: Optional[Dict[str, Any]]
+) -> Optional[Dict[str, Any]]:
+    """
+    Fold the messages that left the chat window into the stored summary.
+
+    Runs after the reply has been sent. With HISTORY_SUMMARY_MODE=llm the
+    summary is rewritten by the small summary model at background priority;
+    otherwise, or if that call fails, the messages are summarized
+    extractively.
+
+    Args:
+        history: Conversation history, including the latest reply
+        summary: Currently stored summary, or None
+
+    Returns:
+        The new summary to store, or None if no fold is due yet
+    """
+    fold = pending_fold(history, summary)
+    if fold is None:
+        return None
+    text, covered, entries = fold
+    history_summary_metrics["folded_messages"] += len(entries)
+
+    if HISTORY_SUMMARY_MODE == "llm":
+        summary_inputs = {
+            "summary": text or "(none yet)",
+            "messages": "\n".join(f"{speaker(entry)}: {entry['message']}" for entry in entries)
+        }
+        try:
+            result = await llm_scheduler.run(
+                lambda: history_summary_chain.ainvoke(summary_inputs),
+                priority=PRIORITY_BACKGROUND,
+                tokens=_langchain_token_estimate(history_summary_prompt, summary_inputs, HISTORY_SUMMARY_OUTPUT_TOKENS)
+            )
+            new_text = " ".join(_message_text(result).split())
+            if new_text:
+                history_summary_metrics["llm_folds"] += 1
+                return {"text": new_text[:HISTORY_SUMMARY_MAX_CHARS], "messages": covered}
+        except Exception as e:
+            print(f"Error summarizing conversation history, summarizing extractively instead: {e}")
+        history_summary_metrics["llm_failures"] += 1
+
+    history_summary_metrics["extractive_folds"] += 1
+    return {"text": extend_summary(text, entries), "messages": covered}
+
+def history_summary_stats() -> Dict[str, Any]:
+    """Return the summary settings and how stored summaries were updated."""
+    return {
+        "mode": HISTORY_SUMMARY_MODE,
+        "window_messages": HISTORY_WINDOW_MESSAGES,
+        "batch": HISTORY_SUMMARY_BATCH,
+        "max_chars": HISTORY_SUMMARY_MAX_CHARS,
+        "model": llm_history_summary.model_name,
+        **history_summary_metrics
+    }
+
 def is_conversation_ending(user_message: str, conversation_history: List[Dict[str, str]]) -> bool:
     """
     Determine if the conversation should naturally end based on context.
@@ -481,25 +765,12 @@ def is_conversation_ending(user_message: str, conversation_history: List[Dict[st
     Returns:
         Boolean indicating if the conversation should end
     """
-    # Keywords that might indicate a satisfied customer ready to purchase
-    satisfaction_indicators = [
-        "buy", "purchase", "take it", "get it", "decide", "interested", 
-        "will go with", "sounds good", "perfect", "exactly what I need"
-    ]
-    
-    # Check for explicit closing indicators in user message
-    closing_indicators = ["would you like to complete the purchase", "shall i process your order", 
-                         "would you like to buy", "ready to check out"]
-    
     # Minimum conversation length before allowing natural ending
     min_turns = 6  # Increased from 4 to ensure more meaningful exchanges
     
-    # Check if conversation is long enough and contains satisfaction indicators
+    # Satisfaction indicators or explicit closing phrases (message_intents.SIGNAL_PHRASES)
     if len(conversation_history) >= min_turns:
-        if any(indicator in user_message.lower() for indicator in satisfaction_indicators):
-            return True
-        if any(indicator in user_message.lower() for indicator in closing_indicators):
-            return True
+        return bool(classify_message(user_message) & ENDING_SIGNALS)
         
     return False
 
@@ -523,7 +794,7 @@ def validate_customer_response(response: str, user_message: str = "", is_initial
         return "What about the price?" if not is_initial else "Hi! Looking for some help here."
     
     # Ensure initial messages start with a greeting
-    if is_initial and not any(greeting in response.lower() for greeting in ["hello", "hi", "namaste"]):
+    if is_initial and "OPENING_GREETING" not in match_phrases(response):
         response = f"Hello! {response}"
     
     # Limit response length to max 50 words (increased from 10)
@@ -602,234 +873,386 @@ def simplify_persona(customer: Dict[str, Any]) -> Dict[str, Any]:
 # Main Response Generation Functions
 # ==============================
 
-def generate_customer_response(
+# Sync and async generators share the prompt building, shortcut handling and
+# fallback helpers below so both paths produce identical conversations.
+
+def _greeting_fallback(scenario: Dict[str, Any]) -> str:
+    """Pick a canned initial greeting when the LLM call fails."""
+    fallbacks = [
+        f"Hello! I'm looking for a {scenario['product_category']}.",
+        f"Hi there! Need information about these products.",
+        f"Namaste! Do you have {scenario['product_category']}?"
+    ]
+    return random.choice(fallbacks)
+
+def _conversation_fallback(scenario: Dict[str, Any], conversation_history: List[Dict[str, str]]) -> str:
+    """Pick a context-aware canned reply based on the conversation stage."""
+    if len(conversation_history) <= 2:
+        # Early conversation fallbacks - focused on initial inquiries
+        early_fallbacks = [
+            f"Do you have {scenario['product_category']} in different price ranges?",
+            f"What brands of {scenario['product_category']} do you carry?",
+            f"I'm looking for a {scenario['product_category']} with good quality.",
+            f"Can you recommend a {scenario['product_category']} for me?"
+        ]
+        return random.choice(early_fallbacks)
+    else:
+        # Later conversation fallbacks - more specific questions
+        later_fallbacks = [
+            "What about the warranty terms?",
+            "How does the EMI option work?",
+            "Do you have this in other colors?",
+            "Is this the latest model?",
+            "Are there any ongoing discounts?"
+        ]
+        return random.choice(later_fallbacks)
+
+def _message_text(result: Any) -> str:
+    """Extract string content from an AIMessage or any other chain result."""
+    if hasattr(result, 'content'):
+        return str(result.content)
+    return str(result)
+
+def _langchain_greeting_inputs(customer: Dict[str, Any], scenario: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the variables for the LangChain initial greeting prompt."""
+    return {
+        "customer_name": customer["name"],
+        "customer_age": customer["age"],
+        "shopping_style": customer["shopping_style"],
+        "patience_level": customer["patience_level"],
+        "politeness": customer["politeness"],
+        "tech_knowledge": customer["tech_knowledge"],
+        "price_sensitivity": customer.get("price_sensitivity", "Medium"),
+        "primary_concerns": customer.get("primary_concerns", "Quality and price"),
+        "scenario_title": scenario["title"],
+        "entry_behavior": scenario["entry_behavior"],
+        "product_category": scenario["product_category"]
+    }
+
+def _langchain_response_inputs(
+    customer: Dict[str, Any],
+    scenario: Dict[str, Any],
+    conversation_history: List[Dict[str, str]],
+    user_message: str,
+    history_summary: Optional[Dict[str, Any]] = None,
+    product_knowledge: str = ""
+) -> Dict[str, Any]:
+    """Build the variables for the LangChain customer response prompt."""
+    return {
+        # Customer profile
+        "customer_name": customer["name"],
+        "customer_gender": customer["gender"],
+        "customer_age": customer["age"],
+        "shopping_style": customer["shopping_style"],
+        "patience_level": customer["patience_level"],
+        "politeness": customer["politeness"],
+        "tech_knowledge": customer["tech_knowledge"],
+        "price_sensitivity": customer.get("price_sensitivity", "Medium"),
+        "primary_concerns": customer.get("primary_concerns", "Quality and price"),
+
+        # Scenario info
+        "scenario_title": scenario["title"],
+        "product_category": scenario["product_category"],
+        "customer_objective": scenario["customer_objective"],
+
+        # Context
+        "conversation_history": format_conversation_history(conversation_history, summary=history_summary),
+        "sales_associate_message": user_message,
+        "product_knowledge": _product_knowledge_section(product_knowledge),
+    }
+
+def _langchain_shortcut_response(
     customer: Dict[str, Any],
     scenario: Dict[str, Any],
-    traits: Dict[str, Any],
     conversation_history: List[Dict[str, str]],
     user_message: str
-) -> str:
+) -> Optional[str]:
     """
-    Generate a response from the simulated customer using LangChain.
-    
-    This is the main function that handles all aspects of response generation,
-    including error handling, question detection, and persona application.
-    
-    Args:
-        customer: Dictionary containing customer traits
-        scenario: Dictionary containing scenario information
-        traits: Dictionary containing personality trait information
-        conversation_history: List of previous conversation messages
-        user_message: The user's latest message
-        
+    Answer endings and common question types without calling the LLM.
+
     Returns:
-        Generated customer response string
+        The direct response, or None if the LLM should be used
     """
-    # Add detailed debug log
-    print(f"[DEBUG] Processing message: '{user_message}'")
-    
-    # If this is the initial greeting (no history or user message)
-    if not conversation_history and not user_message:
-        # Use the initial greeting prompt
-        greeting_chain = initial_greeting_prompt | llm
-        
-        try:
-            greeting_result = greeting_chain.invoke({
-                "customer_name": customer["name"],
-                "customer_age": customer["age"],
-                "shopping_style": customer["shopping_style"],
-                "patience_level": customer["patience_level"],
-                "politeness": customer["politeness"],
-                "tech_knowledge": customer["tech_knowledge"],
-                "price_sensitivity": customer.get("price_sensitivity", "Medium"),
-                "primary_concerns": customer.get("primary_concerns", "Quality and price"),
-                "scenario_title": scenario["title"],
-                "entry_behavior": scenario["entry_behavior"],
-                "product_category": scenario["product_category"]
-            })
-            
-            # Extract string content from AIMessage if needed
-            greeting_text = ""
-            if hasattr(greeting_result, 'content'):
-                greeting_text = str(greeting_result.content)
-            else:
-                greeting_text = str(greeting_result)
-            
-            # Validate and return the greeting
-            return validate_customer_response(greeting_text, "", True)
-                
-        except Exception as e:
-            print(f"Error generating initial greeting: {e}")
-            # Fallback initial messages - with greeting
-            fallbacks = [
-                f"Hello! I'm looking for a {scenario['product_category']}.",
-                f"Hi there! Need information about these products.",
-                f"Namaste! Do you have {scenario['product_category']}?"
-            ]
-            return random.choice(fallbacks)
-    
     # Check if conversation should end
     if is_conversation_ending(user_message, conversation_history):
         return "Thank you. I'll take it."
-    
-    # NEW: First check if user is asking a common question type that can be handled directly
+
+    # First check if user is asking a common question type that can be handled directly
     if user_message:
         question_type = detect_question_type(user_message)
         print(f"[DEBUG] Detected question type: {question_type}")
-        
+
         # Handle different question types with appropriate responses
         if question_type == "ASKING_NAME":
             patience = customer.get("patience_level", "Medium").lower()
-            
+
             if patience == "low":
                 return f"I'm {customer['name']}. Now, can we get back to the {scenario['product_category']}?"
             else:
                 return f"My name is {customer['name']}. I'm looking for a {scenario['product_category']}."
-            
+
         if question_type == "GREETING":
             return f"Hello! As I mentioned, I'm interested in buying a {scenario['product_category']}. Can you help me?"
-        
+
         if question_type == "ASKING_WELLBEING":
             politeness = customer.get("politeness", "Medium").lower()
-            
+
             if politeness == "high":
                 return "I'm doing well, thank you for asking. Now about the products we were discussing..."
             else:
                 return "I'm here to shop, not chat. What can you tell me about your products?"
-    
-    # For ongoing conversation, retrieve relevant product knowledge if needed
-    product_knowledge = ""
-    if user_message and product_vectorstore is not None:
-        if any(keyword in user_message.lower() for keyword in ["price", "feature", "spec", "emi", "option", "compare"]):
-            product_knowledge = retrieve_product_knowledge(user_message, scenario["product_category"])
-    
-    # Setup the customer response chain
-    response_chain = customer_response_prompt | llm
-    
-    try:
-        # Format conversation history for the prompt
-        formatted_history = format_conversation_history(conversation_history)
-        
-        print(f"[DEBUG] Attempting to generate response with LLM")
-        # Invoke the chain with all context
-        response_result = response_chain.invoke({
-            # Customer profile
-            "customer_name": customer["name"],
-            "customer_gender": customer["gender"],
-            "customer_age": customer["age"],
-            "shopping_style": customer["shopping_style"],
-            "patience_level": customer["patience_level"],
-            "politeness": customer["politeness"],
-            "tech_knowledge": customer["tech_knowledge"],
-            "price_sensitivity": customer.get("price_sensitivity", "Medium"),
-            "primary_concerns": customer.get("primary_concerns", "Quality and price"),
-            
-            # Scenario info
-            "scenario_title": scenario["title"],
-            "product_category": scenario["product_category"],
-            "customer_objective": scenario["customer_objective"],
-            
-            # Context
-            "conversation_history": formatted_history,
-            "sales_associate_message": user_message,
-        })
-        
-        # Extract string content from AIMessage if needed
-        response_text = ""
-        if hasattr(response_result, 'content'):
-            response_text = str(response_result.content)
-        else:
-            response_text = str(response_result)
-        
-        print(f"[DEBUG] LLM generated response: '{response_text}'")
-        
-        # Validate the response
-        validated_response = validate_customer_response(response_text, user_message)
-        
-        # Enhance response with persona-specific traits
-        enhanced_response = apply_persona_to_response(validated_response, customer, traits)
-        
-        return enhanced_response
-            
-    except Exception as e:
-        print(f"[DEBUG] Error generating customer response: {str(e)}")
-        
-        # Even with errors, handle basic questions without falling back to random responses
-        if user_message:
-            question_type = detect_question_type(user_message)
-            
-            # Provide direct responses for common questions even when the LLM fails
-            if question_type == "ASKING_NAME":
-                return f"I'm {customer['name']}. I'm interested in {scenario['product_category']}."
-                
-            if question_type == "GREETING":
-                return f"Hello there. I'm looking for {scenario['product_category']}."
-                
-            if question_type == "ASKING_PRICE":
-                return "What's the price range for this model?"
-                
-            if question_type == "ASKING_FEATURES":
-                return "Can you tell me about the main features?"
-                
-            if question_type == "ASKING_WARRANTY":
-                return "What kind of warranty does it come with?"
-        
-        # Context-aware fallbacks based on conversation stage
-        if len(conversation_history) <= 2:
-            # Early conversation fallbacks - focused on initial inquiries
-            early_fallbacks = [
-                f"Do you have {scenario['product_category']} in different price ranges?",
-                f"What brands of {scenario['product_category']} do you carry?",
-                f"I'm looking for a {scenario['product_category']} with good quality.",
-                f"Can you recommend a {scenario['product_category']} for me?"
-            ]
-            return random.choice(early_fallbacks)
-        else:
-            # Later conversation fallbacks - more specific questions
-            later_fallbacks = [
-                "What about the warranty terms?",
-                "How does the EMI option work?",
-                "Do you have this in other colors?",
-                "Is this the latest model?",
-                "Are there any ongoing discounts?"
-            ]
-            return random.choice(later_fallbacks)
 
-def generate_customer_response_direct(
+    return None
+
+def _needs_product_knowledge(user_message: str) -> bool:
+    """Check whether the message asks about something the product database can answer."""
+    if not user_message or (product_lookup is None and product_partitions is None):
+        return False
+    return "PRODUCT_QUESTION" in classify_message(user_message)
+
+def _product_knowledge(user_message: str, scenario: Dict[str, Any], conversation_id: Optional[str] = None) -> str:
+    """Retrieve the store's product information for a product question, or "" for any other message."""
+    if not _needs_product_knowledge(user_message):
+        return ""
+    return retrieve_product_knowledge(user_message, scenario["product_category"], conversation_id)
+
+async def _product_knowledge_async(
+    user_message: str,
+    scenario: Dict[str, Any],
+    conversation_id: Optional[str] = None
+) -> str:
+    """Non-blocking _product_knowledge; the search is CPU-bound, so it runs off the event loop."""
+    if not _needs_product_knowledge(user_message):
+        return ""
+    return await asyncio.to_thread(
+        retrieve_product_knowledge, user_message, scenario["product_category"], conversation_id
+    )
+
+def _product_knowledge_section(product_knowledge: str) -> str:
+    """Prompt block with the retrieved product information, empty when there is none."""
+    if not product_knowledge:
+        return ""
+    return (
+        "\nStore product information related to the sales associate's message (use it to notice\n"
+        "wrong or vague answers and to ask realistic follow-up questions; do not recite it):\n"
+        f"{product_knowledge}\n"
+    )
+
+def _langchain_error_response(
+    customer: Dict[str, Any],
+    scenario: Dict[str, Any],
+    conversation_history: List[Dict[str, str]],
+    user_message: str
+) -> str:
+    """Build a reply after the LangChain call failed."""
+    # Even with errors, handle basic questions without falling back to random responses
+    if user_message:
+        question_type = detect_question_type(user_message)
+
+        # Provide direct responses for common questions even when the LLM fails
+        if question_type == "ASKING_NAME":
+            return f"I'm {customer['name']}. I'm interested in {scenario['product_category']}."
+
+        if question_type == "GREETING":
+            return f"Hello there. I'm looking for {scenario['product_category']}."
+
+        if question_type == "ASKING_PRICE":
+            return "What's the price range for this model?"
+
+        if question_type == "ASKING_FEATURES":
+            return "Can you tell me about the main features?"
+
+        if question_type == "ASKING_WARRANTY":
+            return "What kind of warranty does it come with?"
+
+    return _conversation_fallback(scenario, conversation_history)
+
+def _finalize_customer_response(
+    response_text: str,
+    customer: Dict[str, Any],
+    traits: Dict[str, Any],
+    user_message: str
+) -> str:
+    """Validate an LLM reply and apply persona-specific patterns to it."""
+    # Validate the response
+    validated_response = validate_customer_response(response_text, user_message)
+
+    # Enhance response with persona-specific traits
+    return apply_persona_to_response(validated_response, customer, traits)
+
+def _cached_customer_response(
     customer: Dict[str, Any],
     scenario: Dict[str, Any],
     traits: Dict[str, Any],
     conversation_history: List[Dict[str, str]],
     user_message: str
+) -> Optional[str]:
+    """Serve a reply from the semantic cache, with persona post-processing applied."""
+    cached_reply = semantic_cache.lookup(customer, scenario, traits, conversation_history, user_message)
+    if cached_reply is None:
+        return None
+    print(f"[DEBUG] Semantic cache hit for: '{user_message}'")
+    return _finalize_customer_response(cached_reply, customer, traits, user_message)
+
+def generate_customer_response(
+    customer: Dict[str, Any],
+    scenario: Dict[str, Any],
+    traits: Dict[str, Any],
+    conversation_history: List[Dict[str, str]],
+    user_message: str,
+    conversation_id: Optional[str] = None,
+    history_summary: Optional[Dict[str, Any]] = None
 ) -> str:
     """
-    Generate a response directly using the Groq API instead of LangChain.
-    
-    This alternative implementation bypasses LangChain to use the Groq API
-    directly, which can be more reliable in some environments.
-    
+    Generate a response from the simulated customer using LangChain.
+
+    This is the main function that handles all aspects of response generation,
+    including error handling, question detection, and persona application.
+
     Args:
         customer: Dictionary containing customer traits
         scenario: Dictionary containing scenario information
         traits: Dictionary containing personality trait information
         conversation_history: List of previous conversation messages
         user_message: The user's latest message
-        
+        conversation_id: Conversation id, used to cache product lookups
+        history_summary: Stored summary of the older messages, if any
+
     Returns:
         Generated customer response string
     """
+    # Add detailed debug log
+    print(f"[DEBUG] Processing message: '{user_message}'")
+
     # If this is the initial greeting (no history or user message)
     if not conversation_history and not user_message:
-        system_prompt = f"""You are simulating an Indian retail customer named {customer['name']}.
-            
-Customer traits:
-- Age: {customer['age']}
-- Shopping style: {customer['shopping_style']}
-- Patience level: {customer['patience_level']}
-- Politeness: {customer['politeness']}
-- Technical knowledge: {customer['tech_knowledge']}
-- Price sensitivity: {customer.get('price_sensitivity', 'Medium')}
-
+        # Use the initial greeting prompt
+        greeting_chain = initial_greeting_prompt | llm
+
+        try:
+            greeting_result = greeting_chain.invoke(_langchain_greeting_inputs(customer, scenario))
+
+            # Validate and return the greeting
+            return validate_customer_response(_message_text(greeting_result), "", True)
+
+        except Exception as e:
+            print(f"Error generating initial greeting: {e}")
+            return _greeting_fallback(scenario)
+
+    shortcut = _langchain_shortcut_response(customer, scenario, conversation_history, user_message)
+    if shortcut is not None:
+        return shortcut
+
+    cached = _cached_customer_response(customer, scenario, traits, conversation_history, user_message)
+    if cached is not None:
+        return cached
+
+    # For ongoing conversation, retrieve relevant product knowledge if needed
+    product_knowledge = _product_knowledge(user_message, scenario, conversation_id)
+
+    # Setup the customer response chain
+    response_chain = customer_response_prompt | llm
+
+    try:
+        print(f"[DEBUG] Attempting to generate response with LLM")
+        # Invoke the chain with all context
+        response_result = response_chain.invoke(
+            _langchain_response_inputs(
+                customer, scenario, conversation_history, user_message, history_summary, product_knowledge
+            )
+        )
+
+        response_text = _message_text(response_result)
+        print(f"[DEBUG] LLM generated response: '{response_text}'")
+        semantic_cache.store(customer, scenario, traits, conversation_history, user_message, response_text)
+
+        return _finalize_customer_response(response_text, customer, traits, user_message)
+
+    except Exception as e:
+        print(f"[DEBUG] Error generating customer response: {str(e)}")
+        return _langchain_error_response(customer, scenario, conversation_history, user_message)
+
+async def generate_customer_response_async(
+    customer: Dict[str, Any],
+    scenario: Dict[str, Any],
+    traits: Dict[str, Any],
+    conversation_history: List[Dict[str, str]],
+    user_message: str,
+    conversation_id: Optional[str] = None,
+    history_summary: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Non-blocking variant of generate_customer_response for async routes.
+
+    Uses ainvoke on the LangChain chains so a slow Groq call only suspends
+    the calling request instead of the whole event loop.
+
+    Args:
+        customer: Dictionary containing customer traits
+        scenario: Dictionary containing scenario information
+        traits: Dictionary containing personality trait information
+        conversation_history: List of previous conversation messages
+        user_message: The user's latest message
+        conversation_id: Conversation id, used to cache product lookups
+        history_summary: Stored summary of the older messages, if any
+
+    Returns:
+        Generated customer response string
+    """
+    print(f"[DEBUG] Processing message: '{user_message}'")
+
+    if not conversation_history and not user_message:
+        try:
+            return await generate_initial_greeting_async(customer, scenario, use_direct_api=False)
+        except Exception as e:
+            print(f"Error generating initial greeting: {e}")
+            return _greeting_fallback(scenario)
+
+    shortcut = _langchain_shortcut_response(customer, scenario, conversation_history, user_message)
+    if shortcut is not None:
+        return shortcut
+
+    cached = _cached_customer_response(customer, scenario, traits, conversation_history, user_message)
+    if cached is not None:
+        return cached
+
+    product_knowledge = await _product_knowledge_async(user_message, scenario, conversation_id)
+
+    response_chain = customer_response_prompt | llm
+    response_inputs = _langchain_response_inputs(
+        customer, scenario, conversation_history, user_message, history_summary, product_knowledge
+    )
+
+    try:
+        print(f"[DEBUG] Attempting to generate response with LLM")
+        response_result = await llm_scheduler.run(
+            lambda: response_chain.ainvoke(response_inputs),
+            priority=PRIORITY_CHAT,
+            tokens=_langchain_token_estimate(customer_response_prompt, response_inputs)
+        )
+
+        response_text = _message_text(response_result)
+        print(f"[DEBUG] LLM generated response: '{response_text}'")
+        semantic_cache.store(customer, scenario, traits, conversation_history, user_message, response_text)
+
+        return _finalize_customer_response(response_text, customer, traits, user_message)
+
+    except Exception as e:
+        print(f"[DEBUG] Error generating customer response: {str(e)}")
+        return _langchain_error_response(customer, scenario, conversation_history, user_message)
+
+def _direct_greeting_messages(customer: Dict[str, Any], scenario: Dict[str, Any]) -> List[Dict[str, str]]:
+    """Build the Groq chat messages for the initial customer greeting."""
+    system_prompt = f"""You are simulating an Indian retail customer named {customer['name']}.
+
+Customer traits:
+- Age: {customer['age']}
+- Shopping style: {customer['shopping_style']}
+- Patience level: {customer['patience_level']}
+- Politeness: {customer['politeness']}
+- Technical knowledge: {customer['tech_knowledge']}
+- Price sensitivity: {customer.get('price_sensitivity', 'Medium')}
+
 Scenario: {scenario['title']}
 Entry behavior: {scenario['entry_behavior']}
 Shopping for: {scenario['product_category']}
@@ -838,54 +1261,23 @@ Generate a natural greeting to the sales associate that clearly shows your perso
 ALWAYS start with a greeting like "Hello", "Hi", or "Namaste".
 Keep it short, just 1-2 sentences that sound natural for spoken Indian English."""
 
-        try:
-            # Make direct API call to Groq
-            completion = groq_client.chat.completions.create(
-                model="llama3-70b-8192",  # Using a model that exists in Groq
-                messages=[{"role": "system", "content": system_prompt}],
-                temperature=0.7,
-                max_tokens=100,
-                top_p=1,
-                stream=False,
-            )
-            
-            # Extract response text
-            greeting_text = completion.choices[0].message.content
-            
-            # Validate and return the greeting
-            return validate_customer_response(greeting_text, "", True)
-                
-        except Exception as e:
-            print(f"Error generating initial greeting with direct Groq API: {e}")
-            # Fallback initial messages
-            fallbacks = [
-                f"Hello! I'm looking for a {scenario['product_category']}.",
-                f"Hi there! Need information about these products.",
-                f"Namaste! Do you have {scenario['product_category']}?"
-            ]
-            return random.choice(fallbacks)
-    
-    # Check if asking a direct question we can handle without the LLM
-    if user_message:
-        question_type = detect_question_type(user_message)
-        
-        # Handle common questions directly
-        if question_type == "ASKING_NAME":
-            return f"I'm {customer['name']}. I'm looking for a {scenario['product_category']}."
-            
-        if question_type == "GREETING":
-            return f"Hello! As I mentioned, I'm interested in buying a {scenario['product_category']}."
-    
-    # Check if conversation should end
-    if is_conversation_ending(user_message, conversation_history):
-        return "Thank you. I'll take it."
-    
+    return [{"role": "system", "content": system_prompt}]
+
+def _direct_response_messages(
+    customer: Dict[str, Any],
+    scenario: Dict[str, Any],
+    conversation_history: List[Dict[str, str]],
+    user_message: str,
+    history_summary: Optional[Dict[str, Any]] = None,
+    product_knowledge: str = ""
+) -> List[Dict[str, str]]:
+    """Build the Groq chat messages for an ongoing customer response."""
     # Format conversation history for the prompt
-    formatted_history = format_conversation_history(conversation_history)
-    
+    formatted_history = format_conversation_history(conversation_history, summary=history_summary)
+
     # Create system prompt
     system_prompt = f"""You are simulating an Indian retail customer with these traits:
-    
+
 Customer profile:
 - Name: {customer['name']} ({customer.get('gender', 'Male/Female')}, {customer['age']} years old)
 - Shopping style: {customer['shopping_style']}
@@ -906,146 +1298,643 @@ IMPORTANT GUIDELINES:
 4. Respond directly to what the sales associate just said
 5. If satisfied after a meaningful interaction, respond with "Thank you" to end the conversation
 6. Use Indian English speech patterns when appropriate
-
+{_product_knowledge_section(product_knowledge)}
 The conversation so far:
 {formatted_history}"""
 
+    # Create messages array with system prompt and latest user message
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"Sales Associate: {user_message}"}
+    ]
+
+def _direct_completion_kwargs(messages: List[Dict[str, str]]) -> Dict[str, Any]:
+    """Shared Groq chat completion parameters for customer replies."""
+    return {
+        "model": "llama3-70b-8192",  # Using a model that exists in Groq
+        "messages": messages,
+        "temperature": 0.7,
+        "max_tokens": 100,
+        "top_p": 1,
+        "stream": False,
+    }
+
+def _direct_token_estimate(completion_kwargs: Dict[str, Any]) -> int:
+    """Estimate prompt + completion tokens of a direct Groq call for the rate limiter."""
+    prompt_text = " ".join(message["content"] for message in completion_kwargs["messages"])
+    return estimate_tokens(prompt_text, completion_kwargs["max_tokens"])
+
+def _langchain_token_estimate(prompt: Any, inputs: Dict[str, Any], max_output_tokens: int = 100) -> int:
+    """Estimate prompt + completion tokens of a LangChain call for the rate limiter."""
+    return estimate_tokens(prompt.format(**inputs), max_output_tokens)
+
+def _direct_shortcut_response(
+    customer: Dict[str, Any],
+    scenario: Dict[str, Any],
+    conversation_history: List[Dict[str, str]],
+    user_message: str
+) -> Optional[str]:
+    """
+    Answer common questions and endings without calling the Groq API.
+
+    Returns:
+        The direct response, or None if the LLM should be used
+    """
+    # Check if asking a direct question we can handle without the LLM
+    if user_message:
+        question_type = detect_question_type(user_message)
+
+        # Handle common questions directly
+        if question_type == "ASKING_NAME":
+            return f"I'm {customer['name']}. I'm looking for a {scenario['product_category']}."
+
+        if question_type == "GREETING":
+            return f"Hello! As I mentioned, I'm interested in buying a {scenario['product_category']}."
+
+    # Check if conversation should end
+    if is_conversation_ending(user_message, conversation_history):
+        return "Thank you. I'll take it."
+
+    return None
+
+def generate_customer_response_direct(
+    customer: Dict[str, Any],
+    scenario: Dict[str, Any],
+    traits: Dict[str, Any],
+    conversation_history: List[Dict[str, str]],
+    user_message: str,
+    conversation_id: Optional[str] = None,
+    history_summary: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Generate a response directly using the Groq API instead of LangChain.
+
+    This alternative implementation bypasses LangChain to use the Groq API
+    directly, which can be more reliable in some environments.
+
+    Args:
+        customer: Dictionary containing customer traits
+        scenario: Dictionary containing scenario information
+        traits: Dictionary containing personality trait information
+        conversation_history: List of previous conversation messages
+        user_message: The user's latest message
+        conversation_id: Conversation id, used to cache product lookups
+        history_summary: Stored summary of the older messages, if any
+
+    Returns:
+        Generated customer response string
+    """
+    # If this is the initial greeting (no history or user message)
+    if not conversation_history and not user_message:
+        try:
+            # Make direct API call to Groq
+            completion = groq_client.chat.completions.create(
+                **_direct_completion_kwargs(_direct_greeting_messages(customer, scenario))
+            )
+
+            # Validate and return the greeting
+            return validate_customer_response(completion.choices[0].message.content, "", True)
+
+        except Exception as e:
+            print(f"Error generating initial greeting with direct Groq API: {e}")
+            return _greeting_fallback(scenario)
+
+    shortcut = _direct_shortcut_response(customer, scenario, conversation_history, user_message)
+    if shortcut is not None:
+        return shortcut
+
+    cached = _cached_customer_response(customer, scenario, traits, conversation_history, user_message)
+    if cached is not None:
+        return cached
+
+    product_knowledge = _product_knowledge(user_message, scenario, conversation_id)
+
     try:
-        # Create messages array with system prompt and latest user message
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"Sales Associate: {user_message}"}
-        ]
-        
         # Make direct API call to Groq
         completion = groq_client.chat.completions.create(
-            model="llama3-70b-8192",
-            messages=messages,
-            temperature=0.7,
-            max_tokens=100,
-            top_p=1,
-            stream=False,
+            **_direct_completion_kwargs(_direct_response_messages(
+                customer, scenario, conversation_history, user_message, history_summary, product_knowledge
+            ))
         )
-        
-        # Extract response text
+
         response_text = completion.choices[0].message.content
-        
-        # Validate the response
-        validated_response = validate_customer_response(response_text, user_message)
-        
-        # Enhance response with persona-specific traits
-        enhanced_response = apply_persona_to_response(validated_response, customer, traits)
-        
-        return enhanced_response
-            
+        semantic_cache.store(customer, scenario, traits, conversation_history, user_message, response_text)
+
+        return _finalize_customer_response(response_text, customer, traits, user_message)
+
     except Exception as e:
         print(f"Error generating customer response with direct Groq API: {e}")
-        
-        # Context-aware fallbacks based on conversation stage
-        if len(conversation_history) <= 2:
-            # Early conversation fallbacks
-            early_fallbacks = [
-                f"Do you have {scenario['product_category']} in different price ranges?",
-                f"What brands of {scenario['product_category']} do you carry?",
-                f"I'm looking for a {scenario['product_category']} with good quality.",
-                f"Can you recommend a {scenario['product_category']} for me?"
-            ]
-            return random.choice(early_fallbacks)
-        else:
-            # Later conversation fallbacks
-            later_fallbacks = [
-                "What about the warranty terms?",
-                "How does the EMI option work?",
-                "Do you have this in other colors?",
-                "Is this the latest model?",
-                "Are there any ongoing discounts?"
-            ]
-            return random.choice(later_fallbacks)
+        return _conversation_fallback(scenario, conversation_history)
+
+async def generate_initial_greeting_async(
+    customer: Dict[str, Any],
+    scenario: Dict[str, Any],
+    use_direct_api: bool = True,
+    priority: int = PRIORITY_CHAT
+) -> str:
+    """
+    Generate the customer's initial greeting without swallowing LLM errors.
+
+    Used by the greeting pool, which must not store canned fallback greetings,
+    and by the async generators, which add the fallback themselves.
+
+    Args:
+        customer: Dictionary containing customer traits
+        scenario: Dictionary containing scenario information
+        use_direct_api: Use the Groq API directly instead of LangChain
+        priority: Rate limiter priority (the greeting pool uses PRIORITY_BACKGROUND)
+
+    Returns:
+        Validated greeting string
+
+    Raises:
+        Exception: Any error raised by the LLM client
+    """
+    if use_direct_api:
+        completion_kwargs = _direct_completion_kwargs(_direct_greeting_messages(customer, scenario))
+        completion = await llm_scheduler.run(
+            lambda: async_groq_client.chat.completions.create(**completion_kwargs),
+            priority=priority,
+            tokens=_direct_token_estimate(completion_kwargs)
+        )
+        greeting_text = completion.choices[0].message.content
+    else:
+        greeting_chain = initial_greeting_prompt | llm
+        greeting_inputs = _langchain_greeting_inputs(customer, scenario)
+        greeting_result = await llm_scheduler.run(
+            lambda: greeting_chain.ainvoke(greeting_inputs),
+            priority=priority,
+            tokens=_langchain_token_estimate(initial_greeting_prompt, greeting_inputs)
+        )
+        greeting_text = _message_text(greeting_result)
+
+    return validate_customer_response(greeting_text, "", True)
+
+async def generate_customer_response_direct_async(
+    customer: Dict[str, Any],
+    scenario: Dict[str, Any],
+    traits: Dict[str, Any],
+    conversation_history: List[Dict[str, str]],
+    user_message: str,
+    conversation_id: Optional[str] = None,
+    history_summary: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Non-blocking variant of generate_customer_response_direct for async routes.
+
+    Awaits the AsyncGroq client so one slow completion does not stall every
+    other conversation served by the same worker.
+
+    Args:
+        customer: Dictionary containing customer traits
+        scenario: Dictionary containing scenario information
+        traits: Dictionary containing personality trait information
+        conversation_history: List of previous conversation messages
+        user_message: The user's latest message
+        conversation_id: Conversation id, used to cache product lookups
+        history_summary: Stored summary of the older messages, if any
+
+    Returns:
+        Generated customer response string
+    """
+    if not conversation_history and not user_message:
+        try:
+            return await generate_initial_greeting_async(customer, scenario, use_direct_api=True)
+        except Exception as e:
+            print(f"Error generating initial greeting with direct Groq API: {e}")
+            return _greeting_fallback(scenario)
+
+    shortcut = _direct_shortcut_response(customer, scenario, conversation_history, user_message)
+    if shortcut is not None:
+        return shortcut
+
+    cached = _cached_customer_response(customer, scenario, traits, conversation_history, user_message)
+    if cached is not None:
+        return cached
+
+    product_knowledge = await _product_knowledge_async(user_message, scenario, conversation_id)
+    completion_kwargs = _direct_completion_kwargs(_direct_response_messages(
+        customer, scenario, conversation_history, user_message, history_summary, product_knowledge
+    ))
+
+    try:
+        completion = await llm_scheduler.run(
+            lambda: async_groq_client.chat.completions.create(**completion_kwargs),
+            priority=PRIORITY_CHAT,
+            tokens=_direct_token_estimate(completion_kwargs)
+        )
+        response_text = completion.choices[0].message.content
+        semantic_cache.store(customer, scenario, traits, conversation_history, user_message, response_text)
+
+        return _finalize_customer_response(response_text, customer, traits, user_message)
+    except Exception as e:
+        print(f"Error generating customer response with direct Groq API: {e}")
+        return _conversation_fallback(scenario, conversation_history)
+
+# ==============================
+# Streaming Response Generation
+# ==============================
+
+# Streaming generators yield {"event": "token", "text": ...} for every token as it
+# arrives, then exactly one {"event": "done", "customer_message": ...} carrying the
+# validated, persona-adjusted reply. Persona post-processing can rewrite the text,
+# so clients should replace the streamed tokens with the final message.
+
+async def stream_customer_response_direct(
+    customer: Dict[str, Any],
+    scenario: Dict[str, Any],
+    traits: Dict[str, Any],
+    conversation_history: List[Dict[str, str]],
+    user_message: str,
+    conversation_id: Optional[str] = None,
+    history_summary: Optional[Dict[str, Any]] = None
+) -> AsyncIterator[Dict[str, str]]:
+    """
+    Stream a customer response token by token using the async Groq client.
+
+    Args:
+        customer: Dictionary containing customer traits
+        scenario: Dictionary containing scenario information
+        traits: Dictionary containing personality trait information
+        conversation_history: List of previous conversation messages
+        user_message: The user's latest message
+        conversation_id: Conversation id, used to cache product lookups
+        history_summary: Stored summary of the older messages, if any
+
+    Yields:
+        Token events followed by a single done event with the final reply
+    """
+    shortcut = _direct_shortcut_response(customer, scenario, conversation_history, user_message)
+    if shortcut is not None:
+        yield {"event": "done", "customer_message": shortcut}
+        return
+
+    cached = _cached_customer_response(customer, scenario, traits, conversation_history, user_message)
+    if cached is not None:
+        yield {"event": "done", "customer_message": cached}
+        return
+
+    product_knowledge = await _product_knowledge_async(user_message, scenario, conversation_id)
+    completion_kwargs = _direct_completion_kwargs(_direct_response_messages(
+        customer, scenario, conversation_history, user_message, history_summary, product_knowledge
+    ))
+    completion_kwargs["stream"] = True
+
+    tokens = []
+    try:
+        stream = llm_scheduler.stream(
+            lambda: async_groq_client.chat.completions.create(**completion_kwargs),
+            priority=PRIORITY_CHAT,
+            tokens=_direct_token_estimate(completion_kwargs)
+        )
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if token:
+                tokens.append(token)
+                yield {"event": "token", "text": token}
+
+        response_text = "".join(tokens)
+        semantic_cache.store(customer, scenario, traits, conversation_history, user_message, response_text)
+
+        customer_message = _finalize_customer_response(response_text, customer, traits, user_message)
+    except Exception as e:
+        print(f"Error streaming customer response with direct Groq API: {e}")
+        customer_message = _conversation_fallback(scenario, conversation_history)
+
+    yield {"event": "done", "customer_message": customer_message}
+
+async def stream_customer_response(
+    customer: Dict[str, Any],
+    scenario: Dict[str, Any],
+    traits: Dict[str, Any],
+    conversation_history: List[Dict[str, str]],
+    user_message: str,
+    conversation_id: Optional[str] = None,
+    history_summary: Optional[Dict[str, Any]] = None
+) -> AsyncIterator[Dict[str, str]]:
+    """
+    Stream a customer response token by token using LangChain astream.
+
+    Args:
+        customer: Dictionary containing customer traits
+        scenario: Dictionary containing scenario information
+        traits: Dictionary containing personality trait information
+        conversation_history: List of previous conversation messages
+        user_message: The user's latest message
+        conversation_id: Conversation id, used to cache product lookups
+        history_summary: Stored summary of the older messages, if any
+
+    Yields:
+        Token events followed by a single done event with the final reply
+    """
+    shortcut = _langchain_shortcut_response(customer, scenario, conversation_history, user_message)
+    if shortcut is not None:
+        yield {"event": "done", "customer_message": shortcut}
+        return
+
+    cached = _cached_customer_response(customer, scenario, traits, conversation_history, user_message)
+    if cached is not None:
+        yield {"event": "done", "customer_message": cached}
+        return
+
+    product_knowledge = await _product_knowledge_async(user_message, scenario, conversation_id)
+
+    response_chain = customer_response_prompt | llm
+    response_inputs = _langchain_response_inputs(
+        customer, scenario, conversation_history, user_message, history_summary, product_knowledge
+    )
+
+    tokens = []
+    try:
+        async for chunk in llm_scheduler.stream(
+            lambda: response_chain.astream(response_inputs),
+            priority=PRIORITY_CHAT,
+            tokens=_langchain_token_estimate(customer_response_prompt, response_inputs)
+        ):
+            token = _message_text(chunk)
+            if token:
+                tokens.append(token)
+                yield {"event": "token", "text": token}
+
+        response_text = "".join(tokens)
+        semantic_cache.store(customer, scenario, traits, conversation_history, user_message, response_text)
+
+        customer_message = _finalize_customer_response(response_text, customer, traits, user_message)
+    except Exception as e:
+        print(f"[DEBUG] Error streaming customer response: {str(e)}")
+        customer_message = _langchain_error_response(customer, scenario, conversation_history, user_message)
+
+    yield {"event": "done", "customer_message": customer_message}
+
+# ==============================
+# Conversation Analysis
+# ==============================
 
 def extract_scores_from_text(text):
     """
-    Extract scores and suggestions from text when JSON parsing fails.
+    Extract scores and suggestions from the analysis output.
+
+    Accepts a JSON object or the markdown format requested by the analysis
+    prompt; see analysis_parser.py.
     """
-    # Default values if extraction fails
-    data = {
-        "overall_score": 50,
+    return parse_analysis_output(text)
+
+def _analysis_inputs(
+    customer: Dict[str, Any],
+    scenario: Dict[str, Any],
+    conversation_history: List[Dict[str, str]]
+) -> Dict[str, Any]:
+    """Build the variables for the analysis prompt."""
+    return {
+        # Scenario info
+        "scenario_title": scenario["title"],
+        "product_category": scenario["product_category"],
+        "customer_objective": scenario["customer_objective"],
+        "training_focus": scenario["training_focus"],
+        "ideal_resolution": scenario["ideal_resolution"],
+
+        # Customer info
+        "customer_name": customer["name"],
+        "shopping_style": customer["shopping_style"],
+        "patience_level": customer["patience_level"],
+        "politeness": customer["politeness"],
+        "tech_knowledge": customer["tech_knowledge"],
+        "primary_concerns": customer.get("primary_concerns", "Quality and price"),
+
+        # Conversation
+        "conversation_history": format_conversation_history(conversation_history, max_turns=10)
+    }
+
+def _compact_analysis() -> bool:
+    return ANALYSIS_OUTPUT_MODE == "json" and ANALYSIS_PROMPT_STYLE == "compact"
+
+def _prepare_analysis(
+    customer: Dict[str, Any],
+    scenario: Dict[str, Any],
+    conversation_history: List[Dict[str, str]]
+) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    """
+    Score the transcript locally and build the analysis prompt inputs.
+
+    Args:
+        customer: Dictionary containing customer traits
+        scenario: Dictionary containing scenario information
+        conversation_history: List of conversation messages
+
+    Returns:
+        (transcript features, prompt inputs); the inputs are None when the
+        session is too short to be worth an LLM analysis
+    """
+    features = score_transcript(conversation_history, scenario)
+    if not needs_llm_analysis(features):
+        return features, None
+
+    inputs = _analysis_inputs(customer, scenario, conversation_history)
+    if _compact_analysis():
+        # The features summarize the whole conversation, so fewer messages are needed
+        inputs["conversation_history"] = format_conversation_history(
+            conversation_history, max_turns=ANALYSIS_TRANSCRIPT_TURNS
+        )
+        inputs["transcript_features"] = feature_summary(features)
+    return features, inputs
+
+def analysis_cache_key(
+    customer: Dict[str, Any],
+    scenario: Dict[str, Any],
+    conversation_history: List[Dict[str, str]]
+) -> str:
+    """
+    Hash the exact analysis inputs (scenario, persona and formatted transcript).
+
+    Two requests with the same key would send the same prompt to the same
+    model, or get the same local heuristic analysis, so their analysis can
+    be shared. The key identifies a result, not an attempt: separate
+    conversations with the same key are still recorded separately.
+
+    Args:
+        customer: Dictionary containing customer traits
+        scenario: Dictionary containing scenario information
+        conversation_history: List of conversation messages
+
+    Returns:
+        Hex digest identifying the analysis
+    """
+    features, inputs = _prepare_analysis(customer, scenario, conversation_history)
+    payload = json.dumps(
+        [
+            ANALYSIS_CACHE_VERSION, ANALYSIS_OUTPUT_MODE, ANALYSIS_PROMPT_STYLE,
+            ANALYSIS_MIN_AGENT_TURNS, ANALYSIS_MIN_AGENT_WORDS, llm_analysis.model_name,
+            inputs if inputs is not None else {"heuristic": features}
+        ],
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _build_analysis_result(result_text: str) -> Dict[str, Any]:
+    """Turn raw analysis text into the validated analysis dictionary."""
+    print(f"Raw analysis result: {result_text[:200]}...")  # Print first 200 chars for debugging
+
+    # Extract scores and suggestions from the text
+    extracted_data = extract_scores_from_text(result_text)
+
+    # Create a Pydantic model first (for validation)
+    analysis_result = PerformanceAnalysis(
+        overall_score=extracted_data["overall_score"],
+        category_scores=CategoryScores(
+            grammar=extracted_data["category_scores"]["grammar"],
+            customer_handling=extracted_data["category_scores"]["customer_handling"],
+            communication=extracted_data["category_scores"]["communication"],
+            customer_respect=extracted_data["category_scores"]["customer_respect"],
+            product_knowledge=extracted_data["category_scores"]["product_knowledge"],
+            solution_approach=extracted_data["category_scores"]["solution_approach"]
+        ),
+        improvement_suggestions=extracted_data["improvement_suggestions"],
+        observations=extracted_data["observations"],
+        highlight="The trainee completed the interactive sales training exercise."
+    )
+
+    # Convert to dictionary for consistent return type
+    return {
+        "overall_score": analysis_result.overall_score,
         "category_scores": {
-            "grammar": 50,
-            "customer_handling": 50,
-            "communication": 50,
-            "customer_respect": 50,
-            "product_knowledge": 50,
-            "solution_approach": 50
+            "grammar": analysis_result.category_scores.grammar,
+            "customer_handling": analysis_result.category_scores.customer_handling,
+            "communication": analysis_result.category_scores.communication,
+            "customer_respect": analysis_result.category_scores.customer_respect,
+            "product_knowledge": analysis_result.category_scores.product_knowledge,
+            "solution_approach": analysis_result.category_scores.solution_approach
         },
-        "improvement_suggestions": [],
-        "observations": [],
-        "highlight": "Performance review completed."
+        "improvement_suggestions": analysis_result.improvement_suggestions,
+        "observations": analysis_result.observations,
+        "highlight": analysis_result.highlight
+    }
+
+def validate_analysis_output(text: str, defaults: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Validate a JSON-mode analysis against PerformanceAnalysis in one pass.
+
+    Args:
+        text: Raw model output
+        defaults: Top-level fields filled in locally when the output omits
+            them (the compact prompt does not ask for observations)
+
+    Returns:
+        The analysis dictionary
+
+    Raises:
+        AnalysisOutputError: If the output is not valid JSON, misses fields,
+            or has scores outside 0-100
+    """
+    try:
+        if defaults:
+            payload = json.loads(strip_json_fence(text))
+            if isinstance(payload, dict):
+                payload = {**defaults, **payload}
+            analysis = PerformanceAnalysis.parse_obj(payload)
+        else:
+            analysis = PerformanceAnalysis.parse_raw(strip_json_fence(text))
+    except ValueError as e:
+        raise AnalysisOutputError(str(e))
+
+    scores = {"overall_score": analysis.overall_score, **analysis.category_scores.dict()}
+    out_of_range = [name for name, score in scores.items() if not 0 <= score <= 100]
+    if out_of_range:
+        raise AnalysisOutputError(f"Scores must be integers from 0 to 100: {', '.join(out_of_range)}")
+
+    return analysis.dict()
+
+def _repair_inputs(error: AnalysisOutputError, text: str) -> Dict[str, Any]:
+    """Variables for the repair prompt; long outputs are truncated to keep the call cheap."""
+    return {"error": str(error)[:1000], "output": text[:6000]}
+
+def _accept_repaired_analysis(text: str, defaults: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Validate the repaired output and record whether the repair worked."""
+    try:
+        result = validate_analysis_output(text, defaults)
+    except AnalysisOutputError:
+        analysis_output_metrics["failed"] += 1
+        raise
+    analysis_output_metrics["repaired"] += 1
+    return result
+
+def analysis_output_stats() -> Dict[str, Any]:
+    """Return how analyses were produced and how often JSON analyses needed a repair."""
+    total = analysis_output_metrics["json_analyses"]
+    needed_repair = analysis_output_metrics["repaired"] + analysis_output_metrics["failed"]
+    analyses = sum(analysis_route_metrics.values())
+    return {
+        "mode": ANALYSIS_OUTPUT_MODE,
+        "prompt_style": ANALYSIS_PROMPT_STYLE,
+        **analysis_output_metrics,
+        "parse_failure_rate": needed_repair / total if total else 0.0,
+        "repair_success_rate": analysis_output_metrics["repaired"] / needed_repair if needed_repair else 0.0,
+        "routes": dict(analysis_route_metrics),
+        "heuristic_rate": analysis_route_metrics["heuristic"] / analyses if analyses else 0.0
+    }
+
+def _heuristic_result(features: Dict[str, Any]) -> Dict[str, Any]:
+    """Analyze a session that is too short for the LLM from its features alone."""
+    analysis_route_metrics["heuristic"] += 1
+    print(
+        f"Scoring short session locally ({features['agent_turns']} associate messages, "
+        f"{features['agent_words']} words), skipping the LLM analysis"
+    )
+    return heuristic_analysis(features)
+
+def _json_analysis_setup(features: Dict[str, Any]) -> Tuple[Any, Any, int, Optional[Dict[str, Any]]]:
+    """
+    Pick the JSON analysis prompt for the configured style.
+
+    Returns:
+        (prompt, chain, completion budget, fields filled in from the features)
+    """
+    if ANALYSIS_PROMPT_STYLE == "compact":
+        analysis_route_metrics["compact"] += 1
+        defaults = {"observations": feature_observations(features), "highlight": feature_highlight(features)}
+        return analysis_compact_prompt, analysis_compact_chain, ANALYSIS_COMPACT_OUTPUT_TOKENS, defaults
+    analysis_route_metrics["full"] += 1
+    return analysis_json_prompt, analysis_json_chain, ANALYSIS_OUTPUT_TOKENS, None
+
+def fallback_analysis(conversation_history: List[Dict[str, str]]) -> Dict[str, Any]:
+    """Build randomized but reasonable analysis values when the LLM analysis fails."""
+    # Calculate some randomized but reasonable scores based on conversation length
+    conversation_turns = len(conversation_history)
+    base_score = min(60 + (conversation_turns * 3), 85)  # More turns → better score, up to 85
+    variation = random.randint(-10, 10)  # Add some randomness
+    overall_score = max(20, min(95, base_score + variation))  # Keep between 20-95
+
+    # Vary component scores around the overall score
+    grammar_score = max(30, min(95, overall_score + random.randint(-15, 15)))
+    customer_score = max(30, min(95, overall_score + random.randint(-20, 10)))
+
+    return {
+        "overall_score": overall_score,
+        "category_scores": {
+            "grammar": grammar_score,
+            "customer_handling": customer_score,
+            # For backward compatibility
+            "communication": grammar_score,
+            "customer_respect": customer_score,
+            "product_knowledge": overall_score - 5,
+            "solution_approach": overall_score - 10
+        },
+        "improvement_suggestions": [
+            "Focus on clearer communication to better address customer needs.",
+            "Practice active listening to understand customer concerns more effectively.",
+            "Work on adapting your communication style to match the customer's personality.",
+            "Develop more structured questioning techniques to identify customer requirements."
+        ],
+        "observations": [
+            "The trainee participated in the conversation with the simulated customer.",
+            "Communication skills were demonstrated during the interaction.",
+            "The trainee attempted to address the customer's needs.",
+            "The conversation progressed through typical retail interaction phases.",
+            "The training session provided hands-on experience in customer service."
+        ],
+        "highlight": "The trainee showed engagement throughout the training exercise."
     }
-    
-    # Extract overall score
-    overall_match = re.search(r"Overall Score:?\s*(\d+)", text, re.IGNORECASE)
-    if overall_match:
-        data["overall_score"] = int(overall_match.group(1))
-    
-    # Extract grammar score
-    grammar_match = re.search(r"Grammar Score:?\s*(\d+)", text, re.IGNORECASE)
-    if grammar_match:
-        score = int(grammar_match.group(1))
-        data["category_scores"]["grammar"] = score
-        data["category_scores"]["communication"] = score  # For compatibility
-    
-    # Extract customer handling score
-    customer_match = re.search(r"Customer (Handling|Respect) Score:?\s*(\d+)", text, re.IGNORECASE)
-    if customer_match:
-        score = int(customer_match.group(2))
-        data["category_scores"]["customer_handling"] = score
-        data["category_scores"]["customer_respect"] = score  # For compatibility
-    
-    # Extract suggestions
-    suggestions = []
-    
-    # Try to find numbered suggestions (common format in the LLM output)
-    suggestion_blocks = re.findall(r'\d+\.\s+\*\*(.*?)\*\*:(.*?)(?=\d+\.\s+\*\*|\Z)', text, re.DOTALL)
-    if suggestion_blocks:
-        for title, content in suggestion_blocks:
-            suggestions.append(f"{title.strip()}: {content.strip()}")
-    
-    # If that didn't work, try simpler patterns
-    if not suggestions:
-        # Look for numbered lists
-        numbered_suggestions = re.findall(r'\d+\.\s+(.*?)(?=\d+\.\s+|\Z)', text, re.DOTALL)
-        if numbered_suggestions:
-            suggestions = [s.strip() for s in numbered_suggestions if len(s.strip()) > 10]
-    
-    # If still no suggestions, try bullet points
-    if not suggestions:
-        bullet_suggestions = re.findall(r'[\*\-•]\s+(.*?)(?=[\*\-•]|\Z)', text, re.DOTALL)
-        if bullet_suggestions:
-            suggestions = [s.strip() for s in bullet_suggestions if len(s.strip()) > 10]
-    
-    # Final fallback - just split by newlines and take any line that seems like a suggestion
-    if not suggestions:
-        potential_suggestions = [line.strip() for line in text.split('\n') 
-                              if len(line.strip()) > 15 and len(line.strip()) < 200
-                              and not line.strip().startswith('*')]
-        
-        suggestions = potential_suggestions[:5]  # Take up to 5
-    
-    if suggestions:
-        cleaned_suggestions = []
-        for suggestion in suggestions:
-            # Clean up markdown and extra spaces
-            cleaned = re.sub(r'\*\*|\*', '', suggestion).strip()
-            # Remove any leading numbers or bullets
-            cleaned = re.sub(r'^\d+\.\s+|^[\*\-•]\s+', '', cleaned).strip()
-            if cleaned and len(cleaned) > 10:
-                cleaned_suggestions.append(cleaned)
-        
-        if cleaned_suggestions:
-            data["improvement_suggestions"] = cleaned_suggestions[:5]
-            data["observations"] = cleaned_suggestions[:5]
-    
-    return data
 
 def analyze_conversation(
     customer: Dict[str, Any],
@@ -1054,125 +1943,130 @@ def analyze_conversation(
 ) -> Dict[str, Any]:
     """
     Analyze the conversation and generate performance feedback.
-    
+
     This function evaluates the sales associate's performance in the conversation
     and provides detailed feedback and scores across different dimensions.
-    
+
     Args:
         customer: Dictionary containing customer traits
         scenario: Dictionary containing scenario information
         conversation_history: List of conversation messages
-        
+
     Returns:
         Analysis results including scores and feedback
     """
-    # Format conversation history for analysis
-    formatted_conversation = format_conversation_history(conversation_history, max_turns=10)
-    
-    # First, get the raw analysis without trying to parse it
-    raw_analysis_chain = analysis_prompt | llm_analysis
-    
+    features, analysis_inputs = _prepare_analysis(customer, scenario, conversation_history)
+    if analysis_inputs is None:
+        return _heuristic_result(features)
+
     try:
-        # Run the analysis to get raw output
-        raw_result = raw_analysis_chain.invoke({
-            # Scenario info
-            "scenario_title": scenario["title"],
-            "product_category": scenario["product_category"],
-            "customer_objective": scenario["customer_objective"],
-            "training_focus": scenario["training_focus"],
-            "ideal_resolution": scenario["ideal_resolution"],
-            
-            # Customer info
-            "customer_name": customer["name"],
-            "shopping_style": customer["shopping_style"],
-            "patience_level": customer["patience_level"],
-            "politeness": customer["politeness"],
-            "tech_knowledge": customer["tech_knowledge"],
-            "primary_concerns": customer.get("primary_concerns", "Quality and price"),
-            
-            # Conversation
-            "conversation_history": formatted_conversation
-        })
-        
-        # Get the text content from the result
-        if hasattr(raw_result, 'content'):
-            result_text = raw_result.content
-        else:
-            result_text = str(raw_result)
-        
-        print(f"Raw analysis result: {result_text[:200]}...")  # Print first 200 chars for debugging
-        
-        # Extract scores and suggestions from the text
-        extracted_data = extract_scores_from_text(result_text)
-        
-        # Create a Pydantic model first (for validation)
-        analysis_result = PerformanceAnalysis(
-            overall_score=extracted_data["overall_score"],
-            category_scores=CategoryScores(
-                grammar=extracted_data["category_scores"]["grammar"],
-                customer_handling=extracted_data["category_scores"]["customer_handling"],
-                communication=extracted_data["category_scores"]["communication"],
-                customer_respect=extracted_data["category_scores"]["customer_respect"],
-                product_knowledge=extracted_data["category_scores"]["product_knowledge"],
-                solution_approach=extracted_data["category_scores"]["solution_approach"]
-            ),
-            improvement_suggestions=extracted_data["improvement_suggestions"],
-            observations=extracted_data["observations"],
-            highlight="The trainee completed the interactive sales training exercise."
-        )
-        
-        # Convert to dictionary for consistent return type
-        return {
-            "overall_score": analysis_result.overall_score,
-            "category_scores": {
-                "grammar": analysis_result.category_scores.grammar,
-                "customer_handling": analysis_result.category_scores.customer_handling,
-                "communication": analysis_result.category_scores.communication,
-                "customer_respect": analysis_result.category_scores.customer_respect,
-                "product_knowledge": analysis_result.category_scores.product_knowledge,
-                "solution_approach": analysis_result.category_scores.solution_approach
-            },
-            "improvement_suggestions": analysis_result.improvement_suggestions,
-            "observations": analysis_result.observations,
-            "highlight": analysis_result.highlight
-        }
-        
+        if ANALYSIS_OUTPUT_MODE != "json":
+            # Get the raw analysis and scrape the markdown sections
+            analysis_route_metrics["full"] += 1
+            raw_result = (analysis_prompt | llm_analysis).invoke(analysis_inputs)
+            return _build_analysis_result(_message_text(raw_result))
+
+        _, chain, _, defaults = _json_analysis_setup(features)
+        analysis_output_metrics["json_analyses"] += 1
+        result_text = _message_text(chain.invoke(analysis_inputs))
+        try:
+            result = validate_analysis_output(result_text, defaults)
+            analysis_output_metrics["valid"] += 1
+            return result
+        except AnalysisOutputError as e:
+            print(f"Analysis output failed validation, repairing: {e}")
+            repaired = analysis_repair_chain.invoke(_repair_inputs(e, result_text))
+            return _accept_repaired_analysis(_message_text(repaired), defaults)
+
     except Exception as e:
         print(f"Error analyzing conversation: {e}")
         # If all else fails, return fallback values
-        # Calculate some randomized but reasonable scores based on conversation length
-        conversation_turns = len(conversation_history)
-        base_score = min(60 + (conversation_turns * 3), 85)  # More turns → better score, up to 85
-        variation = random.randint(-10, 10)  # Add some randomness
-        overall_score = max(20, min(95, base_score + variation))  # Keep between 20-95
-        
-        # Vary component scores around the overall score
-        grammar_score = max(30, min(95, overall_score + random.randint(-15, 15)))
-        customer_score = max(30, min(95, overall_score + random.randint(-20, 10)))
-                
-        return {
-            "overall_score": overall_score,
-            "category_scores": {
-                "grammar": grammar_score,
-                "customer_handling": customer_score,
-                # For backward compatibility
-                "communication": grammar_score,
-                "customer_respect": customer_score,
-                "product_knowledge": overall_score - 5,
-                "solution_approach": overall_score - 10
-            },
-            "improvement_suggestions": [
-                "Focus on clearer communication to better address customer needs.",
-                "Practice active listening to understand customer concerns more effectively.",
-                "Work on adapting your communication style to match the customer's personality.",
-                "Develop more structured questioning techniques to identify customer requirements."
-            ],
-            "observations": [
-                "The trainee participated in the conversation with the simulated customer.",
-                "Communication skills were demonstrated during the interaction.",
-                "The trainee attempted to address the customer's needs.",
-                "The conversation progressed through typical retail interaction phases.",
-                "The training session provided hands-on experience in customer service."
-            ],
-            "highlight": "The trainee showed engagement throughout the training exercise."
-        }
+        return fallback_analysis(conversation_history)
+
+async def generate_conversation_analysis_async(
+    customer: Dict[str, Any],
+    scenario: Dict[str, Any],
+    conversation_history: List[Dict[str, str]]
+) -> Dict[str, Any]:
+    """
+    Analyze the conversation without swallowing LLM errors.
+
+    Used by callers that memoize results, which must not store the
+    randomized fallback analysis. Sessions below the transcript scorer's
+    threshold get the deterministic heuristic analysis without an LLM call.
+
+    Args:
+        customer: Dictionary containing customer traits
+        scenario: Dictionary containing scenario information
+        conversation_history: List of conversation messages
+
+    Returns:
+        Analysis results including scores and feedback
+
+    Raises:
+        AnalysisOutputError: If JSON output is still invalid after one repair
+        Exception: Any error raised by the LLM client or the rate limiter
+    """
+    features, analysis_inputs = _prepare_analysis(customer, scenario, conversation_history)
+    if analysis_inputs is None:
+        return _heuristic_result(features)
+
+    if ANALYSIS_OUTPUT_MODE != "json":
+        analysis_route_metrics["full"] += 1
+        raw_analysis_chain = analysis_prompt | llm_analysis
+        raw_result = await llm_scheduler.run(
+            lambda: raw_analysis_chain.ainvoke(analysis_inputs),
+            priority=PRIORITY_ANALYSIS,
+            tokens=_langchain_token_estimate(analysis_prompt, analysis_inputs, ANALYSIS_OUTPUT_TOKENS),
+            timeout=ANALYSIS_QUEUE_TIMEOUT
+        )
+        return _build_analysis_result(_message_text(raw_result))
+
+    prompt, chain, output_tokens, defaults = _json_analysis_setup(features)
+    analysis_output_metrics["json_analyses"] += 1
+    raw_result = await llm_scheduler.run(
+        lambda: chain.ainvoke(analysis_inputs),
+        priority=PRIORITY_ANALYSIS,
+        tokens=_langchain_token_estimate(prompt, analysis_inputs, output_tokens),
+        timeout=ANALYSIS_QUEUE_TIMEOUT
+    )
+    result_text = _message_text(raw_result)
+
+    try:
+        result = validate_analysis_output(result_text, defaults)
+        analysis_output_metrics["valid"] += 1
+        return result
+    except AnalysisOutputError as e:
+        print(f"Analysis output failed validation, repairing: {e}")
+        repair_inputs = _repair_inputs(e, result_text)
+
+    # One cheap repair call instead of re-running the whole analysis
+    repaired = await llm_scheduler.run(
+        lambda: analysis_repair_chain.ainvoke(repair_inputs),
+        priority=PRIORITY_ANALYSIS,
+        tokens=_langchain_token_estimate(analysis_repair_prompt, repair_inputs, ANALYSIS_REPAIR_OUTPUT_TOKENS),
+        timeout=ANALYSIS_QUEUE_TIMEOUT
+    )
+    return _accept_repaired_analysis(_message_text(repaired), defaults)
+
+async def analyze_conversation_async(
+    customer: Dict[str, Any],
+    scenario: Dict[str, Any],
+    conversation_history: List[Dict[str, str]]
+) -> Dict[str, Any]:
+    """
+    Non-blocking variant of analyze_conversation for async routes.
+
+    Args:
+        customer: Dictionary containing customer traits
+        scenario: Dictionary containing scenario information
+        conversation_history: List of conversation messages
+
+    Returns:
+        Analysis results including scores and feedback
+    """
+    try:
+        return await generate_conversation_analysis_async(customer, scenario, conversation_history)
+    except Exception as e:
+        print(f"Error analyzing conversation: {e}")
+        return fallback_analysis(conversation_history)
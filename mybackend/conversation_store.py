@@ -0,0 +1,485 @@
+"""
+Conversation Store
+------------------
+This module keeps the state of active training conversations (scenario,
+persona, traits and message history) behind a small storage interface so
+the API does not depend on a module-level dict that grows forever.
+
+Key components:
+1. ConversationStore interface used by the API routes
+2. In-memory implementation with idle TTL expiry and an LRU entry cap
+3. Per-entry size accounting and eviction metrics for capacity planning
+4. MongoDB implementation shared by every worker and pod, with optimistic
+   concurrency on history appends
+5. Running history summary updates that never move a summary backwards
+6. Async variants of every operation for the FastAPI routes; backends that
+   do network I/O run them in a worker thread so the event loop never waits
+   on a database round trip
+
+Every conversation carries a `version` counter that increases with each
+history append. Callers pass the version they generated a reply from, and
+the append is rejected with ConversationConflictError if another request
+changed the conversation in the meantime.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure
+
+# MongoDB error code for an index that exists with different options
+INDEX_OPTIONS_CONFLICT = 85
+
+
+class ConversationConflictError(Exception):
+    """Raised when a conversation changed since the version the caller read."""
+
+
+def _json_default(value: Any) -> Any:
+    """Convert numpy scalars (from pandas rows) to plain Python values."""
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate the memory footprint of a conversation value by its JSON size."""
+    return len(json.dumps(value, default=_json_default))
+
+
+def ensure_ttl_index(collection, field: str, ttl_seconds: float) -> None:
+    """
+    Create a TTL index on `field`, or change its expiry if it already exists.
+
+    create_index fails with IndexOptionsConflict when the index was created
+    with a different TTL (e.g. after CONVERSATION_TTL_SECONDS changed), so the
+    expiry of the existing index is updated in place with collMod instead.
+
+    Args:
+        collection: pymongo collection
+        field: Date field the TTL counts from
+        ttl_seconds: Age after which MongoDB removes a document
+    """
+    seconds = int(ttl_seconds)
+    try:
+        collection.create_index(field, expireAfterSeconds=seconds)
+    except OperationFailure as e:
+        if e.code != INDEX_OPTIONS_CONFLICT:
+            raise
+        print(f"TTL index on {collection.name}.{field} has a different expiry, changing it to {seconds}s")
+        collection.database.command(
+            "collMod", collection.name,
+            index={"keyPattern": {field: 1}, "expireAfterSeconds": seconds}
+        )
+
+
+class ConversationStore(ABC):
+    """
+    Storage interface for active conversations.
+
+    Conversations returned by `get` should be treated as read-only snapshots;
+    all changes go through `append_history`, `update_summary` or `save` so
+    every backend can account for them.
+    """
+
+    @abstractmethod
+    def create(self, conversation_id: str, conversation: Dict[str, Any]) -> None:
+        """Store a newly started conversation."""
+
+    @abstractmethod
+    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Return the conversation, or None if it does not exist or has expired."""
+
+    @abstractmethod
+    def append_history(
+        self,
+        conversation_id: str,
+        entries: List[Dict[str, str]],
+        expected_version: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Append messages to the conversation history in one step.
+
+        Args:
+            conversation_id: Conversation to update
+            entries: Messages to append, in order
+            expected_version: Version the caller read; skips the check if None
+
+        Returns:
+            The updated conversation, or None if it no longer exists
+
+        Raises:
+            ConversationConflictError: If the stored version differs from expected_version
+        """
+
+    @abstractmethod
+    def save(self, conversation_id: str, conversation: Dict[str, Any]) -> None:
+        """Replace the stored conversation with an updated copy."""
+
+    @abstractmethod
+    def update_summary(self, conversation_id: str, summary: Dict[str, Any]) -> bool:
+        """
+        Store the running summary of the conversation's older messages.
+
+        Leaves the history and version alone, so a summary written in the
+        background never conflicts with message appends. A summary covering
+        no more messages than the stored one is ignored.
+
+        Args:
+            conversation_id: Conversation to update
+            summary: {"text": ..., "messages": number of leading messages covered}
+
+        Returns:
+            True if the summary was stored
+        """
+
+    @abstractmethod
+    def delete(self, conversation_id: str) -> bool:
+        """Remove a conversation. Returns True if it existed."""
+
+    def purge_expired(self) -> int:
+        """Drop conversations that passed their idle TTL. Returns the number removed."""
+        return 0
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Return live counts and eviction metrics for monitoring."""
+
+    def __contains__(self, conversation_id: str) -> bool:
+        return self.get(conversation_id) is not None
+
+    # Set by backends whose methods block on network I/O; the async variants
+    # then run them in a worker thread instead of on the event loop
+    blocking = False
+
+    async def _call(self, method, *args, **kwargs):
+        if self.blocking:
+            return await asyncio.to_thread(method, *args, **kwargs)
+        return method(*args, **kwargs)
+
+    async def create_async(self, conversation_id: str, conversation: Dict[str, Any]) -> None:
+        """Non-blocking create, for async routes."""
+        return await self._call(self.create, conversation_id, conversation)
+
+    async def get_async(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Non-blocking get, for async routes."""
+        return await self._call(self.get, conversation_id)
+
+    async def append_history_async(
+        self,
+        conversation_id: str,
+        entries: List[Dict[str, str]],
+        expected_version: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Non-blocking append_history, for async routes."""
+        return await self._call(self.append_history, conversation_id, entries, expected_version)
+
+    async def update_summary_async(self, conversation_id: str, summary: Dict[str, Any]) -> bool:
+        """Non-blocking update_summary, for async routes."""
+        return await self._call(self.update_summary, conversation_id, summary)
+
+    async def purge_expired_async(self) -> int:
+        """Non-blocking purge_expired, for the background purge loop."""
+        return await self._call(self.purge_expired)
+
+    async def stats_async(self) -> Dict[str, Any]:
+        """Non-blocking stats, for the debug endpoint."""
+        return await self._call(self.stats)
+
+
+class InMemoryConversationStore(ConversationStore):
+    """
+    Process-local conversation store with idle TTL expiry and an LRU cap.
+
+    Every read or write refreshes a conversation's idle timer and moves it to
+    the most-recently-used end. When the store is full the least recently
+    used conversation is evicted to make room.
+    """
+
+    def __init__(self, ttl_seconds: float = 7200, max_entries: int = 10000):
+        """
+        Args:
+            ttl_seconds: Idle time after which a conversation expires
+            max_entries: Maximum number of conversations kept at once
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        # conversation_id -> [conversation, size_bytes, last_access]
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._created = 0
+        self._expired = 0
+        self._evicted = 0
+        self._conflicts = 0
+
+    def _remove(self, conversation_id: str) -> None:
+        entry = self._entries.pop(conversation_id)
+        self._total_bytes -= entry[1]
+
+    def _is_expired(self, entry: list, now: float) -> bool:
+        return now - entry[2] > self.ttl_seconds
+
+    def _lookup(self, conversation_id: str) -> Optional[list]:
+        """Find a live entry and refresh its recency. Caller must hold the lock."""
+        entry = self._entries.get(conversation_id)
+        now = time.monotonic()
+
+        if entry is None:
+            self._misses += 1
+            return None
+
+        if self._is_expired(entry, now):
+            self._remove(conversation_id)
+            self._expired += 1
+            self._misses += 1
+            return None
+
+        entry[2] = now
+        self._entries.move_to_end(conversation_id)
+        self._hits += 1
+        return entry
+
+    def create(self, conversation_id: str, conversation: Dict[str, Any]) -> None:
+        with self._lock:
+            if conversation_id in self._entries:
+                self._remove(conversation_id)
+
+            # Make room by evicting the least recently used conversations
+            while len(self._entries) >= self.max_entries:
+                oldest_id = next(iter(self._entries))
+                self._remove(oldest_id)
+                self._evicted += 1
+
+            conversation["version"] = 0
+            size = estimate_size(conversation)
+            self._entries[conversation_id] = [conversation, size, time.monotonic()]
+            self._total_bytes += size
+            self._created += 1
+
+    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._lookup(conversation_id)
+            return entry[0] if entry else None
+
+    def append_history(
+        self,
+        conversation_id: str,
+        entries: List[Dict[str, str]],
+        expected_version: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._lookup(conversation_id)
+            if entry is None:
+                return None
+
+            conversation = entry[0]
+            if expected_version is not None and conversation.get("version", 0) != expected_version:
+                self._conflicts += 1
+                raise ConversationConflictError(conversation_id)
+
+            conversation["history"].extend(entries)
+            conversation["version"] = conversation.get("version", 0) + 1
+            added = sum(estimate_size(message) for message in entries)
+            entry[1] += added
+            self._total_bytes += added
+            return entry[0]
+
+    def save(self, conversation_id: str, conversation: Dict[str, Any]) -> None:
+        with self._lock:
+            entry = self._lookup(conversation_id)
+            if entry is None:
+                return
+
+            size = estimate_size(conversation)
+            self._total_bytes += size - entry[1]
+            entry[0] = conversation
+            entry[1] = size
+
+    def update_summary(self, conversation_id: str, summary: Dict[str, Any]) -> bool:
+        with self._lock:
+            entry = self._lookup(conversation_id)
+            if entry is None:
+                return False
+
+            conversation = entry[0]
+            current = conversation.get("history_summary")
+            if current is not None and current.get("messages", 0) >= summary["messages"]:
+                return False
+
+            added = estimate_size(summary) - (estimate_size(current) if current is not None else 0)
+            conversation["history_summary"] = summary
+            entry[1] += added
+            self._total_bytes += added
+            return True
+
+    def delete(self, conversation_id: str) -> bool:
+        with self._lock:
+            if conversation_id not in self._entries:
+                return False
+            self._remove(conversation_id)
+            return True
+
+    def purge_expired(self) -> int:
+        now = time.monotonic()
+        removed = 0
+        with self._lock:
+            # Entries are ordered by last access, so stop at the first live one
+            while self._entries:
+                conversation_id, entry = next(iter(self._entries.items()))
+                if not self._is_expired(entry, now):
+                    break
+                self._remove(conversation_id)
+                removed += 1
+            self._expired += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count = len(self._entries)
+            return {
+                "backend": "memory",
+                "live_conversations": count,
+                "live_bytes": self._total_bytes,
+                "average_bytes": self._total_bytes // count if count else 0,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "created": self._created,
+                "expired": self._expired,
+                "evicted": self._evicted,
+                "conflicts": self._conflicts
+            }
+
+
+class MongoConversationStore(ConversationStore):
+    """
+    Conversation store backed by a MongoDB collection.
+
+    Conversation state is shared by all uvicorn workers and pods, so a message
+    can land on any instance behind the load balancer. Idle conversations are
+    removed by a TTL index on `last_access`.
+    """
+
+    # Every method is a pymongo round trip
+    blocking = True
+
+    def __init__(self, collection, ttl_seconds: float = 7200):
+        """
+        Args:
+            collection: pymongo collection used to hold conversations
+            ttl_seconds: Idle time after which MongoDB expires a conversation
+        """
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self._conflicts = 0
+
+        ensure_ttl_index(self.collection, "last_access", ttl_seconds)
+
+    def _is_expired(self, document: Dict[str, Any]) -> bool:
+        # The TTL monitor only runs once a minute, so check expiry on read as well
+        last_access = document.get("last_access")
+        return last_access is not None and datetime.utcnow() - last_access > timedelta(seconds=self.ttl_seconds)
+
+    def _to_conversation(self, document: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if document is None or self._is_expired(document):
+            return None
+        for field in ("_id", "last_access", "size_bytes"):
+            document.pop(field, None)
+        return document
+
+    def create(self, conversation_id: str, conversation: Dict[str, Any]) -> None:
+        # Round-trip through JSON so pandas/numpy values become BSON-encodable
+        document = json.loads(json.dumps(conversation, default=_json_default))
+        document.update({
+            "_id": conversation_id,
+            "version": 0,
+            "last_access": datetime.utcnow(),
+            "size_bytes": estimate_size(conversation)
+        })
+        conversation["version"] = 0
+        self.collection.replace_one({"_id": conversation_id}, document, upsert=True)
+
+    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        return self._to_conversation(self.collection.find_one({"_id": conversation_id}))
+
+    def append_history(
+        self,
+        conversation_id: str,
+        entries: List[Dict[str, str]],
+        expected_version: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        query = {"_id": conversation_id}
+        if expected_version is not None:
+            query["version"] = expected_version
+
+        document = self.collection.find_one_and_update(
+            query,
+            {
+                "$push": {"history": {"$each": entries}},
+                "$inc": {"version": 1, "size_bytes": sum(estimate_size(message) for message in entries)},
+                "$set": {"last_access": datetime.utcnow()}
+            },
+            return_document=ReturnDocument.AFTER
+        )
+
+        if document is None:
+            # Distinguish a lost race from a conversation that no longer exists
+            if expected_version is not None and self.collection.count_documents({"_id": conversation_id}, limit=1):
+                self._conflicts += 1
+                raise ConversationConflictError(conversation_id)
+            return None
+
+        return self._to_conversation(document)
+
+    def save(self, conversation_id: str, conversation: Dict[str, Any]) -> None:
+        document = json.loads(json.dumps(conversation, default=_json_default))
+        document.update({
+            "last_access": datetime.utcnow(),
+            "size_bytes": estimate_size(conversation)
+        })
+        self.collection.update_one({"_id": conversation_id}, {"$set": document})
+
+    def update_summary(self, conversation_id: str, summary: Dict[str, Any]) -> bool:
+        result = self.collection.update_one(
+            {
+                "_id": conversation_id,
+                "$or": [
+                    {"history_summary": {"$exists": False}},
+                    {"history_summary.messages": {"$lt": summary["messages"]}}
+                ]
+            },
+            {"$set": {"history_summary": summary, "last_access": datetime.utcnow()}}
+        )
+        return result.modified_count > 0
+
+    def delete(self, conversation_id: str) -> bool:
+        return self.collection.delete_one({"_id": conversation_id}).deleted_count > 0
+
+    def stats(self) -> Dict[str, Any]:
+        totals = list(self.collection.aggregate([
+            {"$group": {"_id": None, "count": {"$sum": 1}, "bytes": {"$sum": "$size_bytes"}}}
+        ]))
+        count = totals[0]["count"] if totals else 0
+        total_bytes = totals[0]["bytes"] if totals else 0
+        return {
+            "backend": "mongo",
+            "collection": self.collection.name,
+            "live_conversations": count,
+            "live_bytes": total_bytes,
+            "average_bytes": total_bytes // count if count else 0,
+            "ttl_seconds": self.ttl_seconds,
+            "conflicts": self._conflicts
+        }
@@ -0,0 +1,386 @@
+"""
+Embedding Engine
+----------------
+This module turns text into vectors on CPU for product retrieval (and,
+optionally, the semantic response cache) without paying for the same text
+twice.
+
+Key components:
+1. Pluggable CPU backends: fastembed (ONNX Runtime, quantized models) as the
+   fast path, sentence-transformers as an alternative, and dependency-free
+   hashed n-grams as the last resort
+2. Batched encoding of cache misses
+3. Persistent SQLite text -> vector cache, capped by least recent use, plus an
+   in-process LRU for hot queries
+4. Lazy backend loading: nothing is loaded while every text is cached
+5. LangChain Embeddings interface, so FAISS can use the engine directly
+
+Settings:
+    EMBEDDING_BACKEND        auto | fastembed | sentence-transformers | hashed (default auto)
+    EMBEDDING_MODEL          Model name (default sentence-transformers/all-MiniLM-L6-v2)
+    EMBEDDING_BATCH_SIZE     Texts encoded per batch (default 32)
+    EMBEDDING_THREADS        ONNX Runtime threads, 0 = library default (default 0)
+    EMBEDDING_CACHE_PATH     SQLite cache file, empty to disable (default data/embedding_cache.sqlite)
+    EMBEDDING_CACHE_MAX_ROWS Vectors kept in the SQLite cache, least recently used dropped first (default 20000)
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from response_cache import hashed_ngram_embedding
+
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "auto").lower()
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_THREADS = int(os.environ.get("EMBEDDING_THREADS", "0"))
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", "data/embedding_cache.sqlite")
+EMBEDDING_CACHE_MAX_ROWS = int(os.environ.get("EMBEDDING_CACHE_MAX_ROWS", "20000"))
+
+HASHED_DIMENSIONS = 384
+
+
+# ==============================
+# Backends
+# ==============================
+
+class FastEmbedBackend:
+    """ONNX Runtime encoder from fastembed (quantized weights where available)."""
+
+    name = "fastembed"
+
+    def __init__(self, model_name: str, threads: int = 0):
+        from fastembed import TextEmbedding
+        self.model = TextEmbedding(model_name=model_name, threads=threads or None)
+
+    def encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        return np.stack(list(self.model.embed(texts, batch_size=batch_size)))
+
+
+class SentenceTransformerBackend:
+    """PyTorch sentence-transformers encoder on CPU."""
+
+    name = "sentence-transformers"
+
+    def __init__(self, model_name: str, threads: int = 0):
+        from sentence_transformers import SentenceTransformer
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    def encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        return self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+
+
+class HashedBackend:
+    """Hashed character n-grams; no model, lower retrieval quality."""
+
+    name = "hashed"
+
+    def __init__(self, model_name: str = "", threads: int = 0):
+        pass
+
+    def encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        return np.stack([hashed_ngram_embedding(text, HASHED_DIMENSIONS) for text in texts])
+
+
+BACKENDS = {
+    FastEmbedBackend.name: FastEmbedBackend,
+    SentenceTransformerBackend.name: SentenceTransformerBackend,
+    HashedBackend.name: HashedBackend
+}
+
+
+def _backend_available(name: str) -> bool:
+    module = {"fastembed": "fastembed", "sentence-transformers": "sentence_transformers"}.get(name)
+    if module is None:
+        return True
+    try:
+        __import__(module)
+        return True
+    except ImportError:
+        return False
+
+
+def resolve_backend(preferred: str = EMBEDDING_BACKEND) -> str:
+    """Pick the configured backend, or the fastest installed one for "auto"."""
+    if preferred != "auto":
+        if preferred not in BACKENDS:
+            raise ValueError(f"Unknown embedding backend: {preferred}")
+        return preferred
+    for name in ("fastembed", "sentence-transformers"):
+        if _backend_available(name):
+            return name
+    return HashedBackend.name
+
+
+# ==============================
+# Persistent Cache
+# ==============================
+
+class EmbeddingCache:
+    """
+    SQLite text -> float32 vector cache shared across restarts.
+
+    Every query text is cached, not just catalog documents, so the table is
+    capped: rows carry their last use time and the least recently used ones
+    are deleted once the cache grows past max_rows.
+    """
+
+    def __init__(self, path: str, max_rows: int = EMBEDDING_CACHE_MAX_ROWS):
+        """
+        Args:
+            path: SQLite database file
+            max_rows: Vectors kept before the least recently used are deleted
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_rows = max(1, max_rows)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(embeddings)")}
+        if "last_used" not in columns:
+            # Caches written before the cap start out equally old
+            self._conn.execute("ALTER TABLE embeddings ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+        self._evicted = 0
+        with self._lock:
+            self._rows = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            self._prune()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            # Stay under SQLite's bound parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, vector.astype(np.float32).tobytes(), now) for key, vector in items.items()]
+            )
+            self._conn.commit()
+            # Upper bound: replaced keys are counted again until the next prune recounts
+            self._rows += len(items)
+            self._prune()
+
+    def _prune(self) -> None:
+        """Delete the least recently used rows past max_rows. Caller must hold the lock."""
+        if self._rows <= self.max_rows:
+            return
+        self._rows = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self._rows - self.max_rows
+        if excess <= 0:
+            return
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,)
+        )
+        self._conn.commit()
+        self._rows -= excess
+        self._evicted += excess
+
+    @property
+    def evicted(self) -> int:
+        return self._evicted
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+# ==============================
+# Engine
+# ==============================
+
+class EmbeddingEngine(Embeddings):
+    """Cached, batched CPU text embeddings behind the LangChain Embeddings interface."""
+
+    def __init__(
+        self,
+        backend: str = EMBEDDING_BACKEND,
+        model_name: str = EMBEDDING_MODEL,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        threads: int = EMBEDDING_THREADS,
+        cache_path: Optional[str] = EMBEDDING_CACHE_PATH,
+        memory_cache_size: int = 2048
+    ):
+        """
+        Args:
+            backend: Backend name, or "auto" for the fastest installed one
+            model_name: Model loaded by the backend
+            batch_size: Texts encoded per batch
+            threads: CPU threads for the backend, 0 for its default
+            cache_path: SQLite cache file; None or "" keeps the cache in memory only
+            memory_cache_size: Vectors kept in the in-process LRU
+        """
+        self.backend_name = resolve_backend(backend)
+        self.model_name = model_name if self.backend_name != HashedBackend.name else f"hashed-{HASHED_DIMENSIONS}"
+        self.batch_size = batch_size
+        self.threads = threads
+        self.memory_cache_size = memory_cache_size
+
+        self._backend = None
+        self._backend_lock = threading.Lock()
+        self._disk = EmbeddingCache(cache_path) if cache_path else None
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._memory_lock = threading.Lock()
+
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._encoded = 0
+        self._batches = 0
+        self._encode_seconds = 0.0
+        self._load_seconds = 0.0
+
+    @property
+    def model_id(self) -> str:
+        """Identifies the vector space; vectors from different ids are not comparable."""
+        return f"{self.backend_name}:{self.model_name}"
+
+    def _get_backend(self):
+        with self._backend_lock:
+            if self._backend is None:
+                started = time.monotonic()
+                self._backend = BACKENDS[self.backend_name](self.model_name, self.threads)
+                self._load_seconds = time.monotonic() - started
+                print(f"Embedding backend {self.model_id} loaded in {self._load_seconds:.1f}s")
+            return self._backend
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model_id}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        with self._memory_lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_cache_size:
+                self._memory.popitem(last=False)
+
+    def embed_vectors(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts as an (n, dims) float32 array of L2-normalized rows.
+
+        Cached vectors are reused; only the misses are encoded, in batches.
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        keys = [self._key(text) for text in texts]
+        vectors: Dict[str, np.ndarray] = {}
+
+        with self._memory_lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    vectors[key] = vector
+            self._memory_hits += len(vectors)
+
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+        if missing and self._disk is not None:
+            found = self._disk.get_many(missing)
+            self._disk_hits += len(found)
+            for key, vector in found.items():
+                vectors[key] = vector
+                self._remember(key, vector)
+
+        # Encode each distinct uncached text once
+        to_encode = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                to_encode.setdefault(key, text)
+
+        if to_encode:
+            backend = self._get_backend()
+            encoded = {}
+            items = list(to_encode.items())
+            started = time.monotonic()
+            for start in range(0, len(items), self.batch_size):
+                batch = items[start:start + self.batch_size]
+                matrix = np.asarray(backend.encode([text for _, text in batch], self.batch_size), dtype=np.float32)
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                matrix = matrix / np.where(norms == 0, 1, norms)
+                for (key, _), vector in zip(batch, matrix):
+                    encoded[key] = vector
+                self._batches += 1
+            self._encode_seconds += time.monotonic() - started
+            self._encoded += len(encoded)
+
+            if self._disk is not None:
+                self._disk.put_many(encoded)
+            for key, vector in encoded.items():
+                vectors[key] = vector
+                self._remember(key, vector)
+
+        return np.stack([vectors[key] for key in keys])
+
+    def embed_vector(self, text: str) -> np.ndarray:
+        """Embed a single text as a normalized 1-D vector."""
+        return self.embed_vectors([text])[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_vectors(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_vector(text).tolist()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return backend, cache and encoding metrics for monitoring."""
+        return {
+            "backend": self.backend_name,
+            "model": self.model_name,
+            "loaded": self._backend is not None,
+            "load_seconds": round(self._load_seconds, 3),
+            "memory_cache_entries": len(self._memory),
+            "disk_cache_entries": self._disk.count() if self._disk is not None else 0,
+            "disk_cache_evicted": self._disk.evicted if self._disk is not None else 0,
+            "memory_hits": self._memory_hits,
+            "disk_hits": self._disk_hits,
+            "encoded": self._encoded,
+            "batches": self._batches,
+            "average_encode_ms": self._encode_seconds * 1000 / self._encoded if self._encoded else 0.0
+        }
+
+
+_default_engine: Optional[EmbeddingEngine] = None
+_default_lock = threading.Lock()
+
+
+def get_embedding_engine() -> EmbeddingEngine:
+    """Return the process-wide engine configured from the environment."""
+    global _default_engine
+    with _default_lock:
+        if _default_engine is None:
+            _default_engine = EmbeddingEngine()
+        return _default_engine
@@ -0,0 +1,167 @@
+"""
+Greeting Pool
+-------------
+This module pre-generates the customer's opening line for every
+(persona, scenario) combination so /conversation/start can answer without
+waiting on an LLM round trip.
+
+The greeting prompt only depends on the simplified persona and the scenario
+(behavioral traits are not part of it), so the pool is keyed on those two.
+
+Key components:
+1. A pool of N varied greetings per combination, consumed at random
+2. Background warm-up at startup with bounded concurrency
+3. Background refill after each use and periodic refresh of stale greetings
+"""
+
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+GreetingGenerator = Callable[[Dict[str, Any], Dict[str, Any]], Awaitable[str]]
+
+
+class GreetingPool:
+    """Pool of pre-generated initial greetings keyed by (persona_id, scenario_id)."""
+
+    def __init__(
+        self,
+        generate: GreetingGenerator,
+        pool_size: int = 3,
+        max_age_seconds: float = 3600,
+        warm_concurrency: int = 4
+    ):
+        """
+        Args:
+            generate: Async function (customer, scenario) -> greeting that raises on failure
+            pool_size: Greetings kept per combination; 0 disables the pool
+            max_age_seconds: Age after which a greeting is replaced by a fresh one
+            warm_concurrency: Maximum LLM calls made in parallel while filling the pool
+        """
+        self.generate = generate
+        self.pool_size = pool_size
+        self.max_age_seconds = max_age_seconds
+
+        # key -> list of (greeting, created_at)
+        self._greetings: Dict[Tuple[str, str], List[Tuple[str, float]]] = {}
+        # key -> (customer, scenario) used to generate more greetings for it
+        self._sources: Dict[Tuple[str, str], Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+        self._filling: set = set()
+        self._tasks: set = set()
+        self._semaphore = asyncio.Semaphore(max(1, warm_concurrency))
+
+        self._hits = 0
+        self._misses = 0
+        self._generated = 0
+        self._failures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.pool_size > 0
+
+    @staticmethod
+    def _key(customer: Dict[str, Any], scenario: Dict[str, Any]) -> Tuple[str, str]:
+        return (str(customer.get("persona_id", customer.get("name"))), str(scenario["scenario_id"]))
+
+    def take(self, customer: Dict[str, Any], scenario: Dict[str, Any]) -> Optional[str]:
+        """
+        Remove and return a random pooled greeting for this persona and scenario.
+
+        A background refill is scheduled either way, so the next conversation
+        with the same combination is likely to hit the pool.
+
+        Returns:
+            A greeting, or None if the pool has nothing for this combination
+        """
+        if not self.enabled:
+            return None
+
+        key = self._key(customer, scenario)
+        self._sources.setdefault(key, (customer, scenario))
+        greetings = self._greetings.get(key)
+
+        greeting = None
+        if greetings:
+            greeting, _ = greetings.pop(random.randrange(len(greetings)))
+            self._hits += 1
+        else:
+            self._misses += 1
+
+        self._schedule_fill(key)
+        return greeting
+
+    def _schedule_fill(self, key: Tuple[str, str]) -> None:
+        if key in self._filling:
+            return
+        self._filling.add(key)
+        task = asyncio.get_running_loop().create_task(self._fill(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fill(self, key: Tuple[str, str]) -> None:
+        """Generate greetings until the pool for this key is full."""
+        customer, scenario = self._sources[key]
+        try:
+            while len(self._greetings.get(key, [])) < self.pool_size:
+                async with self._semaphore:
+                    try:
+                        greeting = await self.generate(customer, scenario)
+                    except Exception as e:
+                        self._failures += 1
+                        print(f"Greeting pool: failed to generate greeting for {key}: {e}")
+                        return
+                self._greetings.setdefault(key, []).append((greeting, time.monotonic()))
+                self._generated += 1
+        finally:
+            self._filling.discard(key)
+
+    async def warm(self, combinations: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> None:
+        """
+        Fill the pool for every (customer, scenario) combination.
+
+        Args:
+            combinations: Simplified customer personas paired with scenarios
+        """
+        if not self.enabled:
+            return
+
+        started = time.monotonic()
+        for customer, scenario in combinations:
+            key = self._key(customer, scenario)
+            self._sources[key] = (customer, scenario)
+            self._schedule_fill(key)
+
+        await asyncio.gather(*list(self._tasks), return_exceptions=True)
+        print(f"Greeting pool warmed for {len(combinations)} combinations in {time.monotonic() - started:.1f}s")
+
+    def refresh_stale(self) -> None:
+        """Drop greetings older than max_age_seconds and refill their pools."""
+        cutoff = time.monotonic() - self.max_age_seconds
+        for key, greetings in self._greetings.items():
+            fresh = [entry for entry in greetings if entry[1] >= cutoff]
+            if len(fresh) < len(greetings):
+                self._greetings[key] = fresh
+                self._schedule_fill(key)
+
+    async def refresh_loop(self, interval: float) -> None:
+        """Periodically replace stale greetings so conversations keep some variety."""
+        while True:
+            await asyncio.sleep(interval)
+            self.refresh_stale()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool size and hit-rate metrics for monitoring."""
+        lookups = self._hits + self._misses
+        return {
+            "enabled": self.enabled,
+            "pool_size": self.pool_size,
+            "combinations": len(self._greetings),
+            "pooled_greetings": sum(len(greetings) for greetings in self._greetings.values()),
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+            "generated": self._generated,
+            "failures": self._failures,
+            "filling": len(self._filling)
+        }
@@ -0,0 +1,169 @@
+"""
+History Summary
+---------------
+This module folds the older messages of a training conversation into a
+running summary, so prompts are built from the summary plus the most recent
+messages instead of dropping everything before the last few turns, and stop
+growing with the length of the session.
+
+Key components:
+1. Extractive summarizer: keeps the sentences of each message that carry
+   facts (figures, prices, product and warranty questions, objections,
+   purchase decisions) and drops greetings and small talk, without an LLM
+2. Incremental folding: a stored summary records how many leading messages
+   it covers, and a fold only summarizes the messages that fell out of the
+   window since the previous one
+3. Covering summary for prompts: the stored summary extended up to the
+   window, so no message between the summary and the recent ones is lost
+   while a fold is pending
+
+Summaries are plain dicts ({"text": ..., "messages": ...}) kept on the
+conversation, so they round-trip through the MongoDB store unchanged. The
+summary text is a list of "Speaker: facts" segments separated by " | "; when
+it passes the length cap the oldest segments are dropped first.
+
+Settings:
+    HISTORY_SUMMARY_MODE       "extractive" (default), "llm" (cheap model in the background,
+                               extractive on failure) or "off" (last messages only)
+    HISTORY_WINDOW_MESSAGES    Messages sent verbatim in chat prompts (default 8)
+    HISTORY_SUMMARY_BATCH      Messages past the window that trigger a stored fold (default 6)
+    HISTORY_SUMMARY_MAX_CHARS  Longest summary kept (default 1200)
+"""
+
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from message_intents import match_phrases
+
+HISTORY_SUMMARY_MODE = os.environ.get("HISTORY_SUMMARY_MODE", "extractive").lower()
+HISTORY_WINDOW_MESSAGES = int(os.environ.get("HISTORY_WINDOW_MESSAGES", "8"))
+HISTORY_SUMMARY_BATCH = max(1, int(os.environ.get("HISTORY_SUMMARY_BATCH", "6")))
+HISTORY_SUMMARY_MAX_CHARS = int(os.environ.get("HISTORY_SUMMARY_MAX_CHARS", "1200"))
+
+SEGMENT_SEPARATOR = " | "
+
+# Longest sentence kept verbatim in a segment
+MAX_SENTENCE_CHARS = 160
+
+# Customer questions shorter than this are usually small talk ("And you?")
+MIN_QUESTION_WORDS = 4
+
+SENTENCE = re.compile(r"[^.!?]+[.!?]*")
+
+# Sentences worth keeping regardless of who said them
+FACT_PATTERN = re.compile(
+    r"\d|₹|\b(?:budget|discount|offers?|emi|warranty|guarantee|exchange|delivery|install\w*|"
+    r"battery|camera|storage|ram|screen|display|processor|model|brand|cheaper|expensive|"
+    r"compare[ds]?|better|worse|need|want|looking for|prefer|not sure|think about)\b",
+    re.IGNORECASE
+)
+
+# Message intent labels that mark a sentence as a fact or a decision
+FACT_LABELS = frozenset({
+    "ASKING_PRICE", "ASKING_FEATURES", "ASKING_WARRANTY", "PRODUCT_QUESTION", "SATISFACTION", "CLOSING"
+})
+
+
+def speaker(entry: Dict[str, str]) -> str:
+    """Prompt label of a message, as in format_conversation_history."""
+    return "Sales Associate" if entry["role"] == "user" else "Customer"
+
+
+def _key_sentences(entry: Dict[str, str]) -> List[str]:
+    """The sentences of one message that carry facts."""
+    is_customer = entry["role"] != "user"
+    kept = []
+    for match in SENTENCE.finditer(entry.get("message") or ""):
+        sentence = " ".join(match.group().split())
+        if not sentence:
+            continue
+        keep = FACT_PATTERN.search(sentence) is not None or bool(match_phrases(sentence) & FACT_LABELS)
+        if not keep and is_customer and sentence.endswith("?"):
+            keep = len(sentence.split()) >= MIN_QUESTION_WORDS
+        if keep:
+            kept.append(sentence if len(sentence) <= MAX_SENTENCE_CHARS else sentence[:MAX_SENTENCE_CHARS] + "...")
+    return kept
+
+
+def extend_summary(text: str, entries: List[Dict[str, str]], max_chars: int = HISTORY_SUMMARY_MAX_CHARS) -> str:
+    """
+    Fold messages into a summary extractively.
+
+    Args:
+        text: Current summary text ("" for none)
+        entries: Messages to fold, oldest first
+        max_chars: Length cap; whole segments are dropped from the front
+
+    Returns:
+        The new summary text
+    """
+    segments = text.split(SEGMENT_SEPARATOR) if text else []
+    for entry in entries:
+        sentences = _key_sentences(entry)
+        if sentences:
+            segments.append(f"{speaker(entry)}: {' '.join(sentences)}")
+
+    summary = SEGMENT_SEPARATOR.join(segments)
+    while len(summary) > max_chars and len(segments) > 1:
+        segments.pop(0)
+        summary = SEGMENT_SEPARATOR.join(segments)
+    return summary[-max_chars:]
+
+
+def covered_messages(summary: Optional[Dict[str, Any]], history_length: int) -> int:
+    """Leading messages the summary covers, clipped to the history."""
+    if not summary:
+        return 0
+    return max(0, min(int(summary.get("messages", 0)), history_length))
+
+
+def pending_fold(
+    history: List[Dict[str, str]],
+    summary: Optional[Dict[str, Any]],
+    window: int = HISTORY_WINDOW_MESSAGES,
+    batch: int = HISTORY_SUMMARY_BATCH
+) -> Optional[Tuple[str, int, List[Dict[str, str]]]]:
+    """
+    Find the messages a stored fold should summarize.
+
+    Folding waits until a batch of messages has fallen out of the window, so
+    a summary is updated every few turns rather than on every message.
+
+    Returns:
+        (current summary text, messages covered after the fold, messages to
+        fold), or None if the window has not overflowed by a batch yet
+    """
+    covered = covered_messages(summary, len(history))
+    if len(history) - covered < window + batch:
+        return None
+    new_covered = len(history) - window
+    return (summary or {}).get("text", ""), new_covered, history[covered:new_covered]
+
+
+def covering_summary(
+    history: List[Dict[str, str]],
+    summary: Optional[Dict[str, Any]],
+    keep: int
+) -> Dict[str, Any]:
+    """
+    Extend the stored summary so it covers everything but the last `keep` messages.
+
+    Only the messages after the stored summary are summarized, at most a
+    batch for a conversation whose folds are up to date.
+
+    Args:
+        history: Full conversation history
+        summary: Stored summary, or None
+        keep: Messages that will be sent verbatim
+
+    Returns:
+        A summary dict; its "messages" may exceed len(history) - keep when the
+        stored summary already covers more
+    """
+    covered = covered_messages(summary, len(history))
+    text = (summary or {}).get("text", "")
+    target = len(history) - keep
+    if target <= covered:
+        return {"text": text, "messages": covered}
+    return {"text": extend_summary(text, history[covered:target]), "messages": target}
@@ -0,0 +1,188 @@
+"""
+Message Intents
+---------------
+This module classifies a message against every keyword table the
+conversation logic uses (question types, conversation ending signals,
+product questions, greetings) in a single pass, instead of lowercasing the
+message again and scanning it phrase by phrase in each helper.
+
+Key components:
+1. Data-driven phrase tables: label -> phrases, extensible at runtime
+2. PhraseMatcher: all phrases compiled into one trie-shaped regex that finds
+   every phrase occurring anywhere in the text (plain substring semantics,
+   overlapping matches included)
+3. Memoized classify_message, so the helpers that look at the same user
+   message share one scan
+4. Question type resolution by table priority
+
+Matching is case-insensitive and keeps the semantics of `phrase in text`:
+"hi" matches inside "this", just like the original checks.
+"""
+
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List
+
+# Question types in priority order: the first label found wins
+QUESTION_TYPE_PHRASES: Dict[str, List[str]] = {
+    "ASKING_NAME": ["your name", "what is your name", "who are you", "may i know your name"],
+    "ASKING_WELLBEING": ["how are you", "how do you do", "how is your day"],
+    "GREETING": ["hello", "hi", "namaste", "greetings"],
+    "ASKING_PRICE": ["price", "cost", "how much", "expensive"],
+    "ASKING_FEATURES": ["feature", "specification", "what can it do"],
+    "ASKING_WARRANTY": ["warranty", "guarantee"]
+}
+
+DEFAULT_QUESTION_TYPE = "GENERAL_QUESTION"
+
+# Other signals checked on user messages and generated replies
+SIGNAL_PHRASES: Dict[str, List[str]] = {
+    # A satisfied customer ready to purchase
+    "SATISFACTION": [
+        "buy", "purchase", "take it", "get it", "decide", "interested",
+        "will go with", "sounds good", "perfect", "exactly what i need"
+    ],
+    # The associate explicitly closing the sale
+    "CLOSING": [
+        "would you like to complete the purchase", "shall i process your order",
+        "would you like to buy", "ready to check out"
+    ],
+    # Questions the product knowledge base can answer
+    "PRODUCT_QUESTION": ["price", "feature", "spec", "emi", "option", "compare"],
+    # Acceptable openings for the customer's first message
+    "OPENING_GREETING": ["hello", "hi", "namaste"]
+}
+
+ENDING_SIGNALS = frozenset({"SATISFACTION", "CLOSING"})
+
+
+def _trie_pattern(phrases: Iterable[str]) -> str:
+    """
+    Build a regex matching the longest of the phrases at a position.
+
+    Phrases sharing a prefix share one branch ("how (?:are you|much|...)"),
+    so the regex engine rejects a position after a single character in the
+    common case instead of trying every phrase.
+    """
+    trie: Dict[str, dict] = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def emit(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # A phrase ends here: the rest is optional, and greedy, so longer phrases win
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(trie)
+
+
+class PhraseMatcher:
+    """Finds which labelled phrase groups occur in a text, in one scan."""
+
+    def __init__(self, table: Dict[str, Iterable[str]]):
+        """
+        Args:
+            table: Label -> phrases; a phrase may appear under several labels
+        """
+        labels_by_phrase: Dict[str, set] = {}
+        for label, phrases in table.items():
+            for phrase in phrases:
+                labels_by_phrase.setdefault(phrase.lower(), set()).add(label)
+
+        # The regex reports only the longest phrase at each position, so a
+        # phrase also carries the labels of every phrase that is its prefix
+        # ("specification" implies "spec")
+        self.labels: Dict[str, FrozenSet[str]] = {}
+        for phrase in labels_by_phrase:
+            labels = set()
+            for other, other_labels in labels_by_phrase.items():
+                if phrase.startswith(other):
+                    labels |= other_labels
+            self.labels[phrase] = frozenset(labels)
+
+        # Zero-width lookahead so overlapping phrases are all found
+        self.pattern = re.compile(f"(?=({_trie_pattern(self.labels)}))") if self.labels else None
+
+    def match(self, text: str) -> FrozenSet[str]:
+        """
+        Return the labels of all phrases occurring anywhere in the text.
+
+        Args:
+            text: Message to classify (any case)
+
+        Returns:
+            Set of matched labels
+        """
+        if not text or self.pattern is None:
+            return frozenset()
+
+        found = set()
+        for phrase in set(self.pattern.findall(text.lower())):
+            found |= self.labels[phrase]
+        return frozenset(found)
+
+
+def _combined_table() -> Dict[str, List[str]]:
+    """Merge both tables; a label in both keeps its question type and signal phrases."""
+    table: Dict[str, List[str]] = {}
+    for source in (QUESTION_TYPE_PHRASES, SIGNAL_PHRASES):
+        for label, phrases in source.items():
+            table.setdefault(label, []).extend(phrases)
+    return table
+
+
+_matcher_lock = threading.Lock()
+intent_matcher = PhraseMatcher(_combined_table())
+
+
+@lru_cache(maxsize=4096)
+def classify_message(message: str) -> FrozenSet[str]:
+    """
+    Classify a user message once; repeated calls for the same text are free.
+
+    Returns:
+        Labels of every question type and signal found in the message
+    """
+    return intent_matcher.match(message)
+
+
+def match_phrases(text: str) -> FrozenSet[str]:
+    """Classify arbitrary text, e.g. a generated reply, without memoizing it."""
+    return intent_matcher.match(text)
+
+
+def question_type(labels: FrozenSet[str]) -> str:
+    """Pick the highest-priority question type among the matched labels."""
+    for label in QUESTION_TYPE_PHRASES:
+        if label in labels:
+            return label
+    return DEFAULT_QUESTION_TYPE
+
+
+def add_phrases(label: str, phrases: Iterable[str], question_type_label: bool = False) -> None:
+    """
+    Extend a phrase table and recompile the matcher.
+
+    Args:
+        label: Existing or new label
+        phrases: Phrases to add under the label
+        question_type_label: Add to the question types (new labels get the
+            lowest priority) instead of the signals
+    """
+    global intent_matcher
+    with _matcher_lock:
+        table = QUESTION_TYPE_PHRASES if question_type_label else SIGNAL_PHRASES
+        existing = table.setdefault(label, [])
+        for phrase in phrases:
+            # Checked against the list as it grows, so repeats within `phrases` are dropped too
+            if phrase.lower() not in existing:
+                existing.append(phrase.lower())
+        intent_matcher = PhraseMatcher(_combined_table())
+        classify_message.cache_clear()
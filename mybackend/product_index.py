@@ -0,0 +1,427 @@
+"""
+Product Index
+-------------
+This module builds the FAISS product knowledge index once, saves it to disk
+keyed by a content hash of products.csv, and loads the saved artifact on
+startup instead of re-embedding the whole catalog every time a pod starts.
+
+Key components:
+1. Product documents (text + metadata) built from the catalog rows
+2. Content hash of the catalog file and embedding model, used as the artifact key
+3. Save/load of the FAISS index and docstore, memory-mapped when possible
+4. Incremental update when the catalog changes: only added or edited
+   products are embedded
+5. Per-category sub-indexes, so a scenario only searches its own products
+6. Command line build step for CI or image builds
+
+Embeddings come from the shared EmbeddingEngine, which loads its model
+lazily and caches vectors on disk, so a rebuild only encodes changed products.
+
+Build the index offline with:
+    python product_index.py --csv data/products.csv --out data/product_index
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+
+from embedding_engine import EmbeddingEngine, get_embedding_engine
+
+PRODUCT_INDEX_DIR = os.environ.get("PRODUCT_INDEX_DIR", "data/product_index")
+
+# Bump when product_documents changes so old artifacts are rebuilt
+INDEX_FORMAT_VERSION = "1"
+MANIFEST_FILE = "manifest.json"
+
+# Scenario categories that do not name a single product category.
+# An empty list means the scenario may be about any product.
+CATEGORY_ALIASES = {
+    "audio product": ["audio"],
+    "home appliance": ["refrigerator", "washing machine", "air conditioner", "mixer grinder"],
+    "electronic": [],
+    "luxury electronic": [],
+    "multiple category": []
+}
+
+
+def product_documents(products_df: pd.DataFrame) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """
+    Create structured product texts and metadata for vector embedding.
+
+    Args:
+        products_df: DataFrame containing product information
+
+    Returns:
+        Tuple of (product texts, product metadata dictionaries)
+    """
+    product_texts = []
+    product_metadatas = []
+
+    for _, row in products_df.iterrows():
+        # Create descriptive text for embedding - structured for better retrieval
+        product_text = f"""
+        Product: {row['brand']} {row['model']}
+        Category: {row['category']}
+        Price: ₹{row['price']}
+        Features: {row['key_features']}
+        Technical Specs: {row['technical_specs']}
+        EMI Options: {row['emi_options']}
+        Warranty: {row['warranty']}
+        """
+
+        # Add metadata for retrieval and filtering (plain types so it pickles cleanly)
+        metadata = {
+            "product_id": str(row['product_id']),
+            "category": str(row['category']),
+            "brand": str(row['brand']),
+            "model": str(row['model']),
+            "price": row['price'].item() if hasattr(row['price'], "item") else row['price']
+        }
+
+        product_texts.append(product_text)
+        product_metadatas.append(metadata)
+
+    return product_texts, product_metadatas
+
+
+def catalog_hash(csv_path: str, model_id: str) -> str:
+    """
+    Hash the catalog file together with everything else that shapes the index.
+
+    Args:
+        csv_path: Path to products.csv
+        model_id: Embedding engine model id the index is built with
+
+    Returns:
+        Short hex digest used as the artifact directory name
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{INDEX_FORMAT_VERSION}:{model_id}:".encode("utf-8"))
+    with open(csv_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def save_index(
+    vectorstore: FAISS,
+    index_dir: str,
+    content_hash: str,
+    embeddings: EmbeddingEngine
+) -> None:
+    """
+    Save an index under index_dir/<content_hash>.
+
+    The artifact is written to a temporary directory and renamed into place,
+    so concurrent readers never see a half-written index. Artifacts for other
+    catalog versions are removed afterwards.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    target = os.path.join(index_dir, content_hash)
+    staging = tempfile.mkdtemp(prefix=f".{content_hash}-", dir=index_dir)
+    try:
+        vectorstore.save_local(staging)
+        with open(os.path.join(staging, MANIFEST_FILE), "w") as f:
+            json.dump({
+                "content_hash": content_hash,
+                "embedding_model": embeddings.model_id,
+                "format_version": INDEX_FORMAT_VERSION,
+                "products": vectorstore.index.ntotal,
+                "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+            }, f, indent=2)
+
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        os.replace(staging, target)
+    finally:
+        if os.path.isdir(staging):
+            shutil.rmtree(staging, ignore_errors=True)
+
+    for name in os.listdir(index_dir):
+        path = os.path.join(index_dir, name)
+        if name != content_hash and os.path.isdir(path) and not name.startswith("."):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def build_index(
+    products_df: pd.DataFrame,
+    index_dir: str,
+    content_hash: str,
+    embeddings: EmbeddingEngine
+) -> FAISS:
+    """
+    Embed the whole catalog and save the index under index_dir/<content_hash>.
+
+    Returns:
+        The built FAISS vector store
+    """
+    started = time.monotonic()
+    product_texts, product_metadatas = product_documents(products_df)
+    vectorstore = FAISS.from_texts(product_texts, embeddings, metadatas=product_metadatas)
+    save_index(vectorstore, index_dir, content_hash, embeddings)
+
+    print(f"Built product index {content_hash} with {len(product_texts)} products in {time.monotonic() - started:.1f}s")
+    return vectorstore
+
+
+def update_index(
+    previous: FAISS,
+    products_df: pd.DataFrame,
+    index_dir: str,
+    content_hash: str,
+    embeddings: EmbeddingEngine
+) -> FAISS:
+    """
+    Build the index for a changed catalog from the previous one.
+
+    Vectors of products whose text did not change are copied from the
+    previous index; only added or edited products are embedded. Removed
+    products are simply left out. The previous index is not modified, so it
+    keeps serving requests until the new one is swapped in.
+
+    Args:
+        previous: Index of the previous catalog version
+        products_df: The changed catalog
+        index_dir: Directory holding one artifact per catalog hash
+        content_hash: Hash of the changed catalog
+        embeddings: Embedding engine the previous index was built with
+
+    Returns:
+        The new FAISS vector store
+    """
+    started = time.monotonic()
+    product_texts, product_metadatas = product_documents(products_df)
+
+    # Previous product text -> index position
+    previous_positions = {}
+    for position, doc_id in previous.index_to_docstore_id.items():
+        previous_positions[previous.docstore.search(doc_id).page_content] = int(position)
+
+    changed = [text for text in product_texts if text not in previous_positions]
+    new_vectors = dict(zip(changed, embeddings.embed_documents(changed))) if changed else {}
+
+    text_embeddings = [
+        (text, new_vectors[text] if text in new_vectors else previous.index.reconstruct(previous_positions[text]).tolist())
+        for text in product_texts
+    ]
+    vectorstore = FAISS.from_embeddings(text_embeddings, embeddings, metadatas=product_metadatas)
+    save_index(vectorstore, index_dir, content_hash, embeddings)
+
+    removed = previous.index.ntotal - (len(product_texts) - len(changed))
+    print(f"Updated product index {content_hash}: {len(changed)} embedded, {removed} removed, "
+          f"{len(product_texts) - len(changed)} reused in {time.monotonic() - started:.2f}s")
+    return vectorstore
+
+
+def load_index(index_dir: str, content_hash: str, embeddings: EmbeddingEngine) -> Optional[FAISS]:
+    """
+    Load a saved index, memory-mapping the FAISS file when supported.
+
+    Returns:
+        The FAISS vector store, or None if no artifact exists for this hash
+    """
+    target = os.path.join(index_dir, content_hash)
+    if not os.path.isfile(os.path.join(target, "index.faiss")):
+        return None
+
+    started = time.monotonic()
+    try:
+        import faiss
+        io_flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    except (ImportError, AttributeError):
+        io_flags = 0
+
+    # The pickle is our own build artifact, so deserializing it is safe
+    vectorstore = FAISS.load_local(target, embeddings, allow_dangerous_deserialization=True, io_flags=io_flags)
+    print(f"Loaded product index {content_hash} in {(time.monotonic() - started) * 1000:.0f}ms")
+    return vectorstore
+
+
+def load_or_build_index(
+    csv_path: str,
+    index_dir: str = PRODUCT_INDEX_DIR,
+    embeddings: Optional[EmbeddingEngine] = None,
+    build_if_missing: bool = True,
+    products_df: Optional[pd.DataFrame] = None,
+    previous: Optional[FAISS] = None
+) -> Optional[FAISS]:
+    """
+    Load the index for the current catalog, building it only when the catalog changed.
+
+    Args:
+        csv_path: Path to products.csv
+        index_dir: Directory holding one artifact per catalog hash
+        embeddings: Embedding engine; defaults to the shared engine
+        build_if_missing: Build and save the index if no artifact matches
+        products_df: Already loaded catalog, to avoid reading the CSV twice
+        previous: Index of the previous catalog version; when given, only
+            changed products are embedded
+
+    Returns:
+        The FAISS vector store, or None if it is missing and building is disabled
+    """
+    embeddings = embeddings or get_embedding_engine()
+    content_hash = catalog_hash(csv_path, embeddings.model_id)
+
+    vectorstore = load_index(index_dir, content_hash, embeddings)
+    if vectorstore is not None:
+        return vectorstore
+
+    if not build_if_missing:
+        print(f"No product index for catalog {content_hash} in {index_dir}; run product_index.py to build it")
+        return None
+
+    if products_df is None:
+        products_df = pd.read_csv(csv_path)
+    if previous is not None and previous.embedding_function is embeddings:
+        return update_index(previous, products_df, index_dir, content_hash, embeddings)
+    return build_index(products_df, index_dir, content_hash, embeddings)
+
+
+def normalize_category(category: str) -> str:
+    """
+    Normalize a category name so scenario and catalog spellings match.
+
+    Lowercases, collapses whitespace and singularizes each word, e.g.
+    "Smartphones" and "Smartphone" both become "smartphone".
+    """
+    words = re.sub(r"\s+", " ", str(category).strip().lower()).split(" ")
+    singular = []
+    for word in words:
+        if word.endswith("ies") and len(word) > 4:
+            word = word[:-3] + "y"
+        elif word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+            word = word[:-1]
+        singular.append(word)
+    return " ".join(singular)
+
+
+def resolve_categories(product_category: str, known_categories) -> List[str]:
+    """
+    Map a scenario's product category to normalized catalog categories.
+
+    Args:
+        product_category: Scenario product category, e.g. "Home Appliances"
+        known_categories: Normalized categories present in the catalog
+
+    Returns:
+        Catalog categories to search; empty means the whole catalog
+    """
+    normalized = normalize_category(product_category)
+    if normalized in known_categories:
+        return [normalized]
+    return [c for c in CATEGORY_ALIASES.get(normalized, []) if c in known_categories]
+
+
+class PartitionedProductIndex:
+    """
+    Product search restricted to the categories of the current scenario.
+
+    One small FAISS sub-index per catalog category is cut out of the global
+    index (reusing its vectors, so nothing is re-embedded). A scenario
+    category maps to one or more catalog categories; scenarios that span
+    the whole store, or categories the catalog does not know, fall back to
+    the global index.
+    """
+
+    def __init__(self, vectorstore: FAISS):
+        """
+        Args:
+            vectorstore: Global product index
+        """
+        self.vectorstore = vectorstore
+        self.partitions: Dict[str, FAISS] = {}
+        self._unknown_categories: set = set()
+
+        grouped: Dict[str, List[Tuple[Document, np.ndarray]]] = {}
+        for position, doc_id in vectorstore.index_to_docstore_id.items():
+            document = vectorstore.docstore.search(doc_id)
+            category = normalize_category(document.metadata.get("category", ""))
+            grouped.setdefault(category, []).append((document, vectorstore.index.reconstruct(int(position))))
+
+        for category, entries in grouped.items():
+            self.partitions[category] = FAISS.from_embeddings(
+                [(document.page_content, vector.tolist()) for document, vector in entries],
+                vectorstore.embedding_function,
+                metadatas=[document.metadata for document, _ in entries]
+            )
+
+        sizes = ", ".join(f"{category} ({partition.index.ntotal})" for category, partition in sorted(self.partitions.items()))
+        print(f"Product index partitioned into {len(self.partitions)} categories: {sizes}")
+
+    def categories_for(self, product_category: str) -> List[str]:
+        """
+        Map a scenario's product category to catalog partitions.
+
+        Returns:
+            Partition names to search; empty means search the whole catalog
+        """
+        categories = resolve_categories(product_category, self.partitions)
+        normalized = normalize_category(product_category)
+        if not categories and normalized not in CATEGORY_ALIASES and normalized not in self._unknown_categories:
+            self._unknown_categories.add(normalized)
+            print(f"No product partition for category '{product_category}', searching the whole catalog")
+        return categories
+
+    def search(self, query: str, product_category: str, k: int = 3) -> List[Document]:
+        """
+        Find the k products most similar to the query within the scenario's categories.
+
+        Args:
+            query: The user's message or query
+            product_category: Scenario product category, e.g. "Smartphones"
+            k: Number of products to return
+
+        Returns:
+            Matching product documents, best first
+        """
+        categories = self.categories_for(product_category)
+        if not categories:
+            # Whole-catalog search still benefits from the category hint in the query
+            return self.vectorstore.similarity_search(f"{product_category}: {query}", k=k)
+
+        if len(categories) == 1:
+            return self.partitions[categories[0]].similarity_search(query, k=k)
+
+        # Several partitions: embed once and merge the best matches by distance
+        embedding = self.vectorstore.embedding_function.embed_query(query)
+        scored = []
+        for category in categories:
+            scored.extend(self.partitions[category].similarity_search_with_score_by_vector(embedding, k=k))
+        scored.sort(key=lambda pair: pair[1])
+        return [document for document, _ in scored[:k]]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "products": self.vectorstore.index.ntotal,
+            "partitions": {category: partition.index.ntotal for category, partition in self.partitions.items()},
+            "unmapped_categories": sorted(self._unknown_categories)
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the FAISS product knowledge index")
+    parser.add_argument("--csv", default="data/products.csv", help="Product catalog CSV")
+    parser.add_argument("--out", default=PRODUCT_INDEX_DIR, help="Index artifact directory")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if an index for this catalog exists")
+    args = parser.parse_args()
+
+    engine = get_embedding_engine()
+    content_hash = catalog_hash(args.csv, engine.model_id)
+    existing = os.path.join(args.out, content_hash, "index.faiss")
+    if os.path.isfile(existing) and not args.force:
+        print(f"Product index {content_hash} is up to date in {args.out}")
+    else:
+        build_index(pd.read_csv(args.csv), args.out, content_hash, engine)
+        print(engine.stats())
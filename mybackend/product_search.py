@@ -0,0 +1,327 @@
+"""
+Product Search
+--------------
+This module answers product questions from the catalog with cheap lexical
+lookups first and only falls back to the FAISS vector search when they find
+nothing, so most queries never touch the embedding model.
+
+Key components:
+1. Exact brand/model hash index matched against the n-grams of the query,
+   tolerant of spacing and punctuation ("WH 1000XM5", "Galaxy Watch 6")
+2. BM25 inverted index over category, brand, model, key features and specs
+3. Reciprocal rank fusion of exact, brand and BM25 hits, with vector search
+   only used when none of them match
+4. Candidate product sets resolved once per scenario category at startup
+5. Per-conversation LRU of query -> product context, since a conversation's
+   category never changes and trainees repeat their product questions
+6. Lookup-path metrics (exact / lexical / vector fallback) and latency
+"""
+
+import math
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from product_index import normalize_category, product_documents, resolve_categories
+
+# Longest model name (in tokens) matched against the query
+MAX_MODEL_TOKENS = 6
+
+# Weights for reciprocal rank fusion (score = weight / (RRF_K + rank))
+RRF_K = 60
+EXACT_WEIGHT = 2.0
+BRAND_WEIGHT = 0.5
+LEXICAL_WEIGHT = 1.0
+
+STOPWORDS = {
+    "a", "about", "and", "any", "are", "can", "do", "does", "for", "have", "has", "how", "i",
+    "in", "is", "it", "its", "me", "my", "of", "on", "or", "show", "tell", "that", "the",
+    "this", "to", "what", "which", "with", "you", "your", "we", "want", "looking", "need"
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens; punctuation and spacing are ignored."""
+    return re.findall(r"[a-z0-9]+", str(text).lower())
+
+
+def compact(tokens: List[str]) -> str:
+    """Join tokens without separators, so "WH-1000XM5" and "wh 1000xm5" agree."""
+    return "".join(tokens)
+
+
+class BM25Index:
+    """Okapi BM25 over small documents using an inverted index."""
+
+    def __init__(self, documents: List[List[str]], k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            documents: Tokenized documents; positions are the document ids
+            k1: Term frequency saturation
+            b: Document length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self.lengths = [len(tokens) for tokens in documents]
+        self.average_length = sum(self.lengths) / len(documents) if documents else 0.0
+
+        # term -> list of (doc_id, term frequency)
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc_id, tokens in enumerate(documents):
+            for term, frequency in Counter(tokens).items():
+                self.postings.setdefault(term, []).append((doc_id, frequency))
+
+        count = len(documents)
+        self.idf = {
+            term: math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    def scores(self, terms: List[str], allowed: Optional[set] = None) -> Dict[int, float]:
+        """Score every document containing at least one query term."""
+        scores: Dict[int, float] = {}
+        for term in set(terms):
+            for doc_id, frequency in self.postings.get(term, ()):
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                length_norm = 1 - self.b + self.b * self.lengths[doc_id] / self.average_length
+                scores[doc_id] = scores.get(doc_id, 0.0) + self.idf[term] * frequency * (self.k1 + 1) / (
+                    frequency + self.k1 * length_norm
+                )
+        return scores
+
+
+class ProductLookup:
+    """Hybrid exact + BM25 product search with a vector search fallback."""
+
+    def __init__(self, products_df: pd.DataFrame):
+        """
+        Args:
+            products_df: DataFrame containing product information
+        """
+        texts, metadatas = product_documents(products_df)
+        self.texts = texts
+        self.categories = [normalize_category(metadata["category"]) for metadata in metadatas]
+        self.known_categories = set(self.categories)
+
+        # Exact lookup: compacted model / brand+model / model prefix -> product positions
+        self.model_keys: Dict[str, set] = {}
+        self.brand_keys: Dict[str, set] = {}
+        lexical_documents = []
+
+        for position, (_, row) in enumerate(products_df.iterrows()):
+            brand_tokens = tokenize(row["brand"])
+            model_tokens = tokenize(row["model"])
+
+            keys = {compact(model_tokens), compact(brand_tokens + model_tokens)}
+            # Shorter forms people actually say ("Galaxy S24", "Bravia X80K"),
+            # only when they contain a digit so they stay specific
+            for end in range(2, len(model_tokens)):
+                prefix = compact(model_tokens[:end])
+                if any(char.isdigit() for char in prefix) and len(prefix) >= 5:
+                    keys.add(prefix)
+            for key in keys:
+                self.model_keys.setdefault(key, set()).add(position)
+            self.brand_keys.setdefault(compact(brand_tokens), set()).add(position)
+
+            lexical_documents.append([
+                token for field in ("category", "brand", "model", "key_features", "technical_specs")
+                for token in tokenize(row[field]) if token not in STOPWORDS
+            ])
+
+        self.bm25 = BM25Index(lexical_documents)
+
+        # Scenario product_category -> candidate positions (None = whole catalog)
+        self._category_positions: Dict[str, Optional[frozenset]] = {}
+
+        self._exact_hits = 0
+        self._lexical_hits = 0
+        self._vector_fallbacks = 0
+        self._searches = 0
+        self._total_seconds = 0.0
+
+    def _positions_in(self, product_category: str) -> Optional[frozenset]:
+        if product_category in self._category_positions:
+            return self._category_positions[product_category]
+
+        categories = resolve_categories(product_category, self.known_categories)
+        if categories:
+            positions = frozenset(
+                position for position, category in enumerate(self.categories) if category in categories
+            )
+        else:
+            positions = None
+        self._category_positions[product_category] = positions
+        return positions
+
+    def prepare_categories(self, product_categories: List[str]) -> Dict[str, int]:
+        """
+        Resolve the candidate products of each scenario category ahead of time.
+
+        Args:
+            product_categories: product_category values from scenarios.csv
+
+        Returns:
+            Number of candidate products per category
+        """
+        sizes = {}
+        for product_category in dict.fromkeys(product_categories):
+            positions = self._positions_in(product_category)
+            sizes[product_category] = len(positions) if positions is not None else len(self.texts)
+        return sizes
+
+    def prepared_categories(self) -> List[str]:
+        """Scenario categories resolved so far, to carry over to a rebuilt lookup."""
+        return list(self._category_positions)
+
+    def exact_matches(self, tokens: List[str]) -> List[int]:
+        """Products whose model is named in the query, longest (most specific) match first."""
+        matches: Dict[int, int] = {}
+        for start in range(len(tokens)):
+            for end in range(start + 1, min(len(tokens), start + MAX_MODEL_TOKENS) + 1):
+                key = compact(tokens[start:end])
+                for position in self.model_keys.get(key, ()):
+                    matches[position] = max(matches.get(position, 0), len(key))
+        return sorted(matches, key=lambda position: -matches[position])
+
+    def brand_matches(self, tokens: List[str], allowed: Optional[set]) -> List[int]:
+        """Products of a brand named in the query, within the scenario's categories."""
+        positions = []
+        for token in dict.fromkeys(tokens):
+            for position in sorted(self.brand_keys.get(token, ())):
+                if allowed is None or position in allowed:
+                    positions.append(position)
+        return positions
+
+    def search(
+        self,
+        query: str,
+        product_category: str,
+        k: int = 3,
+        vector_search: Optional[Callable[[str, str, int], List[Any]]] = None
+    ) -> List[str]:
+        """
+        Find up to k product descriptions for the query.
+
+        Args:
+            query: The user's message or query
+            product_category: Scenario product category, e.g. "Smartphones"
+            k: Number of products to return
+            vector_search: Optional (query, category, k) -> documents fallback,
+                only called when the lexical indexes find nothing
+
+        Returns:
+            Product description texts, best first
+        """
+        started = time.perf_counter()
+        tokens = tokenize(query)
+        allowed = self._positions_in(product_category)
+
+        # A named model is what the trainee is asking about, even outside the category
+        exact = self.exact_matches(tokens)
+        brand = self.brand_matches(tokens, allowed)
+        lexical_scores = self.bm25.scores([t for t in tokens if t not in STOPWORDS], allowed)
+        lexical = sorted(lexical_scores, key=lambda position: -lexical_scores[position])
+
+        fused: Dict[int, float] = {}
+        for weight, ranking in ((EXACT_WEIGHT, exact), (BRAND_WEIGHT, brand), (LEXICAL_WEIGHT, lexical)):
+            for rank, position in enumerate(ranking, start=1):
+                fused[position] = fused.get(position, 0.0) + weight / (RRF_K + rank)
+
+        ranked = sorted(fused, key=lambda position: -fused[position])[:k]
+        results = [self.texts[position] for position in ranked]
+
+        if exact:
+            self._exact_hits += 1
+        elif ranked:
+            self._lexical_hits += 1
+
+        # A lexical hit is a better answer than padding it with vector neighbours
+        if not results and vector_search is not None:
+            self._vector_fallbacks += 1
+            results = [document.page_content for document in vector_search(query, product_category, k)]
+
+        self._searches += 1
+        self._total_seconds += time.perf_counter() - started
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Return how queries were answered and the average lookup latency."""
+        return {
+            "products": len(self.texts),
+            "prepared_categories": len(self._category_positions),
+            "model_keys": len(self.model_keys),
+            "terms": len(self.bm25.postings),
+            "searches": self._searches,
+            "exact_hits": self._exact_hits,
+            "lexical_hits": self._lexical_hits,
+            "vector_fallbacks": self._vector_fallbacks,
+            "average_search_us": self._total_seconds * 1e6 / self._searches if self._searches else 0.0
+        }
+
+
+class ConversationProductCache:
+    """LRU of retrieved product context per conversation."""
+
+    def __init__(self, max_conversations: int = 1000, max_queries: int = 32):
+        """
+        Args:
+            max_conversations: Conversations kept; the least recently active is dropped
+            max_queries: Distinct queries remembered per conversation
+        """
+        self.max_conversations = max_conversations
+        self.max_queries = max_queries
+        self._conversations: "OrderedDict[str, OrderedDict[str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def _key(query: str) -> str:
+        # Same tokens, same lookup: "Price?" and "price" share an entry
+        return " ".join(tokenize(query))
+
+    def get(self, conversation_id: str, query: str) -> Optional[str]:
+        """Return the cached product context for this query, or None."""
+        with self._lock:
+            queries = self._conversations.get(conversation_id)
+            context = queries.get(self._key(query)) if queries is not None else None
+            if context is None:
+                self._misses += 1
+                return None
+            self._conversations.move_to_end(conversation_id)
+            queries.move_to_end(self._key(query))
+            self._hits += 1
+            return context
+
+    def put(self, conversation_id: str, query: str, context: str) -> None:
+        """Remember the product context retrieved for this query."""
+        with self._lock:
+            queries = self._conversations.setdefault(conversation_id, OrderedDict())
+            self._conversations.move_to_end(conversation_id)
+            queries[self._key(query)] = context
+            queries.move_to_end(self._key(query))
+            while len(queries) > self.max_queries:
+                queries.popitem(last=False)
+            while len(self._conversations) > self.max_conversations:
+                self._conversations.popitem(last=False)
+
+    def clear(self) -> None:
+        """Forget everything, e.g. after the catalog changed."""
+        with self._lock:
+            self._conversations.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "conversations": len(self._conversations),
+                "entries": sum(len(queries) for queries in self._conversations.values()),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0
+            }
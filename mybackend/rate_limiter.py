@@ -0,0 +1,439 @@
+"""
+LLM Rate Limiter
+----------------
+This module schedules LLM calls against the provider's requests-per-minute
+and tokens-per-minute budgets, so a classroom of trainees starting at once
+queues briefly instead of hitting 429s and falling back to canned replies.
+
+Calls wait in a priority queue and are released by a single dispatcher once
+both token buckets have room. Live chat replies always go ahead of analysis
+jobs, and analysis goes ahead of background work such as greeting pool warm-up.
+Chat calls wait for their slot however long it takes, so a burst delays
+replies instead of turning them into canned fallbacks; only analysis and
+background calls give up after the queue timeout.
+
+Key components:
+1. Request and token buckets refilled continuously at the per-minute budget
+2. Priority queue with per-priority depth and wait-time metrics
+3. Retry of rate-limited calls after the provider's `retry-after` delay,
+   pausing every queued call meanwhile
+4. Budget adaptation from the provider's `x-ratelimit-*` response headers,
+   fed by the shared LLM transport so every 429 is seen, even ones the SDK retries
+
+Bucket state is guarded by a lock, because the transport's response hooks
+can run on worker threads as well as on the event loop.
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Mapping, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Lower value = dispatched first
+PRIORITY_CHAT = 0
+PRIORITY_ANALYSIS = 1
+PRIORITY_BACKGROUND = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_CHAT: "chat",
+    PRIORITY_ANALYSIS: "analysis",
+    PRIORITY_BACKGROUND: "background"
+}
+
+
+class RateLimitQueueTimeout(Exception):
+    """Raised when a call waited longer than the queue timeout for a slot."""
+
+
+def estimate_tokens(text: str, max_output_tokens: int = 0) -> int:
+    """Roughly estimate the tokens a call uses (about 4 characters per token)."""
+    return len(text) // 4 + max_output_tokens
+
+
+def _is_rate_limit_error(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429
+
+
+def retry_after_seconds(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """Read the provider's requested delay from rate-limit response headers, if any."""
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return float(retry_after)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Budget refilled continuously so `capacity` units are available per minute."""
+
+    def __init__(self, capacity: float):
+        self.capacity = capacity
+        self.level = capacity
+        self._updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.capacity / 60)
+        self._updated = now
+
+    def seconds_until(self, amount: float) -> float:
+        """Seconds until `amount` units are available (0 if they already are)."""
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60 / self.capacity
+
+    def consume(self, amount: float) -> None:
+        # Level may go negative when actual usage exceeds the estimate
+        self.level -= amount
+
+    def set_capacity(self, capacity: float) -> None:
+        self.level = min(self.level, capacity)
+        self.capacity = capacity
+
+
+class RateLimitScheduler:
+    """Priority queue that releases LLM calls within requests/min and tokens/min budgets."""
+
+    def __init__(
+        self,
+        requests_per_minute: float = 30,
+        tokens_per_minute: float = 6000,
+        max_retries: int = 3,
+        queue_timeout: Optional[float] = None,
+        enabled: bool = True
+    ):
+        """
+        Args:
+            requests_per_minute: Provider request budget
+            tokens_per_minute: Provider token budget (prompt + completion)
+            max_retries: Times a rate-limited call is retried before the error is raised
+            queue_timeout: Default maximum seconds an analysis or background call
+                waits for a slot; None waits forever. Chat calls never time out
+                unless the caller passes a timeout
+            enabled: Master switch; when False calls run immediately
+        """
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        # Guards the buckets and the pause deadline
+        self._lock = threading.Lock()
+        self.max_retries = max_retries
+        self.queue_timeout = queue_timeout
+        self.enabled = enabled
+
+        # (priority, sequence, tokens, future, enqueued_at)
+        self._queue: list = []
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self._dispatched = {name: 0 for name in PRIORITY_NAMES.values()}
+        self._total_wait = {name: 0.0 for name in PRIORITY_NAMES.values()}
+        self._max_wait = {name: 0.0 for name in PRIORITY_NAMES.values()}
+        self._rate_limited = 0
+        self._retries = 0
+        self._timeouts = 0
+
+    # ------------------------------
+    # Dispatching
+    # ------------------------------
+
+    def _ensure_dispatcher(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._dispatcher is None or self._dispatcher.done():
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._dispatcher = loop.create_task(self._dispatch_loop())
+
+    async def _sleep_or_wake(self, seconds: float) -> None:
+        """Sleep, but return early when a new call is queued."""
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _dispatch_loop(self) -> None:
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            now = time.monotonic()
+            with self._lock:
+                paused_for = self._paused_until - now
+            if paused_for > 0:
+                await self._sleep_or_wake(paused_for)
+                continue
+
+            priority, _, tokens, future, enqueued_at = self._queue[0]
+            if future.done():
+                # Caller gave up (timeout or cancellation)
+                heapq.heappop(self._queue)
+                continue
+
+            with self._lock:
+                self.requests.refill(now)
+                self.tokens.refill(now)
+                wait = max(self.requests.seconds_until(1), self.tokens.seconds_until(tokens))
+                if wait <= 0:
+                    self.requests.consume(1)
+                    self.tokens.consume(tokens)
+            if wait > 0:
+                await self._sleep_or_wake(wait)
+                continue
+
+            heapq.heappop(self._queue)
+
+            name = PRIORITY_NAMES.get(priority, str(priority))
+            waited = now - enqueued_at
+            self._dispatched[name] = self._dispatched.get(name, 0) + 1
+            self._total_wait[name] = self._total_wait.get(name, 0.0) + waited
+            self._max_wait[name] = max(self._max_wait.get(name, 0.0), waited)
+            future.set_result(None)
+
+    async def acquire(self, priority: int = PRIORITY_CHAT, tokens: int = 0, timeout: Optional[float] = None) -> None:
+        """
+        Wait until the call may be sent within the provider budgets.
+
+        Args:
+            priority: PRIORITY_CHAT, PRIORITY_ANALYSIS or PRIORITY_BACKGROUND
+            tokens: Estimated prompt + completion tokens of the call
+            timeout: Maximum seconds to wait; defaults to no limit for chat calls
+                and to the scheduler's queue_timeout otherwise
+
+        Raises:
+            RateLimitQueueTimeout: If no slot became available in time
+        """
+        if not self.enabled:
+            return
+
+        self._ensure_dispatcher()
+        future = self._loop.create_future()
+        heapq.heappush(self._queue, (priority, next(self._sequence), tokens, future, time.monotonic()))
+        self._wakeup.set()
+
+        if timeout is None and priority != PRIORITY_CHAT:
+            timeout = self.queue_timeout
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            self._timeouts += 1
+            raise RateLimitQueueTimeout(f"No LLM slot within {timeout}s")
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Correct the token bucket once the real usage of a call is known."""
+        if self.enabled and actual_tokens:
+            with self._lock:
+                self.tokens.consume(actual_tokens - min(estimated_tokens, self.tokens.capacity))
+
+    def _pause(self, headers: Optional[Mapping[str, str]]) -> None:
+        """Hold every queued call after a 429 and empty the buckets."""
+        delay = retry_after_seconds(headers)
+        if delay is None:
+            delay = 60 / max(1.0, self.requests.capacity)
+
+        now = time.monotonic()
+        with self._lock:
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            self.requests.level = min(self.requests.level, 0)
+            self.tokens.level = min(self.tokens.level, 0)
+
+            extended = now + delay > self._paused_until
+            if extended:
+                self._paused_until = now + delay
+        if extended:
+            print(f"Rate limiter: provider returned 429, pausing LLM calls for {delay:.1f}s")
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[T]],
+        priority: int = PRIORITY_CHAT,
+        tokens: int = 0,
+        timeout: Optional[float] = None
+    ) -> T:
+        """
+        Run an LLM call once the budgets allow it, retrying after 429 responses.
+
+        Args:
+            call: Zero-argument function returning the awaitable to run
+            priority: Queue priority of the call
+            tokens: Estimated prompt + completion tokens of the call
+            timeout: Maximum seconds to wait for each slot
+
+        Returns:
+            The call's result
+
+        Raises:
+            RateLimitQueueTimeout: If no slot became available in time
+            Exception: The provider error once retries are exhausted
+        """
+        attempt = 0
+        while True:
+            await self.acquire(priority, tokens, timeout)
+            try:
+                result = await call()
+            except Exception as e:
+                if not self.enabled or not _is_rate_limit_error(e):
+                    raise
+                self._pause(getattr(getattr(e, "response", None), "headers", None))
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self._retries += 1
+                continue
+
+            usage = getattr(result, "usage", None) or getattr(result, "usage_metadata", None)
+            if isinstance(usage, dict):
+                actual = usage.get("total_tokens")
+            else:
+                actual = getattr(usage, "total_tokens", None)
+            self.record_usage(tokens, actual)
+            return result
+
+    async def stream(
+        self,
+        open_stream: Callable[[], Any],
+        priority: int = PRIORITY_CHAT,
+        tokens: int = 0,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[Any]:
+        """
+        Iterate a streamed LLM call once the budgets allow it.
+
+        A 429 is retried only if it arrives before the first chunk, so callers
+        never see a chunk twice.
+
+        Args:
+            open_stream: Zero-argument function returning an async iterable,
+                or an awaitable resolving to one
+            priority: Queue priority of the call
+            tokens: Estimated prompt + completion tokens of the call
+            timeout: Maximum seconds to wait for each slot
+
+        Yields:
+            The stream's chunks
+        """
+        attempt = 0
+        while True:
+            await self.acquire(priority, tokens, timeout)
+            started = False
+            try:
+                stream = open_stream()
+                if asyncio.iscoroutine(stream):
+                    stream = await stream
+                async for chunk in stream:
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                if started or not self.enabled or not _is_rate_limit_error(e):
+                    raise
+                self._pause(getattr(getattr(e, "response", None), "headers", None))
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self._retries += 1
+
+    # ------------------------------
+    # Adaptation and metrics
+    # ------------------------------
+
+    def observe_response(self, response: Any) -> None:
+        """
+        Adapt to every LLM HTTP response, including the SDK's own retries.
+
+        A 429 pauses the queue for the `retry-after` delay. Otherwise the token
+        budget follows Groq's `x-ratelimit-*` headers, which report the
+        tokens-per-minute limit and the tokens left in the current window (the
+        request headers are per day, so only tokens are used).
+        """
+        if not self.enabled:
+            return
+
+        headers = response.headers
+        if response.status_code == 429:
+            with self._lock:
+                self._rate_limited += 1
+            self._pause(headers)
+            return
+
+        try:
+            limit = headers.get("x-ratelimit-limit-tokens")
+            limit = float(limit) if limit else None
+            remaining = headers.get("x-ratelimit-remaining-tokens")
+            remaining = float(remaining) if remaining else None
+        except ValueError:
+            return
+
+        with self._lock:
+            if limit:
+                self.tokens.set_capacity(limit)
+            if remaining is not None:
+                self.tokens.refill(time.monotonic())
+                self.tokens.level = min(self.tokens.level, remaining)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth, wait times and rate-limit counts for monitoring."""
+        now = time.monotonic()
+        with self._lock:
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            available_requests = self.requests.level
+            available_tokens = self.tokens.level
+            paused_for = max(0.0, self._paused_until - now)
+        depth = {name: 0 for name in PRIORITY_NAMES.values()}
+        oldest_wait = 0.0
+        for priority, _, _, future, enqueued_at in self._queue:
+            if not future.done():
+                name = PRIORITY_NAMES.get(priority, str(priority))
+                depth[name] = depth.get(name, 0) + 1
+                oldest_wait = max(oldest_wait, now - enqueued_at)
+
+        return {
+            "enabled": self.enabled,
+            "requests_per_minute": self.requests.capacity,
+            "tokens_per_minute": self.tokens.capacity,
+            "available_requests": round(available_requests, 2),
+            "available_tokens": round(available_tokens, 2),
+            "paused_for_seconds": round(paused_for, 2),
+            "queue_depth": depth,
+            "oldest_wait_seconds": round(oldest_wait, 3),
+            "dispatched": dict(self._dispatched),
+            "average_wait_seconds": {
+                name: round(self._total_wait[name] / count, 3) if count else 0.0
+                for name, count in self._dispatched.items()
+            },
+            "max_wait_seconds": {name: round(wait, 3) for name, wait in self._max_wait.items()},
+            "rate_limited": self._rate_limited,
+            "retries": self._retries,
+            "queue_timeouts": self._timeouts
+        }
@@ -0,0 +1,212 @@
+"""
+Semantic Response Cache
+-----------------------
+This module caches customer replies to the opening turns of a conversation,
+where many trainees send near-identical lines ("Hello sir, how can I help
+you?") into the same scenario.
+
+Entries are partitioned by a compact (persona, scenario, trait) key and
+matched on the embedding of the agent's last message. A lookup returns the
+raw LLM reply of the most similar cached message above a threshold; callers
+still run validation and persona post-processing on it, so served replies
+vary slightly just like fresh ones.
+
+Key components:
+1. Pluggable text embedding (hashed character n-grams by default)
+2. Similarity lookup within a persona/scenario/trait partition
+3. Global LRU max-size eviction and hit-rate metrics
+4. Per-scenario opt-out for scenarios that depend on reply variety
+"""
+
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+EMBEDDING_DIMENSIONS = 1024
+
+
+def normalize_message(text: str) -> str:
+    """Lowercase and collapse punctuation/whitespace so trivial variations match."""
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+def hashed_ngram_embedding(text: str, dimensions: int = EMBEDDING_DIMENSIONS) -> np.ndarray:
+    """
+    Embed text as an L2-normalized bag of hashed character trigrams.
+
+    Cheap, deterministic across processes and good enough to match short
+    paraphrased opening lines without loading an embedding model.
+    """
+    vector = np.zeros(dimensions, dtype=np.float32)
+    padded = f" {normalize_message(text)} "
+    for i in range(len(padded) - 2):
+        vector[zlib.crc32(padded[i:i + 3].encode()) % dimensions] += 1.0
+
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticResponseCache:
+    """Similarity cache of raw LLM replies for the opening turns of a conversation."""
+
+    def __init__(
+        self,
+        embed: Callable[[str], np.ndarray] = hashed_ngram_embedding,
+        threshold: float = 0.9,
+        max_entries: int = 5000,
+        max_history: int = 2,
+        disabled_scenarios: Iterable[str] = (),
+        enabled: bool = True
+    ):
+        """
+        Args:
+            embed: Function mapping text to an L2-normalized vector
+            threshold: Minimum cosine similarity for a cache hit
+            max_entries: Maximum cached replies across all partitions
+            max_history: Only cache turns while the history is at most this long,
+                since later replies depend on more than the last agent message
+            disabled_scenarios: Scenario IDs that always bypass the cache
+            enabled: Master switch for the whole cache
+        """
+        self.embed = embed
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_history = max_history
+        self.disabled_scenarios = set(disabled_scenarios)
+        self.enabled = enabled
+
+        # (partition_key, normalized_message) -> (vector, reply), in LRU order
+        self._entries: "OrderedDict[Tuple[Tuple[str, str, str], str], Tuple[np.ndarray, str]]" = OrderedDict()
+        # partition_key -> normalized messages cached for it
+        self._partitions: Dict[Tuple[str, str, str], set] = {}
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._bypassed = 0
+        self._stores = 0
+        self._evictions = 0
+
+    @staticmethod
+    def _partition_key(customer: Dict[str, Any], scenario: Dict[str, Any], traits: Dict[str, Any]) -> Tuple[str, str, str]:
+        return (
+            str(customer.get("persona_id", customer.get("name"))),
+            str(scenario.get("scenario_id", scenario.get("title"))),
+            str(traits.get("trait_id", traits.get("trait_name")))
+        )
+
+    def is_eligible(self, scenario: Dict[str, Any], conversation_history: List[Dict[str, str]], user_message: str) -> bool:
+        """Check whether this turn may be served from or stored in the cache."""
+        return (
+            self.enabled
+            and bool(user_message)
+            and len(conversation_history) <= self.max_history
+            and str(scenario.get("scenario_id")) not in self.disabled_scenarios
+        )
+
+    def lookup(
+        self,
+        customer: Dict[str, Any],
+        scenario: Dict[str, Any],
+        traits: Dict[str, Any],
+        conversation_history: List[Dict[str, str]],
+        user_message: str
+    ) -> Optional[str]:
+        """
+        Find a cached raw reply for a similar agent message.
+
+        Returns:
+            The cached reply, or None on a miss or when the turn is not eligible
+        """
+        if not self.is_eligible(scenario, conversation_history, user_message):
+            self._bypassed += 1
+            return None
+
+        key = self._partition_key(customer, scenario, traits)
+        normalized = normalize_message(user_message)
+
+        with self._lock:
+            messages = self._partitions.get(key)
+            if not messages:
+                self._misses += 1
+                return None
+
+            # Exact normalized match needs no embedding
+            exact = self._entries.get((key, normalized))
+            if exact is not None:
+                self._entries.move_to_end((key, normalized))
+                self._hits += 1
+                return exact[1]
+
+            candidates = list(messages)
+
+        query = self.embed(user_message)
+        with self._lock:
+            candidates = [m for m in candidates if (key, m) in self._entries]
+            if not candidates:
+                self._misses += 1
+                return None
+
+            vectors = np.stack([self._entries[(key, m)][0] for m in candidates])
+            similarities = vectors @ query
+            best = int(np.argmax(similarities))
+
+            if similarities[best] < self.threshold:
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end((key, candidates[best]))
+            self._hits += 1
+            return self._entries[(key, candidates[best])][1]
+
+    def store(
+        self,
+        customer: Dict[str, Any],
+        scenario: Dict[str, Any],
+        traits: Dict[str, Any],
+        conversation_history: List[Dict[str, str]],
+        user_message: str,
+        reply: str
+    ) -> None:
+        """Cache the raw LLM reply generated for this agent message."""
+        if not reply or not self.is_eligible(scenario, conversation_history, user_message):
+            return
+
+        key = self._partition_key(customer, scenario, traits)
+        normalized = normalize_message(user_message)
+        vector = self.embed(user_message)
+
+        with self._lock:
+            if (key, normalized) in self._entries:
+                self._entries.move_to_end((key, normalized))
+            else:
+                while len(self._entries) >= self.max_entries:
+                    (old_key, old_message), _ = self._entries.popitem(last=False)
+                    self._partitions[old_key].discard(old_message)
+                    self._evictions += 1
+                self._partitions.setdefault(key, set()).add(normalized)
+
+            self._entries[(key, normalized)] = (vector, reply)
+            self._stores += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache size and hit-rate metrics for monitoring."""
+        lookups = self._hits + self._misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "partitions": sum(1 for messages in self._partitions.values() if messages),
+            "threshold": self.threshold,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+            "bypassed": self._bypassed,
+            "stores": self._stores,
+            "evictions": self._evictions,
+            "disabled_scenarios": sorted(self.disabled_scenarios)
+        }
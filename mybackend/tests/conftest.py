@@ -0,0 +1,11 @@
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+# Keep app import side effects local: no greeting warm-up, no index build
+os.environ.setdefault("GREETING_POOL_SIZE", "0")
+os.environ.setdefault("PRODUCT_INDEX_BUILD_ON_STARTUP", "False")
+os.environ.setdefault("EMBEDDING_BACKEND", "hashed")
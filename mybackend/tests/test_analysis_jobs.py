@@ -0,0 +1,90 @@
+import asyncio
+
+import mongomock
+
+from analysis_jobs import AnalysisJobQueue, JOB_DONE, JOB_FAILED
+
+
+def make_workers(collection, runs):
+    """Two job queues sharing one job collection, like two uvicorn workers."""
+    async def run(job):
+        runs.append(job.job_id)
+        await asyncio.sleep(0.05)
+        return {"overall_score": 80}
+
+    queues = [AnalysisJobQueue(run, workers=1, poll_interval=0.01) for _ in range(2)]
+    for queue in queues:
+        queue.attach(collection)
+        queue.start()
+    return queues
+
+
+def test_conversation_version_analyzed_once_across_workers():
+    async def scenario():
+        runs = []
+        first, second = make_workers(mongomock.MongoClient().db.jobs, runs)
+
+        job = await first.submit("conv-1", 3, {})
+        duplicate = await second.submit("conv-1", 3, {})
+
+        assert duplicate.job_id == job.job_id
+        assert not duplicate.local
+        assert await second.wait(duplicate, timeout=5)
+        assert duplicate.status == JOB_DONE
+        assert duplicate.result == {"overall_score": 80}
+        assert len(runs) == 1
+
+        # Any worker can answer a poll for the job
+        polled = await second.get(job.job_id)
+        assert polled.status == JOB_DONE
+
+        for queue in (first, second):
+            await queue.stop()
+
+    asyncio.run(scenario())
+
+
+def test_failed_job_can_be_retried_by_another_worker():
+    async def scenario():
+        runs = []
+        collection = mongomock.MongoClient().db.jobs
+        first, second = make_workers(collection, runs)
+
+        job = await first.submit("conv-1", 3, {})
+        await first.wait(job, timeout=5)
+        collection.update_one({"_id": job.claim_key}, {"$set": {"status": JOB_FAILED}})
+
+        retry = await second.submit("conv-1", 3, {})
+
+        assert retry.local
+        assert retry.job_id != job.job_id
+        assert await second.wait(retry, timeout=5)
+        assert len(runs) == 2
+
+        for queue in (first, second):
+            await queue.stop()
+
+    asyncio.run(scenario())
+
+
+def test_each_user_gets_own_job_for_a_conversation_version():
+    async def scenario():
+        runs = []
+        first, second = make_workers(mongomock.MongoClient().db.jobs, runs)
+
+        eager = await first.submit("conv-1", 3, {"user_id": "owner"})
+        other = await second.submit("conv-1", 3, {"user_id": "reviewer"})
+        repeat = await second.submit("conv-1", 3, {"user_id": "owner"})
+
+        assert other.job_id != eager.job_id
+        assert other.local
+        assert repeat.job_id == eager.job_id
+        assert (await first.find("conv-1", "reviewer")).job_id == other.job_id
+        for job, queue in ((eager, first), (other, second)):
+            assert await queue.wait(job, timeout=5)
+        assert len(runs) == 2
+
+        for queue in (first, second):
+            await queue.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,18 @@
+import os
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TCMBOT_DIR = os.path.join(os.path.dirname(BACKEND_DIR), "TCMBOT")
+
+# Modules both services ship; they are deployed separately, so each keeps a copy
+SHARED_MODULES = ["data_reload.py", "llm_transport.py"]
+
+
+@pytest.mark.parametrize("module", SHARED_MODULES)
+def test_shared_module_copies_match(module):
+    with open(os.path.join(BACKEND_DIR, module), "rb") as backend_copy:
+        with open(os.path.join(TCMBOT_DIR, module), "rb") as tcmbot_copy:
+            assert backend_copy.read() == tcmbot_copy.read(), (
+                f"mybackend/{module} and TCMBOT/{module} differ; apply the change to both copies"
+            )
@@ -0,0 +1,102 @@
+import mongomock
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import app as backend
+from analysis_memo import RecordedAttempts
+from catalog import ScenarioCatalog
+
+
+@pytest.fixture
+def client(monkeypatch):
+    scenarios_df = pd.read_csv(backend.SCENARIOS_CSV)
+    catalog = ScenarioCatalog(scenarios_df, backend.scenario_summary, backend.scenario_detail)
+    monkeypatch.setattr(backend, "scenario_catalog", catalog)
+    monkeypatch.setattr(backend, "db", mongomock.MongoClient().retail_training)
+    # No startup event: data and database are set up above
+    return TestClient(backend.app)
+
+
+def first_scenario():
+    return backend.scenario_catalog.records[0].data
+
+
+def test_user_progress_without_attempts(client):
+    response = client.get("/user-progress/new-user")
+
+    assert response.status_code == 200
+    progress = response.json()
+    assert len(progress) == len(backend.scenario_catalog)
+    assert progress[0]["scenario_id"] == first_scenario()["scenario_id"]
+    assert progress[0]["title"] == first_scenario()["title"]
+    assert all(not item["completed"] and item["attempts"] == 0 for item in progress)
+
+
+def test_user_progress_with_attempts(client):
+    scenario = first_scenario()
+    backend.db.user_retail_training.insert_one({
+        "user_id": "trainee",
+        "scenarios": [{
+            "scenario_id": scenario["scenario_id"],
+            "completed": True,
+            "best_score": 82,
+            "total_attempts": 2,
+            "last_attempt_date": "2024-01-01T10:00:00"
+        }]
+    })
+
+    progress = {item["scenario_id"]: item for item in client.get("/user-progress/trainee").json()}
+
+    assert progress[scenario["scenario_id"]]["completed"] is True
+    assert progress[scenario["scenario_id"]]["best_score"] == 82
+    assert progress[scenario["scenario_id"]]["attempts"] == 2
+
+
+def test_scenario_progress_without_attempts(client):
+    scenario = first_scenario()
+
+    response = client.get(f"/user-progress/new-user/scenario/{scenario['scenario_id']}")
+
+    assert response.status_code == 200
+    assert response.json()["title"] == scenario["title"]
+    assert response.json()["total_attempts"] == 0
+
+
+def test_scenario_progress_unknown_scenario(client):
+    assert client.get("/user-progress/new-user/scenario/missing").status_code == 404
+
+
+def test_progress_recorded_once_per_conversation(client, monkeypatch):
+    recorded = RecordedAttempts()
+    recorded.attach(backend.db.retail_recorded_attempts)
+    monkeypatch.setattr(backend, "recorded_attempts", recorded)
+    saved = []
+
+    def save(user_id, conversation_id, *args):
+        saved.append(conversation_id)
+        return True
+
+    monkeypatch.setattr(backend, "save_analysis_progress", save)
+    analysis = {"overall_score": 70, "category_scores": {}}
+
+    # Identical transcripts share an analysis but are still separate attempts
+    for conversation_id in ("conv-1", "conv-2", "conv-1"):
+        backend.record_analysis_progress("trainee", conversation_id, "scenario", "Scenario", analysis)
+
+    assert saved == ["conv-1", "conv-2"]
+    assert recorded.stats()["skipped_progress_writes"] == 1
+
+
+def test_failed_progress_write_can_be_retried(client, monkeypatch):
+    recorded = RecordedAttempts()
+    recorded.attach(backend.db.retail_recorded_attempts)
+    monkeypatch.setattr(backend, "recorded_attempts", recorded)
+    results = iter([False, True])
+    monkeypatch.setattr(backend, "save_analysis_progress", lambda *args: next(results))
+
+    backend.record_analysis_progress("trainee", "conv-1", "scenario", "Scenario", {})
+    backend.record_analysis_progress("trainee", "conv-1", "scenario", "Scenario", {})
+
+    assert recorded.stats()["recorded"] == 1
+    assert recorded.stats()["skipped_progress_writes"] == 0
@@ -0,0 +1,374 @@
+"""
+Transcript Scorer
+-----------------
+This module scores a training transcript locally and deterministically, so
+the conversation analysis only calls the LLM for sessions worth analyzing
+and sends it a compact feature summary instead of most of the transcript.
+
+Key components:
+1. Transcript features: message counts, the associate's share of the words,
+   greeting / introduction / courtesy / price / EMI coverage, and coverage
+   of the scenario's specific interests
+2. Readability (Flesch reading ease) and grammar heuristics on the
+   associate's messages
+3. Heuristic analysis, shaped like PerformanceAnalysis, for sessions below
+   the threshold (abandoned after a turn or two)
+4. Feature summary and observations used by the compact analysis prompt
+
+Price and EMI only count against the associate when the scenario's
+specific interests or objective mention them.
+
+Settings:
+    ANALYSIS_MIN_AGENT_TURNS   Sessions with fewer associate messages are scored locally (default 3)
+    ANALYSIS_MIN_AGENT_WORDS   Sessions with fewer associate words are scored locally (default 20)
+"""
+
+import os
+import re
+from typing import Any, Dict, List
+
+ANALYSIS_MIN_AGENT_TURNS = int(os.environ.get("ANALYSIS_MIN_AGENT_TURNS", "3"))
+ANALYSIS_MIN_AGENT_WORDS = int(os.environ.get("ANALYSIS_MIN_AGENT_WORDS", "20"))
+
+# Associate messages after which a session counts as fully engaged
+FULL_SESSION_TURNS = 6
+
+# Associate share of the words considered balanced (the customer should talk too)
+BALANCED_TALK_RATIO = (0.3, 0.7)
+
+# Score points lost per weighted grammar issue per sentence
+GRAMMAR_PENALTY = 25
+
+# Topics checked in the associate's messages (case-insensitive)
+COVERAGE_PATTERNS = {
+    "greeting": re.compile(r"\b(?:hello|hi|hey|namaste|greetings|welcome|good (?:morning|afternoon|evening))\b", re.IGNORECASE),
+    "introduction": re.compile(r"\b(?:my name is|myself|i am \w+ from|this is \w+ from|your (?:good )?name)\b", re.IGNORECASE),
+    "courtesy": re.compile(r"\b(?:please|thank(?:s| you)|sorry|sir|madam|ma'am)\b", re.IGNORECASE),
+    "price": re.compile(r"₹|\b(?:prices?|priced|pricing|costs?|budget|discounts?|offers?|rupees|rs\.?|\d{1,3}(?:,\d{2,3})+)\b", re.IGNORECASE),
+    "emi": re.compile(r"\b(?:emis?|instal?lments?|financ\w*|no[- ]cost|monthly payments?|interest rates?|down ?payment)\b", re.IGNORECASE)
+}
+
+# Topics that only count when the scenario asks for them
+SCENARIO_TOPICS = ("price", "emi")
+
+TOPIC_LABELS = {"greeting": "greeting", "introduction": "introduction", "courtesy": "courtesy", "price": "price", "emi": "EMI"}
+
+WORD = re.compile(r"[A-Za-z0-9']+")
+SENTENCE_SPLIT = re.compile(r"[.!?]+")
+VOWEL_GROUP = re.compile(r"[aeiouy]+")
+INTEREST_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Weighted grammar issues in the associate's messages
+GRAMMAR_CHECKS = {
+    "lowercase_i": (re.compile(r"(?<![\w'])i(?![\w'])"), 1.0),
+    "repeated_word": (re.compile(r"\b(\w+)\s+\1\b", re.IGNORECASE), 1.0),
+    "shorthand": (re.compile(r"\b(?:u|ur|r|pls|plz|thx|coz|cuz|gonna|wanna|dunno|ya)\b", re.IGNORECASE), 1.0)
+}
+LOWERCASE_START_WEIGHT = 0.5
+MISSING_PUNCTUATION_WEIGHT = 0.25
+
+INTEREST_STOPWORDS = {
+    "and", "the", "for", "with", "of", "or", "to", "in", "on", "possibly", "basic", "required", "specific", "options"
+}
+
+# Added when the feature-based suggestions are fewer than three
+GENERAL_SUGGESTIONS = [
+    "Ask open questions to understand how the customer will use the product.",
+    "Summarize the recommended product and confirm the next step before closing.",
+    "Relate each feature you mention to a need the customer expressed."
+]
+
+
+# ==============================
+# Feature Extraction
+# ==============================
+
+def _stem(token: str) -> str:
+    """Crude plural folding so "payments" matches "payment"."""
+    return token[:-1] if len(token) > 3 and token.endswith("s") else token
+
+
+def _interest_keywords(specific_interests: str) -> Dict[str, List[str]]:
+    """Map each comma-separated interest to its keyword stems."""
+    keywords = {}
+    if not isinstance(specific_interests, str):
+        return keywords
+    for interest in specific_interests.split(","):
+        interest = interest.strip()
+        stems = [
+            _stem(token) for token in INTEREST_TOKEN.findall(interest.lower())
+            if len(token) > 2 and token not in INTEREST_STOPWORDS
+        ]
+        if interest and stems:
+            keywords[interest] = stems
+    return keywords
+
+
+def _syllables(word: str) -> int:
+    return max(1, len(VOWEL_GROUP.findall(word.lower())))
+
+
+def _grammar_issues(messages: List[str]) -> Dict[str, int]:
+    """Count each grammar issue type over the associate's messages."""
+    issues = {name: 0 for name in GRAMMAR_CHECKS}
+    issues["lowercase_start"] = 0
+    issues["missing_punctuation"] = 0
+    for message in messages:
+        text = message.strip()
+        if not text:
+            continue
+        for name, (pattern, _) in GRAMMAR_CHECKS.items():
+            issues[name] += len(pattern.findall(text))
+        for sentence in SENTENCE_SPLIT.split(text):
+            letters = [char for char in sentence if char.isalpha()]
+            if letters and letters[0].islower():
+                issues["lowercase_start"] += 1
+        if text[-1].isalnum():
+            issues["missing_punctuation"] += 1
+    return issues
+
+
+def _grammar_score(issues: Dict[str, int], sentences: int) -> int:
+    weighted = sum(issues[name] * weight for name, (_, weight) in GRAMMAR_CHECKS.items())
+    weighted += issues["lowercase_start"] * LOWERCASE_START_WEIGHT
+    weighted += issues["missing_punctuation"] * MISSING_PUNCTUATION_WEIGHT
+    return _clamp(100 - GRAMMAR_PENALTY * weighted / max(1, sentences))
+
+
+def _clamp(value: float) -> int:
+    return max(0, min(100, int(round(value))))
+
+
+def score_transcript(conversation_history: List[Dict[str, str]], scenario: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compute the deterministic features of a transcript.
+
+    Args:
+        conversation_history: List of conversation messages ("user" is the
+            sales associate, anything else the customer)
+        scenario: Dictionary containing scenario information
+
+    Returns:
+        JSON-serializable feature dictionary
+    """
+    agent_messages = [entry["message"] for entry in conversation_history if entry["role"] == "user"]
+    customer_messages = [entry["message"] for entry in conversation_history if entry["role"] != "user"]
+    agent_text = "\n".join(agent_messages)
+
+    agent_words = WORD.findall(agent_text)
+    customer_word_count = sum(len(WORD.findall(message)) for message in customer_messages)
+    total_words = len(agent_words) + customer_word_count
+
+    # Which topics the associate covered, and which the scenario asks for
+    scenario_text = f"{scenario.get('specific_interests', '')} {scenario.get('customer_objective', '')}"
+    coverage = {topic: bool(pattern.search(agent_text)) for topic, pattern in COVERAGE_PATTERNS.items()}
+    expected = {topic: bool(COVERAGE_PATTERNS[topic].search(scenario_text)) for topic in SCENARIO_TOPICS}
+
+    agent_stems = {_stem(word.lower()) for word in agent_words}
+    interests = _interest_keywords(scenario.get("specific_interests", ""))
+    covered = [interest for interest, stems in interests.items() if any(stem in agent_stems for stem in stems)]
+
+    sentences = [s for s in SENTENCE_SPLIT.split(agent_text.replace("\n", ". ")) if WORD.search(s)]
+    words_per_sentence = len(agent_words) / len(sentences) if sentences else 0.0
+    syllables_per_word = sum(_syllables(w) for w in agent_words) / len(agent_words) if agent_words else 0.0
+    reading_ease = _clamp(206.835 - 1.015 * words_per_sentence - 84.6 * syllables_per_word) if agent_words else 0
+
+    issues = _grammar_issues(agent_messages)
+
+    return {
+        "agent_turns": len(agent_messages),
+        "customer_turns": len(customer_messages),
+        "agent_words": len(agent_words),
+        "customer_words": customer_word_count,
+        "agent_talk_ratio": round(len(agent_words) / total_words, 3) if total_words else 0.0,
+        "coverage": coverage,
+        "expected_topics": expected,
+        "interests_total": len(interests),
+        "interests_covered": covered,
+        "interests_missing": [interest for interest in interests if interest not in covered],
+        "sentences": len(sentences),
+        "words_per_sentence": round(words_per_sentence, 1),
+        "reading_ease": reading_ease,
+        "grammar_issues": issues,
+        "grammar_score": _grammar_score(issues, len(sentences)) if agent_words else 0
+    }
+
+
+def needs_llm_analysis(features: Dict[str, Any]) -> bool:
+    """Whether the session is long enough to be worth an LLM analysis."""
+    return (
+        features["agent_turns"] >= ANALYSIS_MIN_AGENT_TURNS
+        and features["agent_words"] >= ANALYSIS_MIN_AGENT_WORDS
+    )
+
+
+# ==============================
+# Heuristic Analysis
+# ==============================
+
+def _interest_coverage(features: Dict[str, Any]) -> float:
+    total = features["interests_total"]
+    return len(features["interests_covered"]) / total if total else 0.0
+
+
+def _topic_coverage(features: Dict[str, Any]) -> float:
+    """Share of the scenario's price/EMI topics the associate mentioned (1.0 if none apply)."""
+    expected = [topic for topic in SCENARIO_TOPICS if features["expected_topics"][topic]]
+    if not expected:
+        return 1.0
+    return sum(features["coverage"][topic] for topic in expected) / len(expected)
+
+
+def heuristic_scores(features: Dict[str, Any]) -> Dict[str, Any]:
+    """Score the categories of PerformanceAnalysis from the features alone."""
+    coverage = features["coverage"]
+    interests = _interest_coverage(features)
+    engagement = min(1.0, features["agent_turns"] / FULL_SESSION_TURNS)
+    balanced = BALANCED_TALK_RATIO[0] <= features["agent_talk_ratio"] <= BALANCED_TALK_RATIO[1]
+
+    grammar = features["grammar_score"]
+    customer_handling = _clamp(
+        30 + 15 * coverage["greeting"] + 10 * coverage["introduction"] + 15 * coverage["courtesy"]
+        + 15 * balanced + 15 * interests
+    )
+    product_knowledge = _clamp(30 + 45 * interests + 25 * _topic_coverage(features))
+    solution_approach = _clamp(30 + 50 * interests + 20 * engagement)
+
+    # A session that barely started cannot score well overall
+    average = (grammar + customer_handling + product_knowledge + solution_approach) / 4
+    return {
+        "overall_score": _clamp(average * (0.5 + 0.5 * engagement)),
+        "category_scores": {
+            "grammar": grammar,
+            "customer_handling": customer_handling,
+            "communication": _clamp(0.7 * grammar + 0.3 * features["reading_ease"]),
+            "customer_respect": customer_handling,
+            "product_knowledge": product_knowledge,
+            "solution_approach": solution_approach
+        }
+    }
+
+
+def heuristic_suggestions(features: Dict[str, Any]) -> List[str]:
+    """3-5 suggestions for what the features show is missing."""
+    coverage = features["coverage"]
+    expected = features["expected_topics"]
+    suggestions = []
+
+    if features["agent_turns"] < ANALYSIS_MIN_AGENT_TURNS:
+        suggestions.append(
+            f"Keep the conversation going: the session ended after {features['agent_turns']} associate "
+            f"message(s), before the customer's needs were explored."
+        )
+    if not coverage["greeting"]:
+        suggestions.append("Open with a greeting and welcome the customer before discussing products.")
+    if not coverage["introduction"]:
+        suggestions.append("Introduce yourself and ask for the customer's name to build rapport.")
+    if features["interests_missing"]:
+        suggestions.append(
+            f"Ask about and address the customer's interests: {', '.join(features['interests_missing'][:3])}."
+        )
+    if expected["price"] and not coverage["price"]:
+        suggestions.append("Discuss the price, offers and discounts, which matter to this customer.")
+    if expected["emi"] and not coverage["emi"]:
+        suggestions.append("Explain the EMI and financing options, including monthly amounts.")
+    if features["agent_words"] and features["grammar_score"] < 80:
+        suggestions.append("Write complete sentences with capital letters and punctuation, and avoid text shorthand.")
+    if features["agent_talk_ratio"] > BALANCED_TALK_RATIO[1]:
+        suggestions.append("Ask more questions and let the customer speak; you did most of the talking.")
+
+    for suggestion in GENERAL_SUGGESTIONS:
+        if len(suggestions) >= 3:
+            break
+        suggestions.append(suggestion)
+    return suggestions[:5]
+
+
+def feature_observations(features: Dict[str, Any]) -> List[str]:
+    """Five factual observations about the transcript."""
+    coverage = features["coverage"]
+    mentioned = [TOPIC_LABELS[topic] for topic, found in coverage.items() if found]
+    missing = [
+        TOPIC_LABELS[topic] for topic, found in coverage.items()
+        if not found and (topic not in SCENARIO_TOPICS or features["expected_topics"][topic])
+    ]
+    issue_count = sum(features["grammar_issues"].values())
+
+    return [
+        f"The associate sent {features['agent_turns']} message(s) and the customer {features['customer_turns']}; "
+        f"the associate used {features['agent_talk_ratio']:.0%} of the words.",
+        f"Covered {len(features['interests_covered'])} of {features['interests_total']} scenario interests"
+        + (f": {', '.join(features['interests_covered'])}." if features["interests_covered"] else "."),
+        f"Mentioned: {', '.join(mentioned) or 'none of the key topics'}"
+        + (f"; not mentioned: {', '.join(missing)}." if missing else "."),
+        f"Messages averaged {features['words_per_sentence']} words per sentence "
+        f"(reading ease {features['reading_ease']}/100).",
+        f"{issue_count} possible grammar issue(s) found in {features['sentences']} sentence(s)."
+    ]
+
+
+def feature_highlight(features: Dict[str, Any]) -> str:
+    """The strongest thing the features show, for the analysis highlight."""
+    coverage = features["coverage"]
+    if features["interests_covered"] and _interest_coverage(features) >= 0.5:
+        return f"Addressed {len(features['interests_covered'])} of the customer's key interests."
+    if coverage["greeting"] and coverage["introduction"]:
+        return "Opened the conversation with a greeting and an introduction."
+    if coverage["greeting"]:
+        return "Greeted the customer at the start of the conversation."
+    if coverage["courtesy"]:
+        return "Spoke to the customer politely."
+    return "The trainee started the training session."
+
+
+def heuristic_analysis(features: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build a complete analysis from the features, without an LLM call.
+
+    Args:
+        features: Output of score_transcript
+
+    Returns:
+        Analysis dictionary with the same fields as PerformanceAnalysis
+    """
+    return {
+        **heuristic_scores(features),
+        "improvement_suggestions": heuristic_suggestions(features),
+        "observations": feature_observations(features),
+        "highlight": feature_highlight(features)
+    }
+
+
+# ==============================
+# Prompt Summary
+# ==============================
+
+def _yes_no(value: bool) -> str:
+    return "yes" if value else "no"
+
+
+def feature_summary(features: Dict[str, Any]) -> str:
+    """
+    Summarize the features in a few lines for the compact analysis prompt.
+
+    Args:
+        features: Output of score_transcript
+
+    Returns:
+        Plain-text bullet list
+    """
+    coverage = features["coverage"]
+    expected = features["expected_topics"]
+    issues = ", ".join(f"{name}: {count}" for name, count in features["grammar_issues"].items() if count)
+    return "\n".join([
+        f"- Associate messages: {features['agent_turns']}, customer messages: {features['customer_turns']}, "
+        f"associate share of words: {features['agent_talk_ratio']:.0%}",
+        f"- Greeting: {_yes_no(coverage['greeting'])}, introduction: {_yes_no(coverage['introduction'])}, "
+        f"courtesy: {_yes_no(coverage['courtesy'])}",
+        f"- Price discussed: {_yes_no(coverage['price'])} (expected: {_yes_no(expected['price'])}), "
+        f"EMI discussed: {_yes_no(coverage['emi'])} (expected: {_yes_no(expected['emi'])})",
+        f"- Scenario interests covered: {len(features['interests_covered'])}/{features['interests_total']}"
+        f" (missing: {', '.join(features['interests_missing']) or 'none'})",
+        f"- Reading ease: {features['reading_ease']}/100, {features['words_per_sentence']} words per sentence",
+        f"- Grammar heuristics: score {features['grammar_score']}, issues in {features['sentences']} sentences: {issues or 'none'}"
+    ])